@@ -0,0 +1,233 @@
+"""Asset URL extraction shared by list_assets.py and the asset downloaders.
+
+Every saved page is scanned once with a single pattern anchored on the '='
+of an attribute, which finds CSS (href), JS (src) and images (src and
+content=) together, instead of one re.findall pass per kind; the attribute
+name is read back from just before the match. background-image url()s have
+no '=' to anchor on, so their pattern only runs on pages that mention
+background-image at all. Pages are spread across a process pool, and the
+results come back as sets per category.
+
+What each page yielded is kept in raw_html/asset_scan_cache.json, keyed by
+path and checked against the file's mtime and size (or, for a crawl store,
+the record's SHA-256), so a rerun only scans new and changed pages.
+"""
+import collections
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import process_pool
+from crawl_store import CrawlStore, iter_pages, page_count
+
+CATEGORIES = ('css', 'js', 'img')
+
+# A quoted attribute value ending in an asset extension, optionally followed
+# by a query string. Starting with a literal '=' keeps the scan on re's fast
+# prefix search, and the greedy run up to the extension cannot cross a quote.
+ASSET_URL_PATTERN = re.compile(
+    r'''=["']([^"'?]*\.(css|js|jpg|jpeg|png|gif|svg)(?:\?[^"']*)?)["']''')
+BACKGROUND_URL_PATTERN = re.compile(
+    r'''background-image:\s*url\(["']?([^"'?()]*\.(?:jpg|jpeg|png|gif|svg)(?:\?[^"')]*)?)["']?\)''')
+IMAGE_ATTRIBUTES = ('src', 'content')
+
+SCAN_CACHE_FILE = os.path.join("raw_html", "asset_scan_cache.json")
+# Cached results are only valid for the rules that produced them. Bump
+# SCAN_RULES_REVISION by hand whenever the scan logic changes -- scan_html,
+# the is_asset_url filtering, or anything else that decides which URLs a
+# page yields; the patterns above are hashed in as well, so editing them
+# alone also invalidates the cache.
+SCAN_RULES_REVISION = 1
+SCAN_RULES_VERSION = hashlib.sha256(
+    f"{SCAN_RULES_REVISION}|{ASSET_URL_PATTERN.pattern}|{BACKGROUND_URL_PATTERN.pattern}|{IMAGE_ATTRIBUTES}"
+    .encode('utf-8')).hexdigest()[:16]
+
+# Below this many pages the pool costs more than it saves
+MIN_PAGES_FOR_POOL = 64
+
+def is_asset_url(url):
+    return bool(url) and not url.startswith(('#', 'javascript:'))
+
+def scan_html(content):
+    """Returns (css, js, img) URL lists found in one page."""
+    css_urls, js_urls, img_urls = [], [], []
+    for match in ASSET_URL_PATTERN.finditer(content):
+        url, ext = match.groups()
+        start = match.start()
+        if ext == 'css':
+            if content.endswith('href', 0, start):
+                css_urls.append(url)
+        elif ext == 'js':
+            if content.endswith('src', 0, start):
+                js_urls.append(url)
+        elif content.endswith(IMAGE_ATTRIBUTES, 0, start):
+            img_urls.append(url)
+    if 'background-image' in content:
+        img_urls.extend(BACKGROUND_URL_PATTERN.findall(content))
+    return css_urls, js_urls, img_urls
+
+def scan_page(content):
+    """Returns one page's (css, js, img) asset URL lists, without fragment and javascript: URLs."""
+    return tuple([url for url in urls if is_asset_url(url)] for urls in scan_html(content))
+
+def scan_all(contents, jobs=1):
+    """Yields the (css, js, img) asset URL lists of every page, in order."""
+    return process_pool.imap_ordered(scan_page, contents, jobs)
+
+def _merge(asset_urls, page_urls):
+    for category, urls in zip(CATEGORIES, page_urls):
+        asset_urls[category].update(urls)
+        asset_urls['all'].update(urls)
+
+def collect_asset_urls(contents, jobs=1):
+    """Scans an iterable of page contents; returns {'css', 'js', 'img', 'all'} sets of asset URLs."""
+    asset_urls = {category: set() for category in CATEGORIES + ('all',)}
+    for page_urls in scan_all(contents, jobs):
+        _merge(asset_urls, page_urls)
+    return asset_urls
+
+def default_jobs():
+    return process_pool.default_jobs()
+
+class ScanCache:
+    """Asset URLs found in each saved page, keyed by its path and validated by mtime/size, then SHA-256.
+
+    Entries from an older version of the extraction rules are dropped on load.
+    """
+
+    def __init__(self, path=SCAN_CACHE_FILE):
+        self.path = path
+        self.pages = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == SCAN_RULES_VERSION:
+                # Pages refer to their URLs by position in one shared list
+                urls = data['urls']
+                for entry in data['pages'].values():
+                    entry['urls'] = [[urls[i] for i in indexes] for indexes in entry['urls']]
+                self.pages = data['pages']
+
+    def lookup(self, path, sha256=None, mtime_ns=None, size=None):
+        """Cached (css, js, img) lists for a page if its stat or its digest still matches, else None."""
+        entry = self.pages.get(path)
+        if entry is None:
+            return None
+        if sha256 is not None:
+            if entry['sha256'] != sha256:
+                return None
+            if mtime_ns is not None:
+                entry['mtime_ns'], entry['size'] = mtime_ns, size
+        elif (entry.get('mtime_ns'), entry.get('size')) != (mtime_ns, size):
+            return None
+        return entry['urls']
+
+    def store(self, path, urls, sha256, mtime_ns=None, size=None):
+        self.pages[path] = {'sha256': sha256, 'mtime_ns': mtime_ns, 'size': size, 'urls': [list(u) for u in urls]}
+
+    def prune(self, paths):
+        """Drops pages no longer saved."""
+        for path in set(self.pages) - set(paths):
+            del self.pages[path]
+
+    def save(self):
+        indexes = {}
+        pages = {path: dict(entry, urls=[[indexes.setdefault(url, len(indexes)) for url in urls]
+                                         for urls in entry['urls']])
+                 for path, entry in self.pages.items()}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': SCAN_RULES_VERSION, 'urls': list(indexes), 'pages': pages}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+def reference_counts(cache_path=SCAN_CACHE_FILE):
+    """Number of saved pages referencing each asset URL (as written in the pages), from the scan cache."""
+    counts = collections.Counter()
+    for entry in ScanCache(cache_path).pages.values():
+        counts.update({url for urls in entry['urls'] for url in urls})
+    return counts
+
+def _translate_newlines(text):
+    # Saved pages are scanned as the text iter_pages() yields for them
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+def _cached_pages(raw_dir, store_path, cache):
+    """Splits the saved pages into cached results and pages to scan.
+
+    Returns ({path: urls} for unchanged pages, [(path, sha256, mtime_ns, size)]
+    of pages to scan).
+    """
+    cached, to_scan = {}, []
+    if store_path:
+        for path, entry in CrawlStore(store_path).paths.items():
+            if not path.endswith('.html'):
+                continue
+            urls = cache.lookup(path, sha256=entry['sha256'])
+            if urls is not None:
+                cached[path] = urls
+            else:
+                to_scan.append((path, entry['sha256'], None, None))
+        return cached, to_scan
+
+    base_dir = Path(raw_dir)
+    for html_file in base_dir.glob("**/*.html"):
+        path = html_file.relative_to(base_dir).as_posix()
+        stat = html_file.stat()
+        urls = cache.lookup(path, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        if urls is None:
+            # Touched but maybe unchanged: the digest decides, and costs far less than a scan
+            data = html_file.read_bytes()
+            sha256 = hashlib.sha256(data).hexdigest()
+            urls = cache.lookup(path, sha256=sha256, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            if urls is None:
+                to_scan.append((path, sha256, stat.st_mtime_ns, stat.st_size))
+                continue
+        cached[path] = urls
+    return cached, to_scan
+
+def _read_pages(raw_dir, store_path, paths):
+    """Yields the content of each page, as iter_pages() would."""
+    if store_path:
+        store = CrawlStore(store_path)
+        for path in paths:
+            yield _translate_newlines(store.get(path).content)
+        return
+    for path in paths:
+        yield _translate_newlines(Path(raw_dir, path).read_bytes().decode('utf-8', errors='ignore'))
+
+def extract_asset_urls(raw_dir="raw_html", store_path=None, jobs=None, cache_path=SCAN_CACHE_FILE, rescan=False):
+    """Scans the saved pages (loose files or a crawl store) and returns their asset URLs by category.
+
+    With a cache_path only new and changed pages are scanned; the rest come
+    from the scan cache, which is then updated (rescan=True scans every page
+    and rebuilds the cache). jobs is the number of worker
+    processes (default: one per CPU); with 1, or for a few pages, pages are
+    scanned in this process.
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    if cache_path is None:
+        if page_count(raw_dir, store_path) < MIN_PAGES_FOR_POOL:
+            jobs = 1
+        return collect_asset_urls((content for _, content in iter_pages(raw_dir, store_path)), jobs)
+
+    cache = ScanCache(cache_path)
+    if rescan:
+        cache.pages = {}
+    cached, to_scan = _cached_pages(raw_dir, store_path, cache)
+    if len(to_scan) < MIN_PAGES_FOR_POOL:
+        jobs = 1
+    page_contents = _read_pages(raw_dir, store_path, [path for path, _, _, _ in to_scan])
+    for (path, sha256, mtime_ns, size), page_urls in zip(to_scan, scan_all(page_contents, jobs)):
+        cache.store(path, page_urls, sha256, mtime_ns, size)
+        cached[path] = page_urls
+    cache.prune(cached)
+    cache.save()
+    print(f"Asset scan cache: {len(to_scan)} of {len(cached)} pages scanned, {len(cached) - len(to_scan)} reused")
+
+    asset_urls = {category: set() for category in CATEGORIES + ('all',)}
+    for page_urls in cached.values():
+        _merge(asset_urls, page_urls)
+    return asset_urls
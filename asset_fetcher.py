@@ -0,0 +1,301 @@
+"""Asyncio download engine for the asset downloaders.
+
+Downloads run on worker threads through the shared http_client session, whose
+HTTPAdapter keeps one keep-alive pool per host, so each host costs a handful of
+TLS handshakes rather than one per file. An asyncio loop schedules them in
+priority order: a per-host cap keeps any one CDN from taking every slot, a
+global cap bounds the total, and bodies are streamed to disk in chunks with
+progress reported in bytes.
+Files appear under their final name only once complete; an interrupted
+download is continued from where it stopped with an HTTP Range request.
+
+Both asset downloaders (download_assets_improved.py, download_assets_new.py)
+download through download_with_progress() and download_file() here, which
+also keep the manifest, the URL -> path table and the blob store up to date;
+the scripts only differ in where their URLs come from.
+"""
+import asyncio
+import collections
+import heapq
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+from tqdm import tqdm
+
+import asset_extractor
+import asset_manifest
+import asset_paths
+import asset_priority
+import blob_store
+import http_client
+
+# Where downloaded assets are saved
+ASSETS_DIR = "assets"
+
+DEFAULT_MAX_WORKERS = 10
+# Concurrent downloads (and keep-alive connections) per host
+DEFAULT_PER_HOST = 6
+# Hosts to keep connection pools for; the blog's assets come from a few dozen
+POOL_CONNECTIONS = 64
+CHUNK_SIZE = 64 * 1024
+# Downloads in progress are written next to their final path, and renamed over it when complete
+PART_SUFFIX = ".part"
+# Holds the ETag/Last-Modified of a resumable .part's first response, for If-Range
+VALIDATOR_SUFFIX = ".validator"
+
+class IncompleteDownload(IOError):
+    """The body ended before the length the server announced."""
+
+def configure_session(max_workers=DEFAULT_MAX_WORKERS, per_host=DEFAULT_PER_HOST):
+    """Sizes the shared session's per-host pools to the download caps."""
+    http_client.configure(pool_maxsize=min(per_host, max_workers), pool_connections=POOL_CONNECTIONS)
+
+def stream_to_file(url, save_path, progress=None):
+    """GETs url into save_path.part and renames it to save_path once complete; returns the response.
+
+    A .part file left by an interrupted run is resumed with a Range request
+    guarded by If-Range, if its first response had an ETag or Last-Modified
+    and no Content-Encoding (ranges count encoded bytes); otherwise, or if
+    the server answers 200, the file is fetched from the start. The body must
+    match Content-Length, else IncompleteDownload is raised and the .part
+    stays for the next run. progress, if given, is called with the size of
+    every chunk written. On any other status nothing is written and the
+    connection goes straight back to the pool.
+    """
+    part_path = save_path + PART_SUFFIX
+    validator_path = part_path + VALIDATOR_SUFFIX
+    offset = 0
+    headers = {}
+    if os.path.exists(part_path) and os.path.exists(validator_path):
+        offset = os.path.getsize(part_path)
+        with open(validator_path, 'r', encoding='utf-8') as f:
+            headers = {'Range': f"bytes={offset}-", 'If-Range': f.read().strip(), 'Accept-Encoding': 'identity'}
+
+    response = http_client.get(url, stream=True, headers=headers)
+    if offset and (response.status_code == 416 or
+                   (response.status_code == 206 and _range_start(response) != offset)):
+        # Not the range asked for, or nothing left to ask for: start over
+        response.close()
+        offset = 0
+        response = http_client.get(url, stream=True)
+    if response.status_code not in (200, 206):
+        response.close()
+        return response
+    if response.status_code == 200:
+        offset = 0
+    try:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        if offset == 0:
+            # Only identity-encoded bodies with a validator can be resumed
+            if validator and response.headers.get('Content-Encoding', 'identity') == 'identity':
+                with open(validator_path, 'w', encoding='utf-8') as f:
+                    f.write(validator)
+            elif os.path.exists(validator_path):
+                os.remove(validator_path)
+        with open(part_path, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    if progress is not None:
+                        progress(len(chunk))
+    finally:
+        response.close()
+
+    expected_size = _expected_size(response, offset)
+    size = os.path.getsize(part_path)
+    if expected_size is not None and size != expected_size:
+        raise IncompleteDownload(f"{url}: got {size} of {expected_size} bytes")
+    os.replace(part_path, save_path)
+    if os.path.exists(validator_path):
+        os.remove(validator_path)
+    return response
+
+def _range_start(response):
+    """First byte of a 206 response's Content-Range, or None."""
+    match = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+def _expected_size(response, offset):
+    """Full size of the file the response belongs to, if the headers say."""
+    if response.status_code == 206:
+        match = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+        if match:
+            return int(match.group(1))
+    # Content-Length counts encoded bytes; iter_content yields decoded ones
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        return None
+    length = response.headers.get('Content-Length')
+    return offset + int(length) if length and length.isdigit() else None
+
+async def _download_all(urls, download, max_workers, per_host, on_done, priority):
+    # Downloads block, so the thread pool is the global cap
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_workers))
+    # URLs not started yet, one heap per host, best first; plus a heap, by the
+    # best URL waiting, of the hosts below their cap, so each URL is pushed
+    # and popped once however long its host stays capped
+    queues = collections.defaultdict(list)
+    for index, url in enumerate(urls):
+        queues[urlparse(url).netloc].append((priority(url) if priority else (), index, url))
+    for queue in queues.values():
+        heapq.heapify(queue)
+    open_hosts = [(queue[0], host) for host, queue in queues.items()]
+    heapq.heapify(open_hosts)
+    in_flight = collections.Counter()
+    running = {}
+    results = [None] * len(urls)
+
+    def start_next():
+        while open_hosts and len(running) < max_workers:
+            _, host = heapq.heappop(open_hosts)
+            queue = queues[host]
+            _, index, url = heapq.heappop(queue)
+            in_flight[host] += 1
+            if queue and in_flight[host] < per_host:
+                heapq.heappush(open_hosts, (queue[0], host))
+            running[asyncio.ensure_future(asyncio.to_thread(download, url))] = (index, url, host)
+
+    start_next()
+    while running:
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index, url, host = running.pop(task)
+            in_flight[host] -= 1
+            # A host that was at its cap is open again
+            if queues[host] and in_flight[host] == per_host - 1:
+                heapq.heappush(open_hosts, (queues[host][0], host))
+            results[index] = task.result()
+            if on_done is not None:
+                on_done(url, results[index])
+        start_next()
+    return results
+
+def download_all(urls, download, max_workers=DEFAULT_MAX_WORKERS, per_host=DEFAULT_PER_HOST, on_done=None,
+                 priority=None):
+    """Runs download(url) for every absolute URL under the per-host and global caps.
+
+    Whenever a slot frees, the URL with the lowest priority(url) among those
+    whose host is below its cap starts next (without a priority, the order
+    of urls). Returns the results in the order of urls; on_done(url, result)
+    is called on the event loop as each one finishes.
+    """
+    return asyncio.run(_download_all(list(urls), download, max_workers, per_host, on_done, priority))
+
+def normalize_url(url):
+    """Makes an asset URL absolute: https for protocol-relative and bare URLs, the blog's host for paths."""
+    if url.startswith('//'):
+        return f'https:{url}'
+    elif url.startswith('/'):
+        return f'https://blog.goo.ne.jp{url}'
+    elif not url.startswith(('http://', 'https://')):
+        return f'https://{url}'
+    return url
+
+def get_save_path(url):
+    """Path an asset URL is saved at; URLs with a query get its digest in the name, the same on every run."""
+    return os.path.join(ASSETS_DIR, *asset_paths.asset_relpath(url).split('/'))
+
+def load_downloaded_urls():
+    """URLs the manifest has as downloaded, less those whose file is gone or no longer has the recorded size."""
+    manifest = asset_manifest.get_manifest()
+    return manifest.downloaded_urls() - set(manifest.broken_urls(ASSETS_DIR))
+
+def load_priority():
+    """Download order: CSS, then JS and fonts, then images, then large images; within a tier, most referenced first."""
+    reference_counts = {}
+    for url, count in asset_extractor.reference_counts().items():
+        normalized_url = normalize_url(url)
+        reference_counts[normalized_url] = reference_counts.get(normalized_url, 0) + count
+    return asset_priority.AssetPriority(reference_counts, asset_manifest.get_manifest().known_sizes())
+
+def record_save_path(url, save_path):
+    """Records where a URL is saved in the URL -> path table (in the download manifest)."""
+    asset_paths.get_table().record(url, Path(os.path.relpath(save_path, ASSETS_DIR)).as_posix())
+
+def download_file(url, downloaded_urls, progress=None):
+    """Downloads one asset unless it is already saved; returns True on success.
+
+    progress, if given, is called with the number of bytes written.
+    """
+    normalized_url = normalize_url(url)
+    if normalized_url in downloaded_urls:
+        return True
+
+    save_path = get_save_path(normalized_url)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+
+    manifest = asset_manifest.get_manifest()
+    relpath = Path(os.path.relpath(save_path, ASSETS_DIR)).as_posix()
+    try:
+        # A file whose length differs from the record is broken: fetch it again
+        record = manifest.get(normalized_url)
+        if os.path.exists(save_path) and record and record[1] is not None and os.path.getsize(save_path) != record[1]:
+            os.remove(save_path)
+
+        # Downloads in progress are .part files, so anything at save_path is complete
+        if os.path.exists(save_path):
+            record_save_path(normalized_url, save_path)
+            manifest.record(normalized_url, 'exists', size=os.path.getsize(save_path), path=relpath)
+            return True
+
+        response = stream_to_file(normalized_url, save_path, progress)
+        if response.status_code in (200, 206):
+            # After a redirect both the requested and the final URL map to the file
+            final_url = response.url if response.url != normalized_url else None
+            if final_url:
+                record_save_path(final_url, save_path)
+            record_save_path(normalized_url, save_path)
+            # Files with the same content are hard links to one blob
+            digest, _ = blob_store.get_store().add(save_path)
+            manifest.record(normalized_url, response.status_code, final_url=final_url,
+                            size=os.path.getsize(save_path), digest=digest,
+                            etag=response.headers.get('ETag'), path=relpath)
+            return True
+        else:
+            print(f"Failed to download: {normalized_url}, status code: {response.status_code}")
+            manifest.record(normalized_url, response.status_code, final_url=response.url, path=relpath)
+            return False
+    except Exception as e:
+        print(f"Error downloading {normalized_url}: {e}")
+        manifest.record(normalized_url, type(e).__name__, path=relpath)
+        return False
+
+def download_with_progress(urls, downloaded_urls, max_workers=DEFAULT_MAX_WORKERS, per_host=DEFAULT_PER_HOST,
+                           policy=None, negative_cache=None, priority=None):
+    """Downloads the URLs not downloaded yet under the per-host and global caps, with a bytes/s progress bar.
+
+    URLs on domains the policy (domain_policy.DomainPolicy) denies and URLs in
+    negative_cache ({url: seconds until they may be retried}) are skipped; with
+    a priority (asset_priority.AssetPriority) the best URLs start first.
+    """
+    # URLs that normalize to the same one are downloaded once
+    normalized_urls = dict.fromkeys(normalize_url(url) for url in urls)
+    remaining_urls = [url for url in normalized_urls if url not in downloaded_urls]
+    if policy is not None:
+        remaining_urls, denied_urls = policy.split(remaining_urls)
+        if denied_urls:
+            print(f"Skipping {len(denied_urls)} files on denied domains")
+    if negative_cache:
+        recently_failed = [url for url in remaining_urls if url in negative_cache]
+        if recently_failed:
+            remaining_urls = [url for url in remaining_urls if url not in negative_cache]
+            print(f"Skipping {len(recently_failed)} files that failed recently (use --retry to try them now)")
+
+    if not remaining_urls:
+        print("All files already downloaded")
+        return
+
+    print(f"Downloading {len(remaining_urls)} files...")
+
+    completed_files = 0
+    with tqdm(unit='B', unit_scale=True, unit_divisor=1024) as pbar:
+        def on_done(url, result):
+            nonlocal completed_files
+            completed_files += 1
+            pbar.set_postfix_str(f"{completed_files}/{len(remaining_urls)} files")
+
+        download_all(remaining_urls, lambda url: download_file(url, downloaded_urls, progress=pbar.update),
+                     max_workers=max_workers, per_host=per_host, on_done=on_done, priority=priority)
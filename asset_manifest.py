@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""SQLite manifest of asset downloads, replacing assets/downloaded_urls.txt.
+
+One row per URL with the outcome of its latest attempt: final URL after
+redirects, status (HTTP code, 'exists' for a file already on disk, or the
+exception name), size, SHA-256, ETag, saved path and time; size and digest
+follow the file if it is rewritten afterwards (see css_assets.py). The same
+database holds the URL -> saved path table (asset_paths.py) and the digest
+each saved path should hold (blob_store.py). Worker threads hand their
+records to a single writer thread, which commits them in batches to a WAL
+database, so downloads never wait on the disk or on each other. A plain
+downloaded_urls.txt from earlier runs is imported the first time the
+manifest is opened.
+
+    python asset_manifest.py stats
+    python asset_manifest.py failed    # with the time left before each may be retried
+    python asset_manifest.py domain i.xgoo.jp
+"""
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+ASSETS_DIR = "assets"
+MANIFEST_FILE_NAME = "downloads.sqlite3"
+MANIFEST_FILE = os.path.join(ASSETS_DIR, MANIFEST_FILE_NAME)
+# Plain list of downloaded URLs written by earlier runs, next to the database
+LEGACY_FILE_NAME = "downloaded_urls.txt"
+# Records per commit, and the longest a record waits for one
+BATCH_SIZE = 200
+BATCH_SECONDS = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    url TEXT PRIMARY KEY,
+    final_url TEXT,
+    domain TEXT NOT NULL,
+    status TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    bytes INTEGER,
+    digest TEXT,
+    etag TEXT,
+    path TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS downloads_ok ON downloads (ok);
+CREATE INDEX IF NOT EXISTS downloads_domain ON downloads (domain);
+CREATE TABLE IF NOT EXISTS url_paths (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+"""
+
+# Statuses that mean the file is saved (206: finished by resuming a .part)
+OK_STATUSES = ('200', '206', 'exists')
+
+# How long a URL whose latest download failed is left alone, by that failure
+HOUR = 60 * 60
+DAY = 24 * HOUR
+NEGATIVE_TTLS = {'404': 7 * DAY, '410': 30 * DAY}
+CLIENT_ERROR_TTL = DAY
+SERVER_ERROR_TTL = HOUR
+# Timeouts and connection errors (recorded by exception name)
+NETWORK_ERROR_TTL = 6 * HOUR
+
+INSERT_SQL = """
+INSERT OR REPLACE INTO downloads (url, final_url, domain, status, ok, bytes, digest, etag, path, fetched_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+URL_PATH_SQL = "INSERT OR REPLACE INTO url_paths (key, url, path) VALUES (?, ?, ?)"
+BLOB_SQL = "INSERT OR REPLACE INTO blobs (path, digest) VALUES (?, ?)"
+
+def negative_ttl(status):
+    """Seconds a URL that failed with status is skipped for: long for 404/410, short for 5xx."""
+    if status in NEGATIVE_TTLS:
+        return NEGATIVE_TTLS[status]
+    if status.isdigit():
+        return CLIENT_ERROR_TTL if status.startswith('4') else SERVER_ERROR_TTL
+    return NETWORK_ERROR_TTL
+
+class AssetManifest:
+    """Download manifest with one batching writer thread; record() is safe from any thread."""
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        # Guards the connection between the writer and readers
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='asset-manifest-writer', daemon=True)
+        self._writer.start()
+        legacy_path = os.path.join(os.path.dirname(path), LEGACY_FILE_NAME)
+        if os.path.exists(legacy_path):
+            self._import_legacy(legacy_path)
+
+    def _import_legacy(self, legacy_path):
+        if self._query("SELECT 1 FROM downloads LIMIT 1"):
+            return
+        with open(legacy_path, 'r') as f:
+            urls = dict.fromkeys(line.strip() for line in f if line.strip())
+        fetched_at = os.path.getmtime(legacy_path)
+        with self._lock:
+            self._db.executemany(INSERT_SQL, [(url, None, urlparse(url).netloc, 'imported', 1,
+                                               None, None, None, None, fetched_at) for url in urls])
+            self._db.commit()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                self._queue.task_done()
+                return
+            batch = [record]
+            deadline = time.monotonic() + BATCH_SECONDS
+            stop = False
+            while len(batch) < BATCH_SIZE:
+                try:
+                    record = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            with self._lock:
+                for sql, params in batch:
+                    self._db.execute(sql, params)
+                self._db.commit()
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def record(self, url, status, final_url=None, size=None, digest=None, etag=None, path=None):
+        """Queues the outcome of a download; status is an HTTP code, 'exists' or an error name."""
+        status = str(status)
+        ok = status in OK_STATUSES
+        self._queue.put((INSERT_SQL, (url, final_url, urlparse(url).netloc, status, int(ok),
+                                      size, digest, etag, path, time.time())))
+
+    def file_changed(self, path, size, digest):
+        """Queues new size and digest for every URL saved at path, after the file was rewritten locally."""
+        self._queue.put(("UPDATE downloads SET bytes = ?, digest = ? WHERE path = ?", (size, digest, path)))
+
+    def record_url_path(self, key, url, path):
+        """Queues where a URL (under its asset_paths.url_key) is saved; the last one for a key wins."""
+        self._queue.put((URL_PATH_SQL, (key, url, path)))
+
+    def record_blob(self, path, digest):
+        """Queues the digest of the blob a saved path should hold."""
+        self._queue.put((BLOB_SQL, (path, digest)))
+
+    def import_rows(self, sql, rows):
+        """Commits rows at once, e.g. a table from an older file format; sql is URL_PATH_SQL or BLOB_SQL."""
+        with self._lock:
+            self._db.executemany(sql, rows)
+            self._db.commit()
+
+    def url_paths(self):
+        """(key, url, path) of every saved URL, oldest first, including records still queued."""
+        self.flush()
+        return self._query("SELECT key, url, path FROM url_paths ORDER BY rowid")
+
+    def blob_digests(self):
+        """{path: digest} for every path recorded in the blob store, including records still queued."""
+        self.flush()
+        return dict(self._query("SELECT path, digest FROM blobs"))
+
+    def flush(self):
+        """Waits until every queued record is committed."""
+        self._queue.join()
+
+    def downloaded_urls(self):
+        """Set of URLs (and redirect targets) whose latest download succeeded."""
+        urls = set()
+        for url, final_url in self._query("SELECT url, final_url FROM downloads WHERE ok = 1"):
+            urls.add(url)
+            if final_url:
+                urls.add(final_url)
+        return urls
+
+    def get(self, url):
+        """(status, bytes, digest, path) of a URL's latest download, or None."""
+        rows = self._query("SELECT status, bytes, digest, path FROM downloads WHERE url = ?", (url,))
+        return rows[0] if rows else None
+
+    def broken_urls(self, assets_dir=ASSETS_DIR):
+        """Downloaded URLs whose file is missing or no longer has the recorded size."""
+        broken = []
+        for url, size, path in self._query("SELECT url, bytes, path FROM downloads "
+                                           "WHERE ok = 1 AND path IS NOT NULL AND bytes IS NOT NULL"):
+            file_path = os.path.join(assets_dir, path)
+            if not os.path.exists(file_path) or os.path.getsize(file_path) != size:
+                broken.append(url)
+        return broken
+
+    def known_sizes(self):
+        """{url: size in bytes} of every URL whose size has been recorded."""
+        return dict(self._query("SELECT url, bytes FROM downloads WHERE bytes IS NOT NULL"))
+
+    def negatively_cached(self, now=None):
+        """URLs that failed recently enough to skip: {url: seconds until they may be tried again}."""
+        now = time.time() if now is None else now
+        cached = {}
+        for url, status, fetched_at in self._query("SELECT url, status, fetched_at FROM downloads WHERE ok = 0"):
+            remaining = fetched_at + negative_ttl(status) - now
+            if remaining > 0:
+                cached[url] = remaining
+        return cached
+
+    def failed_urls(self):
+        """URLs whose latest download failed, in URL order."""
+        return [url for url, in self._query("SELECT url FROM downloads WHERE ok = 0 ORDER BY url")]
+
+    def domain_assets(self, domain):
+        """(url, status, bytes, path) of every asset recorded for a host."""
+        return self._query("SELECT url, status, bytes, path FROM downloads WHERE domain = ? ORDER BY url",
+                           (domain,))
+
+    def stats(self):
+        return {
+            'statuses': dict(self._query("SELECT status, COUNT(*) FROM downloads GROUP BY status")),
+            'bytes': self._query("SELECT COALESCE(SUM(bytes), 0) FROM downloads WHERE ok = 1")[0][0],
+            'domains': self._query("SELECT domain, COUNT(*), SUM(ok) FROM downloads GROUP BY domain "
+                                   "ORDER BY COUNT(*) DESC"),
+        }
+
+    def close(self):
+        """Commits what is queued and closes the database."""
+        global _manifest
+        if _manifest is self:
+            _manifest = None
+        self._queue.put(None)
+        self._writer.join()
+        self._db.close()
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+def get_manifest():
+    """Returns the shared manifest for MANIFEST_FILE, opening it on first use."""
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = AssetManifest()
+        return _manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the asset download manifest')
+    parser.add_argument('--db', default=MANIFEST_FILE, help=f'Manifest database (default: {MANIFEST_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Downloads by status and by host')
+    subparsers.add_parser('failed', help='List URLs whose latest download failed')
+    domain_parser = subparsers.add_parser('domain', help='List the assets of one host')
+    domain_parser.add_argument('domain')
+    args = parser.parse_args()
+
+    manifest = AssetManifest(args.db)
+    try:
+        if args.command == 'stats':
+            stats = manifest.stats()
+            print("Downloads: " + (", ".join(f"{status}={count}" for status, count in sorted(stats['statuses'].items()))
+                                   or "none"))
+            print(f"Bytes downloaded: {stats['bytes']}")
+            for domain, count, ok_count in stats['domains']:
+                print(f"  {domain}: {ok_count}/{count} ok")
+        elif args.command == 'failed':
+            cached = manifest.negatively_cached()
+            for url in manifest.failed_urls():
+                print(f"{url}\tretry in {cached[url] / HOUR:.1f}h" if url in cached else url)
+        else:
+            for url, status, size, path in manifest.domain_assets(args.domain):
+                print(f"{status}\t{size if size is not None else '-'}\t{url}\t{path or '-'}")
+    finally:
+        manifest.close()
+
+if __name__ == "__main__":
+    main()
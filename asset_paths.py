@@ -0,0 +1,122 @@
+"""Stable local paths for downloaded assets, and the table that records them.
+
+Query-string variants of an asset (style.css?v=1, style.css?v=2) are saved
+side by side as style_<digest>.css, with the digest taken from the query
+string, so a URL maps to the same file in every run. Every download is also
+recorded in the url_paths table of the download manifest (asset_manifest.py),
+whose writer thread commits them in batches; the HTML converter and the local
+server look files up there instead of guessing. A url_paths.tsv (URL, tab,
+path relative to assets/) left by earlier runs is imported once.
+"""
+import hashlib
+import os
+import posixpath
+import threading
+from urllib.parse import urlparse
+
+import asset_manifest
+
+ASSETS_DIR = "assets"
+# Table written by earlier runs, imported into the manifest
+LEGACY_URL_TABLE_FILE = os.path.join(ASSETS_DIR, "url_paths.tsv")
+# Hex digits of the query digest in file names (64 bits)
+QUERY_DIGEST_LENGTH = 16
+
+def query_digest(query):
+    """Short, stable digest of a query string."""
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()[:QUERY_DIGEST_LENGTH]
+
+def asset_relpath(url):
+    """Returns the path, relative to ASSETS_DIR, an absolute asset URL is saved under."""
+    parsed_url = urlparse(url)
+    path = parsed_url.path.lstrip('/')
+
+    # Query-string variants get the query's digest before the extension
+    if parsed_url.query:
+        file_path, file_ext = posixpath.splitext(path)
+        path = f"{file_path}_{query_digest(parsed_url.query)}{file_ext}"
+
+    # URLs without a file name are saved as index.html
+    if path.endswith('/') or not path:
+        path = path + 'index.html'
+
+    # URLs without an extension
+    if not posixpath.splitext(path)[1]:
+        path = path + '.html'
+
+    return posixpath.join(parsed_url.netloc, path)
+
+def url_key(url):
+    """Table key for a URL: host, path and query, so http/https and //host URLs share an entry.
+
+    Also accepts the local form /assets/<host>/<path>?<query> that rewritten pages request.
+    """
+    parsed_url = urlparse(url)
+    if parsed_url.netloc:
+        key = parsed_url.netloc + parsed_url.path
+    else:
+        key = parsed_url.path.lstrip('/')
+        if key.startswith(ASSETS_DIR + '/'):
+            key = key[len(ASSETS_DIR) + 1:]
+    return key + ('?' + parsed_url.query if parsed_url.query else '')
+
+class AssetPathTable:
+    """URL -> saved path table, kept in memory and in the manifest; the last entry for a URL wins."""
+
+    def __init__(self, manifest, legacy_path=LEGACY_URL_TABLE_FILE):
+        self.manifest = manifest
+        self.paths = {}
+        # saved path -> the URL last recorded for it
+        self.urls = {}
+        self._lock = threading.Lock()
+        rows = manifest.url_paths()
+        if not rows and os.path.exists(legacy_path):
+            rows = self._import_legacy(legacy_path)
+        for key, url, relpath in rows:
+            self.paths[key] = relpath
+            self.urls[relpath] = url
+
+    def _import_legacy(self, legacy_path):
+        rows = {}
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                url, _, relpath = line.rstrip('\n').partition('\t')
+                if relpath:
+                    # The last entry for a URL wins, and takes its place in the order
+                    key = url_key(url)
+                    rows.pop(key, None)
+                    rows[key] = (key, url, relpath)
+        self.manifest.import_rows(asset_manifest.URL_PATH_SQL, list(rows.values()))
+        return list(rows.values())
+
+    def get(self, url):
+        """Returns the saved path (relative to ASSETS_DIR) for a URL, or None."""
+        return self.paths.get(url_key(url))
+
+    def url_for(self, relpath):
+        """Returns a URL recorded for a saved path, or None."""
+        return self.urls.get(relpath)
+
+    def record(self, url, relpath):
+        """Records where a URL was saved; the manifest's writer thread commits it."""
+        key = url_key(url)
+        with self._lock:
+            if self.paths.get(key) == relpath:
+                return
+            self.paths[key] = relpath
+            self.urls[relpath] = url
+        self.manifest.record_url_path(key, url, relpath)
+
+    def __len__(self):
+        return len(self.paths)
+
+_table = None
+_table_lock = threading.Lock()
+
+def get_table():
+    """Returns the shared table in the shared download manifest, loading it on first use."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = AssetPathTable(asset_manifest.get_manifest())
+        return _table
@@ -0,0 +1,50 @@
+"""Download order for assets: what pages need to render first, big photos last.
+
+A cold fetch of the whole archive takes a long time, and pages served by
+server.py meanwhile look broken until their stylesheets arrive. AssetPriority
+gives every URL a sort key for asset_fetcher.download_all:
+
+1. stylesheets, which block rendering;
+2. scripts and web fonts;
+3. images and anything else;
+4. large files: any the download manifest recorded at LARGE_ASSET_BYTES or
+   more, and original-size user photos, which the blog serves at full
+   resolution unless they go through its image transformer.
+
+Within a tier, assets referenced by more pages come first. The counts come
+from the asset scan cache (asset_extractor.reference_counts()).
+"""
+import os
+from urllib.parse import urlparse
+
+RENDER_BLOCKING, SCRIPT, DEFAULT, LARGE = range(4)
+
+SCRIPT_EXTENSIONS = ('.js', '.woff', '.woff2', '.ttf', '.otf', '.eot')
+LARGE_ASSET_BYTES = 512 * 1024
+# Paths of original-size uploads, and of the transformer that serves resized ones
+ORIGINAL_IMAGE_PATHS = ('/user_image/', '/user_photo/')
+RESIZED_IMAGE_PATH = '/image/upload/'
+
+def asset_tier(url, size=None):
+    """Tier of an absolute asset URL; size is its last known size in bytes, if any."""
+    path = urlparse(url).path
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.css':
+        return RENDER_BLOCKING
+    if extension in SCRIPT_EXTENSIONS:
+        return SCRIPT
+    if size is not None:
+        return LARGE if size >= LARGE_ASSET_BYTES else DEFAULT
+    if RESIZED_IMAGE_PATH not in path and any(hint in path for hint in ORIGINAL_IMAGE_PATHS):
+        return LARGE
+    return DEFAULT
+
+class AssetPriority:
+    """Sort key for asset URLs: (tier, -pages referencing it, url)."""
+
+    def __init__(self, reference_counts=None, sizes=None):
+        self.reference_counts = reference_counts or {}
+        self.sizes = sizes or {}
+
+    def __call__(self, url):
+        return (asset_tier(url, self.sizes.get(url)), -self.reference_counts.get(url, 0), url)
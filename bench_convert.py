@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark: per-match str.replace vs. the one-pass asset URL substitution.
+
+convert_html_paths.py used to find asset URLs with one re.finditer per
+attribute and then rewrite each with content.replace(), copying the whole
+page once per match. It now rebuilds each page once with a single pattern
+and a callback. This times both on the largest saved pages and on a
+synthetic page with thousands of asset references, reports ms/file, and
+checks that both produce the same page.
+"""
+import argparse
+import itertools
+import os
+import re
+import time
+from pathlib import Path
+
+import convert_html_paths
+
+RAW_HTML_DIR = "raw_html"
+
+LEGACY_URL_PATTERNS = [
+    (r'src=["\']([^"\']+)["\']', 'src'),
+    (r'background=["\']([^"\']+)["\']', 'background'),
+    (r'url\(["\']?([^"\'\)]+)["\']?\)', 'url'),
+    (r'content=["\']([^"\']+)["\']', 'content'),
+]
+LEGACY_HREF_PATTERN = r'href=["\']([^"\']+)["\']'
+
+def legacy_rewrite(content, url_mapping):
+    """The substitution process_html_files did before: finditer per pattern, then str.replace per match."""
+    replaced_urls = 0
+    for match in re.finditer(LEGACY_HREF_PATTERN, content):
+        original_url = match.group(1)
+        if original_url.startswith(('#', 'javascript:', 'mailto:')):
+            continue
+        normalized_url = convert_html_paths.normalize_url(original_url)
+        if convert_html_paths.is_asset_url(original_url) or convert_html_paths.is_asset_url(normalized_url):
+            for url in (original_url, normalized_url):
+                if url in url_mapping:
+                    content = content.replace(f'href="{original_url}"', f'href="{url_mapping[url]}"')
+                    replaced_urls += 1
+                    break
+    for pattern, attr_type in LEGACY_URL_PATTERNS:
+        for match in re.finditer(pattern, content):
+            original_url = match.group(1)
+            if original_url.startswith(('#', 'javascript:', 'mailto:')):
+                continue
+            normalized_url = convert_html_paths.normalize_url(original_url)
+            for url in (original_url, normalized_url):
+                if url in url_mapping:
+                    new_url = url_mapping[url]
+                    old_attr = f'{attr_type}="{original_url}"' if attr_type != 'url' else f'url({original_url})'
+                    new_attr = f'{attr_type}="{new_url}"' if attr_type != 'url' else f'url({new_url})'
+                    content = content.replace(old_attr, new_attr)
+                    replaced_urls += 1
+                    break
+    return content, replaced_urls
+
+def synthetic_page(asset_urls, references):
+    """A page with the given number of asset references, cycling through the known asset URLs."""
+    tags = []
+    for number, url in zip(range(references), itertools.cycle(sorted(asset_urls))):
+        if url.endswith('.css') or '.css?' in url:
+            tags.append(f'<link rel="stylesheet" href="{url}">')
+        elif url.endswith('.js') or '.js?' in url:
+            tags.append(f'<script src="{url}"></script>')
+        else:
+            tags.append(f'<div style="background: url({url})"><img src="{url}" alt="{number}"></div>')
+    return '<html><body>\n' + '\n'.join(tags) + '\n</body></html>\n'
+
+def time_rewrite(rewrite, pages, url_mapping, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for content in pages:
+            rewrite(content, url_mapping)
+    return (time.perf_counter() - start_time) / repeat / len(pages)
+
+def bench(title, pages, url_mapping, repeat):
+    print(f"{title}: {len(pages)} pages, {sum(len(content) for content in pages) / len(pages) / 1024:.0f} KB mean")
+    legacy = time_rewrite(legacy_rewrite, pages, url_mapping, repeat)
+    one_pass = time_rewrite(convert_html_paths.rewrite_asset_urls, pages, url_mapping, repeat)
+    print(f"  {'str.replace per match':<24} {legacy * 1000:9.2f} ms/file")
+    print(f"  {'one pass':<24} {one_pass * 1000:9.2f} ms/file  ({legacy / one_pass:.1f}x)")
+    for content in pages:
+        legacy_content, legacy_count = legacy_rewrite(content, url_mapping)
+        content, count = convert_html_paths.rewrite_asset_urls(content, url_mapping)
+        if content != legacy_content or count != legacy_count:
+            print(f"  output differs: {count} URLs replaced in one pass, {legacy_count} by str.replace")
+            break
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark asset URL substitution in convert_html_paths.py')
+    parser.add_argument('--largest', type=int, default=10, help='Number of the largest raw_html pages to time (default: 10)')
+    parser.add_argument('--references', type=int, default=5000,
+                        help='Asset references on the synthetic page (default: 5000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing passes to average (default: 3)')
+    args = parser.parse_args()
+
+    asset_urls = convert_html_paths.load_asset_urls()
+    if not asset_urls:
+        return
+    url_mapping = convert_html_paths.create_url_mapping(asset_urls)
+
+    html_files = sorted(Path(RAW_HTML_DIR).glob("**/*.html"), key=os.path.getsize, reverse=True)[:args.largest]
+    if html_files:
+        pages = [html_file.read_text(encoding='utf-8', errors='ignore') for html_file in html_files]
+        bench(f"Largest {RAW_HTML_DIR}/ pages", pages, url_mapping, args.repeat)
+    bench(f"Synthetic page, {args.references} asset references",
+          [synthetic_page(asset_urls, args.references)], url_mapping, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Offline benchmark suite for the crawlers.
+
+Each crawler runs against a local replay server built from raw_html/ (see
+replay_server.py), writing into its own temporary directory:
+
+    sequential   download_blog.py, one request at a time with polite sleeps
+    async        download_blog.py --async
+    monthly      download_monthly_archives.py
+
+For every crawl it reports total wall-clock time, pages/sec and the p50/p99
+latency of individual fetches, measured on the shared HTTP session.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import download_blog
+import download_monthly_archives
+import http_client
+import replay_server
+
+CRAWLERS = ['sequential', 'async', 'monthly']
+
+class FetchRecorder:
+    """Response hook for the shared session: collects the latency and status of every fetch."""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+
+    def __call__(self, response, *args, **kwargs):
+        self.latencies.append(response.elapsed.total_seconds())
+        self.statuses[response.status_code] = self.statuses.get(response.status_code, 0) + 1
+
+    def reset(self):
+        self.latencies = []
+        self.statuses = {}
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers; None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+def count_saved(output_dir):
+    """Returns the number of HTML pages saved under output_dir."""
+    return sum(1 for _, _, filenames in os.walk(output_dir) for name in filenames if name.endswith('.html'))
+
+def run_crawl(label, crawl, configure, base_url, recorder):
+    """Runs one crawl into a fresh directory and prints its timings; returns the wall-clock time."""
+    recorder.reset()
+    with tempfile.TemporaryDirectory() as output_dir:
+        configure(base_url=base_url, output_dir=output_dir)
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            crawl()
+        elapsed_time = time.perf_counter() - start_time
+        saved_pages = count_saved(output_dir)
+
+    fetched = sum(count for status, count in recorder.statuses.items() if status in (200, 304))
+    errors = sum(count for status, count in recorder.statuses.items() if status not in (200, 304))
+    p50, p99 = percentile(recorder.latencies, 50), percentile(recorder.latencies, 99)
+    latency = f"{p50 * 1000:7.1f} {p99 * 1000:7.1f}" if recorder.latencies else f"{'-':>7} {'-':>7}"
+    print(f"{label:<12} {elapsed_time:8.2f}s {fetched / elapsed_time:9.2f} {latency} "
+          f"{fetched:8} {errors:6} {saved_pages:6}")
+    return elapsed_time
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the crawlers against a local replay server')
+    parser.add_argument('--crawlers', nargs='+', choices=CRAWLERS, default=CRAWLERS,
+                        help='Crawlers to run (default: all)')
+    parser.add_argument('--pages', type=int, default=5, help='Archive pages to crawl (default: 5)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Replay server latency in seconds (default: 0.05)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency, up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of requests the replay server answers with 503 (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Replay server random seed (default: 0)')
+    parser.add_argument('--rate', type=float, default=download_blog.DEFAULT_RATE,
+                        help=f'Async crawls: requests per second (default: {download_blog.DEFAULT_RATE})')
+    parser.add_argument('--max-in-flight', type=int, default=download_blog.DEFAULT_MAX_IN_FLIGHT,
+                        help=f'Async crawls: concurrent requests (default: {download_blog.DEFAULT_MAX_IN_FLIGHT})')
+    parser.add_argument('--skip-sequential', action='store_true', help='Leave out the sequential crawl')
+    args = parser.parse_args()
+
+    crawlers = [name for name in args.crawlers if not (args.skip_sequential and name == 'sequential')]
+    recorder = FetchRecorder()
+    http_client.get_session().hooks['response'].append(recorder)
+    server = replay_server.start_in_thread(port=0, latency=args.latency, jitter=args.jitter,
+                                           error_rate=args.error_rate, max_pages=args.pages,
+                                           fill_missing=True, seed=args.seed)
+    print(f"Replay server at {server.base_url} ({args.pages} archive pages, {args.latency}s latency, "
+          f"{args.jitter}s jitter, {args.error_rate:.0%} errors)")
+    print(f"{'crawler':<12} {'total':>9} {'pages/s':>9} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'fetched':>8} {'errors':>6} {'saved':>6}")
+    blog_async = lambda: asyncio.run(download_blog.crawl_async(rate=args.rate, max_in_flight=args.max_in_flight))
+    monthly = lambda: download_monthly_archives.crawl_monthly(rate=args.rate, max_in_flight=args.max_in_flight)
+    runs = {
+        'sequential': (download_blog.crawl_sequential, download_blog.configure),
+        'async': (blog_async, download_blog.configure),
+        'monthly': (monthly, download_monthly_archives.configure),
+    }
+    try:
+        results = {}
+        for name in crawlers:
+            crawl, configure = runs[name]
+            results[name] = run_crawl(name, crawl, configure, server.base_url, recorder)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if 'sequential' in results and 'async' in results:
+        print(f"Async speedup: {results['sequential'] / results['async']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: charset detection over the whole body vs. html_decoding.
+
+Runs both decoders over every saved page in raw_html/ and reports total time
+and how often each one matches the UTF-8 the pages were saved in. Pages can
+be re-encoded (e.g. --encoding cp932) to check the Shift_JIS path.
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+from html_decoding import decode_html, detect
+
+RAW_HTML_DIR = "raw_html"
+
+def decode_by_detection(content):
+    """Today's behaviour: response.encoding = response.apparent_encoding."""
+    encoding = detect(content).get('encoding') or 'utf-8'
+    return content.decode(encoding, errors='replace')
+
+def load_corpus(encoding, content_type):
+    """Returns [(expected text, body bytes, Content-Type)] for every page in raw_html/."""
+    corpus = []
+    for html_file in sorted(Path(RAW_HTML_DIR).glob("**/*.html")):
+        text = html_file.read_text(encoding='utf-8', errors='replace')
+        if encoding != 'utf-8':
+            # Declare the new charset the way a page in that encoding would
+            text = re.sub(r'<meta charset="[^"]*">', f'<meta charset="{encoding}">', text, count=1)
+        corpus.append((text, text.encode(encoding, errors='replace'), content_type))
+    return corpus
+
+def run(label, decoder, corpus):
+    correct = 0
+    start_time = time.perf_counter()
+    decoded = [decoder(content, content_type) for _, content, content_type in corpus]
+    elapsed_time = time.perf_counter() - start_time
+    for (expected, _, _), text in zip(corpus, decoded):
+        if text == expected:
+            correct += 1
+    print(f"{label:<22} {elapsed_time:8.3f}s  {elapsed_time / len(corpus) * 1000:7.2f} ms/page  "
+          f"{correct}/{len(corpus)} correct")
+    return elapsed_time
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML decoding over the raw_html corpus')
+    parser.add_argument('--encoding', default='utf-8', help='Re-encode pages in this charset first (default: utf-8)')
+    parser.add_argument('--no-header', action='store_true',
+                        help='Omit the Content-Type charset so the <meta> path is used')
+    args = parser.parse_args()
+
+    content_type = 'text/html' if args.no_header else f'text/html; charset={args.encoding}'
+    corpus = load_corpus(args.encoding, content_type)
+    total_bytes = sum(len(content) for _, content, _ in corpus)
+    print(f"{len(corpus)} pages, {total_bytes / 1024 / 1024:.1f} MB, Content-Type: {content_type}")
+
+    sources = {}
+    for _, content, header in corpus:
+        source = decode_html(content, header)[2]
+        sources[source] = sources.get(source, 0) + 1
+    print("Decoding paths: " + ", ".join(f"{source}={count}" for source, count in sorted(sources.items())))
+
+    detection_time = run('apparent_encoding', lambda content, _: decode_by_detection(content), corpus)
+    declared_time = run('html_decoding', lambda content, header: decode_html(content, header)[0], corpus)
+    print(f"Speedup: {detection_time / declared_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
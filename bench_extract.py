@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Benchmark: per-kind re.findall passes vs. the single-pass asset extractor.
+
+Scans the saved pages (raw_html/ or a crawl store) three ways: the separate
+regex passes list_assets.py used to run, the single-pass extractor in this
+process, and the extractor on a process pool. Reports files/sec for each.
+With --synthetic N the same is done on N pages generated from the saved
+ones, each with asset URLs of its own, without writing them to disk.
+"""
+import argparse
+import itertools
+import re
+import time
+
+import asset_extractor
+from crawl_store import iter_pages
+
+RAW_HTML_DIR = "raw_html"
+
+LEGACY_PATTERNS = {
+    'css': [r'href=["\'](.*?\.css(?:\?[^"\']*)?)["\']'],
+    'js': [r'src=["\'](.*?\.js(?:\?[^"\']*)?)["\']'],
+    'img': [r'src=["\'](.*?\.(jpg|jpeg|png|gif|svg)(?:\?[^"\']*)?)["\']',
+            r'background-image:\s*url\(["\']?(.*?\.(jpg|jpeg|png|gif|svg)(?:\?[^"\'\)]*)?)["\']?\)',
+            r'content=["\'](.*?\.(jpg|jpeg|png|gif|svg)(?:\?[^"\']*)?)["\']'],
+}
+STYLESHEET_PATTERN = r'<link[^>]*rel=["\'](stylesheet|Stylesheet)["\'][^>]*href=["\'](.*?)["\']'
+
+def legacy_passes(contents, jobs=1):
+    """The extraction list_assets.py did before: one re.findall per pattern over every page."""
+    asset_urls = {category: set() for category in asset_extractor.CATEGORIES + ('all',)}
+    for content in contents:
+        for category, patterns in LEGACY_PATTERNS.items():
+            for pattern in patterns:
+                for match in re.findall(pattern, content):
+                    url = match[0] if isinstance(match, tuple) else match
+                    if asset_extractor.is_asset_url(url):
+                        asset_urls[category].add(url)
+                        asset_urls['all'].add(url)
+        for _, url in re.findall(STYLESHEET_PATTERN, content):
+            if url.endswith('.css') or '.css?' in url:
+                asset_urls['css'].add(url)
+                asset_urls['all'].add(url)
+    return asset_urls
+
+def synthetic_pages(pages, count):
+    """count pages cycled from the saved ones, each with a few asset URLs of its own.
+
+    The extra URLs are appended rather than substituted, so generating a
+    page costs next to nothing next to scanning it.
+    """
+    for number, content in zip(range(count), itertools.cycle(pages)):
+        yield (content + f'<link rel="stylesheet" href="/synthetic/{number}.css">\n'
+               f'<img src="/synthetic/{number}.png">\n<script src="/synthetic/{number}.js"></script>\n')
+
+def run(label, scan, make_pages, count, jobs=1):
+    start_time = time.perf_counter()
+    asset_urls = scan(make_pages(), jobs)
+    elapsed_time = time.perf_counter() - start_time
+    print(f"{label:<28} {elapsed_time:8.2f}s  {count / elapsed_time:9.0f} files/sec  "
+          f"{len(asset_urls['all'])} URLs")
+    return asset_urls
+
+def bench(title, make_pages, count, jobs):
+    print(f"{title}: {count} pages")
+    legacy = run('re.findall per kind', legacy_passes, make_pages, count)
+    single = run('single pass', asset_extractor.collect_asset_urls, make_pages, count)
+    if jobs > 1:
+        run(f'single pass, {jobs} processes', asset_extractor.collect_asset_urls, make_pages, count, jobs)
+    for category in asset_extractor.CATEGORIES:
+        missing = single[category] - legacy[category]
+        extra = legacy[category] - single[category]
+        if missing or extra:
+            print(f"  {category}: {len(missing)} URLs only in the single pass, {len(extra)} only in the legacy passes")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark asset URL extraction over the saved pages')
+    parser.add_argument('--store', help='Read pages from this crawl store instead of raw_html/')
+    parser.add_argument('--jobs', type=int, default=asset_extractor.default_jobs(),
+                        help='Worker processes for the pool run (default: one per CPU)')
+    parser.add_argument('--synthetic', type=int, default=0, metavar='N',
+                        help='Also benchmark N pages generated from the saved ones, e.g. 50000')
+    args = parser.parse_args()
+
+    pages = [content for _, content in iter_pages(RAW_HTML_DIR, args.store)]
+    if not pages:
+        print(f"No pages found in {args.store or RAW_HTML_DIR + '/'}")
+        return
+    print(f"{asset_extractor.default_jobs()} CPUs")
+    bench(f"Saved pages ({sum(len(content) for content in pages) / 1024 / 1024:.1f} MB)",
+          lambda: iter(pages), len(pages), args.jobs)
+    if args.synthetic:
+        bench("Synthetic corpus", lambda: synthetic_pages(pages, args.synthetic), args.synthetic, args.jobs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: full BeautifulSoup parse vs. streaming link extraction.
+
+Runs both ways of reading an archive page's post links and next-page link
+over every saved raw_html/arcv_*.html and reports the time and peak memory
+per page. Timing and memory are measured in separate passes, since
+tracemalloc slows the parser down.
+"""
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+import download_blog
+
+RAW_HTML_DIR = "raw_html"
+PAGE_URL = "https://blog.goo.ne.jp/ikuoikuo_2005/arcv/?page=2&c=&st=0"
+
+def full_parse(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return download_blog.extract_post_links(soup, PAGE_URL), download_blog.find_next_page_url(soup, PAGE_URL)
+
+def streaming(html):
+    return download_blog.extract_archive_links(html, PAGE_URL)
+
+def peak_memory(extract, html):
+    """Peak bytes allocated while extracting the links of one page."""
+    tracemalloc.start()
+    try:
+        extract(html)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(label, extract, pages, repeat):
+    # Both paths print progress messages of their own
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            for html in pages:
+                extract(html)
+        elapsed_time = (time.perf_counter() - start_time) / repeat
+        peaks = [peak_memory(extract, html) for html in pages]
+    print(f"{label:<12} {elapsed_time:8.3f}s  {elapsed_time / len(pages) * 1000:7.2f} ms/page  "
+          f"peak {sum(peaks) / len(peaks) / 1024:8.1f} KB/page mean, {max(peaks) / 1024:8.1f} KB max")
+    return elapsed_time, max(peaks)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark archive page link extraction over raw_html/arcv_*.html')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing passes to average (default: 3)')
+    args = parser.parse_args()
+
+    pages = [html_file.read_text(encoding='utf-8') for html_file in sorted(Path(RAW_HTML_DIR).glob("arcv_*.html"))]
+    if not pages:
+        print(f"No arcv_*.html pages found in {RAW_HTML_DIR}/")
+        return
+    print(f"{len(pages)} archive pages, {sum(len(html) for html in pages) / 1024 / 1024:.1f} MB")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mismatches = sum(1 for html in pages if full_parse(html) != streaming(html))
+    full_time, full_peak = run('BeautifulSoup', full_parse, pages, args.repeat)
+    streaming_time, streaming_peak = run('streaming', streaming, pages, args.repeat)
+    print(f"Speedup: {full_time / streaming_time:.1f}x, peak memory {full_peak / streaming_peak:.1f}x lower, "
+          f"{mismatches} pages with different links")
+
+if __name__ == "__main__":
+    main()
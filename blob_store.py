@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Content-addressed storage for downloaded assets.
+
+The same file is often saved under several URL paths (http and https,
+protocol-relative links, query variants, redirects). BlobStore keeps one copy
+of each distinct content under assets/.blobs/<sha256[:2]>/<sha256>, and makes
+the URL paths hard links to it, so duplicates take disk space once.
+The blobs table of the download manifest (asset_manifest.py) records which
+blob every path should hold, committed in batches by the manifest's writer
+thread (a blob_manifest.tsv from earlier runs is imported once); `verify`
+re-hashes the blobs and checks every path against it in bulk. Where hard
+links are not available the path keeps its own copy and is only recorded.
+Linked paths share their bytes, so a stored file must be replaced (written
+elsewhere and renamed over), never rewritten in place.
+
+    python blob_store.py report    # bytes duplicates would save, changes nothing
+    python blob_store.py dedup     # link duplicates in assets/ to their blobs
+    python blob_store.py verify    # check blobs and paths against the manifest
+"""
+import argparse
+import collections
+import hashlib
+import os
+import threading
+import uuid
+
+import asset_manifest
+
+ASSETS_DIR = "assets"
+BLOB_DIR_NAME = ".blobs"
+# Blob manifest written by earlier runs, imported into the download manifest
+LEGACY_MANIFEST_FILE_NAME = "blob_manifest.tsv"
+CHUNK_SIZE = 64 * 1024
+
+def file_digest(path):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def iter_asset_files(assets_dir=ASSETS_DIR):
+    """Yields the downloaded files under assets_dir.
+
+    Assets live in per-host directories; files at the top level are the
+    asset lists and tables, and the blob directory and unfinished .part
+    downloads are skipped.
+    """
+    for root, dirs, files in os.walk(assets_dir):
+        if root == assets_dir:
+            dirs[:] = sorted(d for d in dirs if d != BLOB_DIR_NAME)
+            continue
+        dirs.sort()
+        for name in sorted(files):
+            # Downloads still in progress (see asset_fetcher.py)
+            if name.endswith(('.part', '.part.validator')):
+                continue
+            yield os.path.join(root, name)
+
+def format_bytes(size):
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+class BlobStore:
+    """Blobs named by their SHA-256, with asset paths hard-linked to them."""
+
+    def __init__(self, assets_dir=ASSETS_DIR, manifest=None):
+        """manifest is the asset_manifest.AssetManifest to record blobs in (default: the one in assets_dir)."""
+        self.assets_dir = assets_dir
+        self.blob_dir = os.path.join(assets_dir, BLOB_DIR_NAME)
+        self.legacy_manifest_path = os.path.join(assets_dir, LEGACY_MANIFEST_FILE_NAME)
+        if manifest is None:
+            manifest = asset_manifest.AssetManifest(os.path.join(assets_dir, asset_manifest.MANIFEST_FILE_NAME))
+        self.asset_manifest = manifest
+        self._lock = threading.Lock()
+        self._manifest = None
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def load_manifest(self):
+        """Returns {path relative to assets_dir: digest}."""
+        manifest = self.asset_manifest.blob_digests()
+        if not manifest and os.path.exists(self.legacy_manifest_path):
+            # The last entry for a path wins
+            with open(self.legacy_manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    relpath, _, digest = line.rstrip('\n').partition('\t')
+                    if digest:
+                        manifest[relpath] = digest
+            self.asset_manifest.import_rows(asset_manifest.BLOB_SQL, list(manifest.items()))
+        return manifest
+
+    def add(self, path, digest=None):
+        """Stores the file at path as a blob and links path to it.
+
+        Returns (digest, bytes saved): the file's size if its content was
+        already stored, else 0.
+        """
+        if digest is None:
+            digest = file_digest(path)
+        blob_path = self.blob_path(digest)
+        saved = 0
+        with self._lock:
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                try:
+                    os.link(path, blob_path)
+                except OSError:
+                    # No hard links here: the path keeps its own copy
+                    pass
+            elif not os.path.samefile(path, blob_path):
+                saved = os.path.getsize(path)
+                # Swap the copy for a link to the blob in one rename
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                try:
+                    os.link(blob_path, tmp_path)
+                    os.replace(tmp_path, path)
+                except OSError:
+                    saved = 0
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            if self._manifest is None:
+                self._manifest = self.load_manifest()
+            relpath = os.path.relpath(path, self.assets_dir)
+            if self._manifest.get(relpath) != digest:
+                self._manifest[relpath] = digest
+                self.asset_manifest.record_blob(relpath, digest)
+        return digest, saved
+
+    def dedup(self):
+        """Adds every file under assets_dir; returns (files, distinct contents, bytes saved)."""
+        files = 0
+        digests = set()
+        saved_total = 0
+        for path in iter_asset_files(self.assets_dir):
+            digest, saved = self.add(path)
+            files += 1
+            digests.add(digest)
+            saved_total += saved
+        return files, len(digests), saved_total
+
+    def verify(self):
+        """Re-hashes every blob and checks every manifest path; returns a list of problems."""
+        problems = []
+        for root, _, files in os.walk(self.blob_dir):
+            for name in files:
+                if file_digest(os.path.join(root, name)) != name:
+                    problems.append(f"corrupt blob: {name}")
+        for relpath, digest in sorted(self.load_manifest().items()):
+            path = os.path.join(self.assets_dir, relpath)
+            blob_path = self.blob_path(digest)
+            if not os.path.exists(path):
+                problems.append(f"missing: {relpath}")
+            elif os.path.exists(blob_path) and os.path.samefile(path, blob_path):
+                continue
+            elif file_digest(path) != digest:
+                problems.append(f"modified: {relpath}")
+        return problems
+
+def duplicate_report(assets_dir=ASSETS_DIR):
+    """Hashes the asset tree without changing it.
+
+    Returns (files, bytes of all files, bytes of distinct contents, bytes on
+    disk, groups of paths with the same content); paths already linked to one
+    another are counted once on disk.
+    """
+    by_digest = collections.defaultdict(list)
+    total_bytes = 0
+    inodes = {}
+    for path in iter_asset_files(assets_dir):
+        stat = os.stat(path)
+        total_bytes += stat.st_size
+        inodes[(stat.st_dev, stat.st_ino)] = stat.st_size
+        by_digest[file_digest(path)].append((path, stat.st_size))
+
+    files = sum(len(paths) for paths in by_digest.values())
+    unique_bytes = sum(paths[0][1] for paths in by_digest.values())
+    duplicates = [[path for path, _ in paths] for paths in by_digest.values() if len(paths) > 1]
+    return files, total_bytes, unique_bytes, sum(inodes.values()), duplicates
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Returns the shared store for ASSETS_DIR, opening it on first use; safe from download worker threads."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore(manifest=asset_manifest.get_manifest())
+        return _store
+
+def main():
+    parser = argparse.ArgumentParser(description='Content-addressed storage for downloaded assets')
+    parser.add_argument('command', choices=['report', 'dedup', 'verify'])
+    parser.add_argument('--assets-dir', default=ASSETS_DIR, help=f'Asset directory (default: {ASSETS_DIR})')
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        files, total_bytes, unique_bytes, disk_bytes, duplicates = duplicate_report(args.assets_dir)
+        for paths in duplicates:
+            print("Same content: " + ", ".join(paths))
+        saved = total_bytes - unique_bytes
+        print(f"{files} files, {format_bytes(total_bytes)}; {len(duplicates)} contents stored under more than one path")
+        print(f"Bytes saved by deduplication: {format_bytes(saved)} "
+              f"({saved / total_bytes * 100 if total_bytes else 0:.1f}%), "
+              f"{format_bytes(total_bytes - disk_bytes)} of it already linked")
+    elif args.command == 'dedup':
+        store = BlobStore(args.assets_dir)
+        try:
+            files, distinct, saved = store.dedup()
+        finally:
+            store.asset_manifest.close()
+        print(f"{files} files, {distinct} distinct contents; {format_bytes(saved)} freed")
+    else:
+        store = BlobStore(args.assets_dir)
+        try:
+            problems = store.verify()
+        finally:
+            store.asset_manifest.close()
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} problems found")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import re
 import shutil
-from pathlib import Path
 import urllib.parse
+import asset_paths
+import process_pool
+from crawl_store import CrawlStore, iter_pages, page_count
 
 # 入力と出力のディレクトリ
 RAW_HTML_DIR = "raw_html"
@@ -51,17 +54,24 @@ def is_asset_url(url):
 def create_url_mapping(asset_urls):
     """URLとアセットパスのマッピングを作成"""
     url_mapping = {}
+    # ダウンロード時に記録したURL→保存先パスの表
+    path_table = asset_paths.get_table()
     
     for url in asset_urls:
         normalized_url = normalize_url(url)
         parsed_url = urllib.parse.urlparse(normalized_url)
         
-        # 元のURL（正規化済み）と新しい相対パスのマッピング
-        asset_path = f"/assets/{parsed_url.netloc}{parsed_url.path}"
-        
-        # クエリパラメータがある場合はそのまま維持
-        if parsed_url.query:
-            asset_path += f"?{parsed_url.query}"
+        saved_path = path_table.get(normalized_url)
+        if saved_path:
+            # 表にあるURLは実際の保存先を直接指す（クエリ付きURLもクエリなしのパスになる）
+            asset_path = f"/assets/{saved_path}"
+        else:
+            # 元のURL（正規化済み）と新しい相対パスのマッピング
+            asset_path = f"/assets/{parsed_url.netloc}{parsed_url.path}"
+            
+            # クエリパラメータがある場合はそのまま維持
+            if parsed_url.query:
+                asset_path += f"?{parsed_url.query}"
         
         url_mapping[url] = asset_path
         
@@ -70,110 +80,106 @@ def create_url_mapping(asset_urls):
     
     return url_mapping
 
-def process_html_files(url_mapping):
-    """HTMLファイルを処理して相対パスに変換"""
+# 置換対象の属性（src, background, content はアセットなら何でも、hrefはアセットの拡張子のものだけ）とCSS内のurl()
+# 1つの選択パターンにまとめ、各ファイルを1回の走査で組み立て直す
+ASSET_REFERENCE_PATTERN = re.compile(
+    r'''(?P<attr>href|src|background|content)=(?P<quote>["'])(?P<url>[^"']+)(?P=quote)'''
+    r'''|url\((?P<css_quote>["']?)(?P<css_url>[^"')]+)(?P=css_quote)\)''')
+
+def lookup_asset_path(original_url, url_mapping):
+    """URL（そのまま、または正規化したもの）に対応するアセットパスを返す（対象外ならNone）"""
+    # 内部リンク（#で始まる）やjavascript、mailto: は置換しない
+    if original_url.startswith(('#', 'javascript:', 'mailto:')):
+        return None
+    if original_url in url_mapping:
+        return url_mapping[original_url]
+    return url_mapping.get(normalize_url(original_url))
+
+def rewrite_asset_urls(content, url_mapping):
+    """HTML内のアセットURLをurl_mappingのパスに置き換え、(新しい内容, 置換したURL数)を返す"""
+    replaced_urls = 0
+    
+    def replace(match):
+        nonlocal replaced_urls
+        if match.group('attr'):
+            group = 'url'
+            original_url = match.group('url')
+            # href属性はアセットURLの場合のみ置換（ナビゲーションリンクはそのまま）
+            if match.group('attr') == 'href' and not (is_asset_url(original_url) or
+                                                      is_asset_url(normalize_url(original_url))):
+                return match.group(0)
+        else:
+            group = 'css_url'
+            original_url = match.group('css_url')
+        new_url = lookup_asset_path(original_url, url_mapping)
+        if new_url is None:
+            return match.group(0)
+        replaced_urls += 1
+        start, end = match.span(group)
+        return match.group(0)[:start - match.start()] + new_url + match.group(0)[end - match.start():]
+    
+    return ASSET_REFERENCE_PATTERN.sub(replace, content), replaced_urls
+
+# ワーカープロセスが使うマッピング（プールの起動時に1回だけ渡す。forkの場合はそのまま引き継がれる）
+_worker_url_mapping = None
+
+def _set_url_mapping(url_mapping):
+    global _worker_url_mapping
+    _worker_url_mapping = url_mapping
+
+def _convert_page(page):
+    """(パス, 内容)を変換し、(パス, 新しい内容, 置換したURL数)を返す"""
+    html_path, content = page
+    content, replaced_urls = rewrite_asset_urls(content, _worker_url_mapping)
+    return html_path, content, replaced_urls
+
+def process_html_files(url_mapping, store_path=None, jobs=1):
+    """HTMLファイル（store_pathを指定した場合はクロールストア）を処理して相対パスに変換
+
+    jobsが2以上ならページの変換を複数プロセスで並列に行う（書き出しは入力順なので出力は1プロセスの場合と同じ）
+    """
     # 出力ディレクトリをクリアして作成
     if os.path.exists(LOCAL_HTML_DIR):
         shutil.rmtree(LOCAL_HTML_DIR)
     os.makedirs(LOCAL_HTML_DIR, exist_ok=True)
     
     # raw_htmlディレクトリからすべてのHTMLファイルを取得
-    html_files = list(Path(RAW_HTML_DIR).glob("**/*.html"))
+    total_files = page_count(RAW_HTML_DIR, store_path)
     
-    if not html_files:
+    if not total_files:
         print("No HTML files found in raw_html directory!")
         return
     
-    print(f"Processing {len(html_files)} HTML files...")
-    
-    # URLパターンのリスト（href属性だけは特別扱い）
-    url_patterns = [
-        # src属性（JS、画像に使用）
-        (r'src=["\']([^"\']+)["\']', 'src'),
-        # background属性
-        (r'background=["\']([^"\']+)["\']', 'background'),
-        # CSS内のurl()
-        (r'url\(["\']?([^"\'\)]+)["\']?\)', 'url'),
-        # content属性（画像URLが入っていることがある）
-        (r'content=["\']([^"\']+)["\']', 'content'),
-    ]
-    
-    # href属性を特別に扱うパターン
-    href_pattern = r'href=["\']([^"\']+)["\']'
+    print(f"Processing {total_files} HTML files...")
     
     # 処理されたファイル数
     processed_files = 0
     replaced_urls = 0
     
-    for html_file in html_files:
-        with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
+    store = CrawlStore(store_path) if store_path else None
+    
+    def pages():
+        for html_path, content in iter_pages(RAW_HTML_DIR, store_path):
+            # ストアにはサブディレクトリのコピー元がないので、変換前の内容をそのまま書き出す
+            if store and '/' in html_path:
+                raw_copy = os.path.join(LOCAL_HTML_DIR, html_path)
+                os.makedirs(os.path.dirname(raw_copy), exist_ok=True)
+                with open(raw_copy, 'w', encoding='utf-8', newline='') as f:
+                    f.write(store.get(html_path).content)
+            yield html_path, content
+    
+    # アセット参照をすべて1回の走査で置換する（結果は入力と同じ順に返る）
+    converted_pages = process_pool.imap_ordered(_convert_page, pages(), jobs,
+                                                initializer=_set_url_mapping, initargs=(url_mapping,))
+    for html_path, content, file_replaced_urls in converted_pages:
+        replaced_urls += file_replaced_urls
         
         # 元のファイル名を取得
-        file_name = os.path.basename(html_file)
+        file_name = os.path.basename(html_path)
         
         # 出力ファイルパス
         output_file = os.path.join(LOCAL_HTML_DIR, file_name)
         
-        # href属性を処理（アセットとナビゲーションリンクを区別）
-        href_matches = re.finditer(href_pattern, content)
-        for match in href_matches:
-            original_url = match.group(1)
-            
-            # 内部リンク（#で始まる）やjavascript、mailto: は置換しない
-            if original_url.startswith(('#', 'javascript:', 'mailto:')):
-                continue
-            
-            normalized_url = normalize_url(original_url)
-            
-            # アセットURLの場合のみ置換（CSS など）
-            if is_asset_url(original_url) or is_asset_url(normalized_url):
-                if original_url in url_mapping:
-                    new_url = url_mapping[original_url]
-                    old_attr = f'href="{original_url}"'
-                    new_attr = f'href="{new_url}"'
-                    content = content.replace(old_attr, new_attr)
-                    replaced_urls += 1
-                elif normalized_url in url_mapping:
-                    new_url = url_mapping[normalized_url]
-                    old_attr = f'href="{original_url}"'
-                    new_attr = f'href="{new_url}"'
-                    content = content.replace(old_attr, new_attr)
-                    replaced_urls += 1
-        
-        # その他のアセット属性（src, background, url(), content）を処理
-        for pattern, attr_type in url_patterns:
-            # マッチするすべてのURLを見つける
-            matches = re.finditer(pattern, content)
-            
-            # 各マッチを処理
-            for match in matches:
-                original_url = match.group(1)
-                
-                # 内部リンク（#で始まる）やjavascriptは置換しない
-                if original_url.startswith(('#', 'javascript:', 'mailto:')):
-                    continue
-                
-                normalized_url = normalize_url(original_url)
-                
-                # URLがマッピングに存在するか確認
-                if original_url in url_mapping:
-                    new_url = url_mapping[original_url]
-                    # 元のURLを新しいURLに置換
-                    old_attr = f'{attr_type}="{original_url}"' if attr_type != 'url' else f'url({original_url})'
-                    new_attr = f'{attr_type}="{new_url}"' if attr_type != 'url' else f'url({new_url})'
-                    content = content.replace(old_attr, new_attr)
-                    replaced_urls += 1
-                
-                # 正規化されたURLがマッピングに存在するか確認
-                elif normalized_url in url_mapping:
-                    new_url = url_mapping[normalized_url]
-                    # 元のURLを新しいURLに置換
-                    old_attr = f'{attr_type}="{original_url}"' if attr_type != 'url' else f'url({original_url})'
-                    new_attr = f'{attr_type}="{new_url}"' if attr_type != 'url' else f'url({new_url})'
-                    content = content.replace(old_attr, new_attr)
-                    replaced_urls += 1
-        
         # ファイルを保存
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(content)
@@ -182,10 +188,10 @@ def process_html_files(url_mapping):
         
         # 進捗表示
         if processed_files % 10 == 0:
-            print(f"Processed {processed_files}/{len(html_files)} files...")
+            print(f"Processed {processed_files}/{total_files} files...")
     
     # サブディレクトリをコピー
-    for subdir in os.listdir(RAW_HTML_DIR):
+    for subdir in ([] if store_path else os.listdir(RAW_HTML_DIR)):
         src_dir = os.path.join(RAW_HTML_DIR, subdir)
         if os.path.isdir(src_dir):
             dst_dir = os.path.join(LOCAL_HTML_DIR, subdir)
@@ -197,6 +203,12 @@ def process_html_files(url_mapping):
     print(f"HTML files saved to {LOCAL_HTML_DIR}/")
 
 def main():
+    parser = argparse.ArgumentParser(description='Rewrite asset URLs in the crawled HTML to local paths')
+    parser.add_argument('--store', help='Read pages from this crawl store instead of raw_html/')
+    parser.add_argument('--jobs', type=int, default=process_pool.default_jobs(),
+                        help='Worker processes for converting pages; the output does not depend on it (default: one per CPU)')
+    args = parser.parse_args()
+    
     # アセットURLのリストを読み込む
     asset_urls = load_asset_urls()
     if not asset_urls:
@@ -207,7 +219,7 @@ def main():
     print(f"Created URL mapping for {len(url_mapping)} URLs.")
     
     # HTMLファイルを処理
-    process_html_files(url_mapping)
+    process_html_files(url_mapping, args.store, args.jobs)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
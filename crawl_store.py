@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""Append-only, compressed single-file store for crawled pages.
+
+Each page is one WARC-like record (header lines, blank line, body), compressed
+on its own as a gzip member or a zstd frame, so any record can be read with
+one seek. A sidecar JSON-lines index (<store>.idx) maps each record's URL,
+raw_html-relative path and post ID to its offset and length. The newest
+record for a path wins. Packed loose files are filed under the URL the
+crawlers fetch them from, or under no URL if their path does not say.
+
+    python crawl_store.py pack raw_html raw_html.warc.gz   # loose files -> store
+    python crawl_store.py stats raw_html.warc.gz
+    python crawl_store.py get raw_html.warc.gz ikuoikuo_2005/<post_id>.html
+"""
+import argparse
+import collections
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_SUFFIX = '.idx'
+# Posts are saved as <blog>/<hex post ID>.html
+POST_PATH_PATTERN = re.compile(r'[^/]+/([0-9a-f]{16,})\.html')
+# Archive pages as arcv_<N>.html, monthly pages as month_<YYYYMM>[_page<N>].html
+ARCHIVE_PATH_PATTERN = re.compile(r'arcv_(\d+)\.html')
+MONTH_PATH_PATTERN = re.compile(r'monthly_archives/month_(\d{6})(?:_page(\d+))?\.html')
+DEFAULT_CONTENT_TYPE = 'text/html; charset=utf-8'
+
+Record = collections.namedtuple('Record', 'url path date content')
+
+def post_id_from_path(path):
+    """Returns the post ID for a saved post path (ikuoikuo_2005/<id>.html), or None."""
+    match = POST_PATH_PATTERN.fullmatch(path)
+    return match.group(1) if match else None
+
+def url_for_path(path, base_url):
+    """Returns the URL a raw_html-relative path was crawled from, or None if the path does not say.
+
+    The mapping is the one replay_server.py serves: posts are <base>e/<id>,
+    archive page 1 is <base>arcv and page N <base>arcv/?page=N, and a month's
+    page N is <base>m/<YYYYMM>/<N-1> after its first page <base>m/<YYYYMM>.
+    """
+    post_id = post_id_from_path(path)
+    if post_id:
+        return f"{base_url}e/{post_id}"
+    match = ARCHIVE_PATH_PATTERN.fullmatch(path)
+    if match:
+        page = int(match.group(1))
+        return f"{base_url}arcv" if page == 1 else f"{base_url}arcv/?page={page}"
+    match = MONTH_PATH_PATTERN.fullmatch(path)
+    if match:
+        month_code, page = match.groups()
+        return f"{base_url}m/{month_code}" if page is None else f"{base_url}m/{month_code}/{int(page) - 1}"
+    return None
+
+class CrawlStore:
+    """Random-access reader/writer for a compressed crawl store file."""
+
+    def __init__(self, path, compression=None):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.compression = compression or ('zstd' if path.endswith('.zst') else 'gzip')
+        if self.compression == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+        self._lock = threading.Lock()
+        # key (url, path or post ID) -> index entry of the newest record
+        self.entries = {}
+        self.paths = {}
+        if os.path.exists(self.index_path):
+            self._load_index()
+
+    def _load_index(self):
+        """Reads the index; a last line cut short by a crash during append() is dropped and truncated away."""
+        with open(self.index_path, 'rb') as f:
+            lines = f.read().split(b"\n")
+        valid_length = 0
+        for number, line in enumerate(lines):
+            if line.strip():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    if any(rest.strip() for rest in lines[number + 1:]):
+                        raise
+                    print(f"Dropping the incomplete last line of {self.index_path}", file=sys.stderr)
+                    with open(self.index_path, 'r+b') as f:
+                        f.truncate(valid_length)
+                    return
+                self._add_to_index(entry)
+            valid_length += len(line) + 1
+
+    def _add_to_index(self, entry):
+        self.paths[entry['path']] = entry
+        self.entries[entry['path']] = entry
+        if entry['url']:
+            self.entries[entry['url']] = entry
+        if entry.get('post_id'):
+            self.entries[entry['post_id']] = entry
+
+    def _compress(self, data):
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def _decompress(self, data):
+        if self.compression == 'zstd':
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def append(self, url, path, content, content_type=DEFAULT_CONTENT_TYPE):
+        """Appends a page and indexes it under its URL (None if unknown), path and post ID."""
+        body = content.encode('utf-8') if isinstance(content, str) else content
+        date = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        digest = hashlib.sha256(body).hexdigest()
+        target = f"WARC-Target-URI: {url}\r\n" if url else ""
+        header = (
+            "WARC/1.0\r\n"
+            "WARC-Type: response\r\n"
+            f"{target}"
+            f"WARC-Date: {date}\r\n"
+            f"WARC-Payload-Digest: sha256:{digest}\r\n"
+            f"X-Crawl-Path: {path}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n"
+        ).encode('utf-8')
+        compressed = self._compress(header + body + b"\r\n\r\n")
+
+        with self._lock:
+            with open(self.path, 'ab') as f:
+                offset = f.tell()
+                f.write(compressed)
+            entry = {'url': url, 'path': path, 'post_id': post_id_from_path(path), 'date': date,
+                     'offset': offset, 'length': len(compressed), 'sha256': digest}
+            # The index line is written after the data, so a crash can only lose the newest record
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._add_to_index(entry)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _parse(self, data, entry):
+        header, _, rest = data.partition(b"\r\n\r\n")
+        fields = dict(line.split(': ', 1) for line in header.decode('utf-8').split("\r\n")[1:] if ': ' in line)
+        length = int(fields['Content-Length'])
+        # Decoded as iter_pages() reads loose files, so a page reads the same from either
+        return Record(url=entry['url'], path=entry['path'], date=entry['date'],
+                      content=rest[:length].decode('utf-8', errors='ignore'))
+
+    def _read(self, f, entry):
+        f.seek(entry['offset'])
+        return self._parse(self._decompress(f.read(entry['length'])), entry)
+
+    def get(self, key):
+        """Returns the newest Record for a URL, raw_html-relative path or post ID, or None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        with open(self.path, 'rb') as f:
+            return self._read(f, entry)
+
+    def iter_records(self, prefix=''):
+        """Streams the newest record of every path starting with prefix, in file order."""
+        entries = sorted((entry for path, entry in self.paths.items() if path.startswith(prefix)),
+                         key=lambda entry: entry['offset'])
+        with open(self.path, 'rb') as f:
+            for entry in entries:
+                yield self._read(f, entry)
+
+    def __iter__(self):
+        return self.iter_records()
+
+def iter_pages(raw_dir, store_path=None, subdir=''):
+    """Yields (relative path, content) for saved pages under subdir.
+
+    Reads from the crawl store when store_path is given, otherwise from the
+    loose *.html files under raw_dir. Paths use '/' and are relative to raw_dir.
+    Newlines are translated the same way in both cases, as text-mode open() does.
+    """
+    if store_path:
+        prefix = subdir.rstrip('/') + '/' if subdir else ''
+        for record in CrawlStore(store_path).iter_records(prefix):
+            if record.path.endswith('.html'):
+                yield record.path, record.content.replace('\r\n', '\n').replace('\r', '\n')
+        return
+
+    base_dir = Path(raw_dir)
+    for html_file in base_dir.joinpath(subdir).glob("**/*.html"):
+        with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
+            yield html_file.relative_to(base_dir).as_posix(), f.read()
+
+def page_count(raw_dir, store_path=None, subdir=''):
+    """Number of pages iter_pages would yield, without reading them."""
+    if store_path:
+        prefix = subdir.rstrip('/') + '/' if subdir else ''
+        return sum(1 for path in CrawlStore(store_path).paths
+                   if path.startswith(prefix) and path.endswith('.html'))
+    return sum(1 for _ in Path(raw_dir).joinpath(subdir).glob("**/*.html"))
+
+def pack(raw_dir, store_path, base_url):
+    """Copies the loose pages under raw_dir into a store."""
+    store = CrawlStore(store_path)
+    packed = 0
+    base_dir = Path(raw_dir)
+    for html_file in sorted(base_dir.glob("**/*.html")):
+        path = html_file.relative_to(base_dir).as_posix()
+        if path in store:
+            continue
+        # Keep the saved bytes as they are
+        store.append(url_for_path(path, base_url), path, html_file.read_bytes())
+        packed += 1
+    print(f"Packed {packed} pages into {store_path} ({len(store)} pages total)")
+
+def print_stats(store_path, raw_dir):
+    store = CrawlStore(store_path)
+    store_size = os.path.getsize(store_path) + os.path.getsize(store.index_path)
+    print(f"{store_path}: {len(store)} pages, {store_size / 1024 / 1024:.1f} MB with index, "
+          f"{store.compression} compression")
+    loose_files = list(Path(raw_dir).glob("**/*.html"))
+    if loose_files:
+        loose_size = sum(html_file.stat().st_size for html_file in loose_files)
+        print(f"{raw_dir}/: {len(loose_files)} files, {loose_size / 1024 / 1024:.1f} MB "
+              f"({loose_size / store_size:.1f}x the store)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the compressed crawl store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    pack_parser = subparsers.add_parser('pack', help='Copy loose raw_html pages into a store')
+    pack_parser.add_argument('raw_dir')
+    pack_parser.add_argument('store')
+    pack_parser.add_argument('--base-url', default='https://blog.goo.ne.jp/ikuoikuo_2005/',
+                             help='URL prefix recorded for packed pages')
+    stats_parser = subparsers.add_parser('stats', help='Show record count and size against raw_html/')
+    stats_parser.add_argument('store')
+    stats_parser.add_argument('--raw-dir', default='raw_html')
+    get_parser = subparsers.add_parser('get', help='Print a record by URL, path or post ID')
+    get_parser.add_argument('store')
+    get_parser.add_argument('key')
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        pack(args.raw_dir, args.store, args.base_url)
+    elif args.command == 'stats':
+        print_stats(args.store, args.raw_dir)
+    elif args.command == 'get':
+        record = CrawlStore(args.store).get(args.key)
+        if record is None:
+            print(f"Not found: {args.key}", file=sys.stderr)
+            sys.exit(1)
+        sys.stdout.write(record.content)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Fetches what downloaded stylesheets depend on, and points them at the local copies.
+
+Sprites, background images, fonts and @imported sheets are referenced from
+CSS rather than from the pages, so the page scan never finds them. This stage
+parses every downloaded stylesheet for url() and @import references, resolves
+them against the stylesheet's URL, and hands the ones not yet downloaded to
+the asset downloader, repeating for @imported sheets until nothing new turns
+up. The stylesheets are then rewritten so every reference that was saved
+points at its /assets/... path, and the archive needs no third-party
+requests at view time.
+"""
+import os
+import re
+from pathlib import Path
+from urllib.parse import urldefrag, urljoin
+
+import asset_manifest
+import asset_paths
+import blob_store
+
+ASSETS_DIR = asset_paths.ASSETS_DIR
+LOCAL_PREFIX = '/' + ASSETS_DIR + '/'
+
+# url(x), url('x'), url("x"), and @import 'x' / "x" (@import url(x) is a url())
+CSS_REFERENCE_PATTERN = re.compile(
+    r'''url\(\s*(?P<quote>["']?)(?P<url>[^"')]*?)(?P=quote)\s*\)'''
+    r'''|@import\s+(?P<import_quote>["'])(?P<import_url>[^"']*)(?P=import_quote)''')
+# References that are not files to fetch
+SKIPPED_PREFIXES = ('data:', '#', 'about:', 'javascript:', LOCAL_PREFIX)
+
+def _reference(match):
+    """(group name, reference) of a CSS_REFERENCE_PATTERN match."""
+    group = 'url' if match.group('url') is not None else 'import_url'
+    return group, match.group(group).strip()
+
+def is_fetchable(reference):
+    return bool(reference) and not reference.startswith(SKIPPED_PREFIXES)
+
+def read_css(path):
+    # surrogateescape keeps any undecodable bytes as they were on write-back
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+        return f.read()
+
+def stylesheet_url(relpath, table):
+    """Base URL for the references of a stylesheet saved at relpath (under ASSETS_DIR).
+
+    That is the URL it was downloaded from; for files the path table does not
+    know, the path itself will do, since a saved path keeps its URL's host
+    and directories (a query string only changes the file name).
+    """
+    return table.url_for(relpath) or 'https://' + relpath
+
+def css_references(css_text, base_url):
+    """Absolute URLs (without fragment) of the files a stylesheet references, in order."""
+    urls = []
+    for match in CSS_REFERENCE_PATTERN.finditer(css_text):
+        _, reference = _reference(match)
+        if is_fetchable(reference):
+            urls.append(urldefrag(urljoin(base_url, reference))[0])
+    return urls
+
+def _stylesheets():
+    for path in blob_store.iter_asset_files(ASSETS_DIR):
+        if path.endswith('.css'):
+            yield path, Path(os.path.relpath(path, ASSETS_DIR)).as_posix()
+
+def fetch_dependencies(download):
+    """Downloads what the saved stylesheets reference, recursively; returns the number of URLs requested.
+
+    download(urls) must fetch a list of absolute URLs and record where they
+    were saved in the asset path table, as download_with_progress does.
+    """
+    table = asset_paths.get_table()
+    requested = set()
+    scanned = set()
+    while True:
+        new_urls = []
+        for path, relpath in _stylesheets():
+            if relpath in scanned:
+                continue
+            scanned.add(relpath)
+            for url in css_references(read_css(path), stylesheet_url(relpath, table)):
+                if url not in requested and table.get(url) is None:
+                    requested.add(url)
+                    new_urls.append(url)
+        if not new_urls:
+            return len(requested)
+        print(f"Fetching {len(new_urls)} files referenced from stylesheets...")
+        # @imported sheets saved by this round are scanned by the next
+        download(new_urls)
+
+def rewrite_stylesheet(css_text, base_url, table):
+    """Returns css_text with every saved reference replaced by its local /assets/... path."""
+    def replace(match):
+        group, reference = _reference(match)
+        if not is_fetchable(reference):
+            return match.group(0)
+        url, fragment = urldefrag(urljoin(base_url, reference))
+        relpath = table.get(url)
+        if relpath is None:
+            return match.group(0)
+        local_path = LOCAL_PREFIX + relpath + (f'#{fragment}' if fragment else '')
+        start, end = match.span(group)
+        return match.group(0)[:start - match.start()] + local_path + match.group(0)[end - match.start():]
+
+    return CSS_REFERENCE_PATTERN.sub(replace, css_text)
+
+def rewrite_stylesheets():
+    """Rewrites every saved stylesheet to local paths; returns the number of files changed.
+
+    Files are replaced, not written in place, since the blob store may link
+    several paths to one file; the blob store and the download manifest then
+    take the new content.
+    """
+    table = asset_paths.get_table()
+    manifest = asset_manifest.get_manifest()
+    store = blob_store.get_store()
+    rewritten = 0
+    for path, relpath in _stylesheets():
+        css_text = read_css(path)
+        new_text = rewrite_stylesheet(css_text, stylesheet_url(relpath, table), table)
+        if new_text == css_text:
+            continue
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', errors='surrogateescape', newline='') as f:
+            f.write(new_text)
+        os.replace(tmp_path, path)
+        digest, _ = store.add(path)
+        manifest.file_changed(relpath, os.path.getsize(path), digest)
+        rewritten += 1
+    return rewritten
@@ -0,0 +1,78 @@
+"""Which hosts the asset downloaders fetch from.
+
+Pages reference ad, tracking and logging hosts whose files are useless in an
+offline copy and often fail or time out. A DomainPolicy denies DEFAULT_DENY
+unless told otherwise, and can be narrowed to an allow list. It is configured
+by assets/domain_policy.json, if present:
+
+    {"allow": [], "deny": ["adcdn.goo.ne.jp", "log000.goo.ne.jp"]}
+
+and by --allow-domain / --deny-domain on the command line. A domain also
+covers its subdomains; an empty allow list allows every host not denied, and
+deny wins over allow.
+"""
+import json
+import os
+from urllib.parse import urlparse
+
+POLICY_FILE = os.path.join("assets", "domain_policy.json")
+# Hosts of root-relative URLs on the blog's pages
+DEFAULT_HOST = "blog.goo.ne.jp"
+# Ads, tracking, logging and third-party widgets; used when no policy file sets a deny list
+DEFAULT_DENY = (
+    "adcdn.goo.ne.jp",
+    "log000.goo.ne.jp",
+    "c.amazon-adsystem.com",
+    "platform.twitter.com",
+    "www.googletagmanager.com",
+    "www.google-analytics.com",
+)
+
+def url_host(url):
+    """Host an asset URL is fetched from, resolved as asset_fetcher.normalize_url does.
+
+    Protocol-relative and bare (host/path) URLs are fetched over https, and
+    root-relative ones from DEFAULT_HOST; '' if there is no host.
+    """
+    if url.startswith('//'):
+        url = 'https:' + url
+    elif url.startswith('/'):
+        return DEFAULT_HOST
+    elif '://' not in url:
+        url = 'https://' + url
+    return urlparse(url).hostname or ''
+
+def _matches(host, domains):
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+class DomainPolicy:
+    """Allow/deny lists of asset hosts."""
+
+    def __init__(self, allow=(), deny=DEFAULT_DENY):
+        self.allow = tuple(domain.lower() for domain in allow)
+        self.deny = tuple(domain.lower() for domain in deny)
+
+    @classmethod
+    def load(cls, path=POLICY_FILE, allow=(), deny=()):
+        """Policy from path (defaults if it does not exist), plus the given extra domains."""
+        config = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        return cls(allow=list(config.get('allow', [])) + list(allow),
+                   deny=list(config.get('deny', DEFAULT_DENY)) + list(deny))
+
+    def allows(self, url):
+        host = url_host(url).lower()
+        if not host:
+            return True
+        if _matches(host, self.deny):
+            return False
+        return not self.allow or _matches(host, self.allow)
+
+    def split(self, urls):
+        """Returns (allowed URLs, denied URLs), each in the order given."""
+        allowed, denied = [], []
+        for url in urls:
+            (allowed if self.allows(url) else denied).append(url)
+        return allowed, denied
@@ -1,17 +1,14 @@
 #!/usr/bin/env python3
 import os
-import urllib.parse
-import requests
 import time
-from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
-from urllib.parse import urlparse
-from tqdm import tqdm
+import asset_fetcher
+import asset_manifest
+import blob_store
+import css_assets
+import domain_policy
 
 # アセットを保存するベースディレクトリ
-ASSETS_DIR = "assets"
-# ダウンロード済みURLを記録するファイル
-DOWNLOADED_FILE = os.path.join(ASSETS_DIR, "downloaded_urls.txt")
+ASSETS_DIR = asset_fetcher.ASSETS_DIR
 
 def load_asset_urls():
     """アセットリストファイルからURLを読み込む"""
@@ -30,136 +27,32 @@ def load_asset_urls():
     print(f"Loaded {len(urls)} URLs from {asset_file}")
     return urls
 
-def normalize_url(url):
-    """URLを正規化する（プロトコルがない場合はhttpsを追加）"""
-    if url.startswith('//'):
-        return f'https:{url}'
-    elif url.startswith('/'):
-        # 相対パスの場合はベースURLを追加
-        return f'https://blog.goo.ne.jp{url}'
-    elif not url.startswith(('http://', 'https://')):
-        return f'https://{url}'
-    return url
-
-def get_save_path(url):
-    """URLからファイルを保存するパスを生成する"""
-    parsed_url = urlparse(url)
-    domain = parsed_url.netloc
-    path = parsed_url.path.lstrip('/')
-    
-    # クエリパラメータがある場合、ファイル名にハッシュとして付加する
-    if parsed_url.query:
-        file_path, file_ext = os.path.splitext(path)
-        path = f"{file_path}_{hash(parsed_url.query) % 10000:04d}{file_ext}"
-    
-    # ファイル名がないURLの場合はindex.htmlとする
-    if path.endswith('/') or not path:
-        path = path + 'index.html'
-    
-    # URLに拡張子がない場合
-    if not os.path.splitext(path)[1]:
-        path = path + '.html'
-    
-    return os.path.join(ASSETS_DIR, domain, path)
-
-def load_downloaded_urls():
-    """既にダウンロード済みのURLを読み込む"""
-    downloaded_urls = set()
-    if os.path.exists(DOWNLOADED_FILE):
-        with open(DOWNLOADED_FILE, 'r') as f:
-            for line in f:
-                downloaded_urls.add(line.strip())
-    return downloaded_urls
-
-def save_downloaded_url(url):
-    """ダウンロード済みのURLを保存する"""
-    with open(DOWNLOADED_FILE, 'a') as f:
-        f.write(f"{url}\n")
-
-def download_file(url, downloaded_urls):
-    """指定されたURLからファイルをダウンロードする"""
-    normalized_url = normalize_url(url)
-    
-    # 既にダウンロード済みの場合はスキップ
-    if normalized_url in downloaded_urls:
-        return True
-    
-    save_path = get_save_path(normalized_url)
-    
-    # 保存先ディレクトリが存在しない場合は作成
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    
-    try:
-        # すでにファイルが存在する場合は完了としてマーク
-        if os.path.exists(save_path):
-            save_downloaded_url(normalized_url)
-            return True
-        
-        # ダウンロード実行
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(normalized_url, headers=headers, timeout=10, stream=True)
-        
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            # リダイレクトされた場合は元のURLと実際のURLの両方を記録
-            if response.url != normalized_url:
-                save_downloaded_url(response.url)
-            
-            save_downloaded_url(normalized_url)
-            return True
-        else:
-            print(f"Failed to download: {normalized_url}, status code: {response.status_code}")
-            return False
-    except Exception as e:
-        print(f"Error downloading {normalized_url}: {e}")
-        return False
-
-def download_with_progress(urls, downloaded_urls, max_workers=10):
-    """進捗表示付きで並列ダウンロードする"""
-    remaining_urls = [url for url in urls if normalize_url(url) not in downloaded_urls]
-    
-    if not remaining_urls:
-        print("All files already downloaded")
-        return
-    
-    print(f"Downloading {len(remaining_urls)} files...")
-    
-    with tqdm(total=len(remaining_urls), unit='file') as pbar:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
-            for url in remaining_urls:
-                future = executor.submit(download_file, url, downloaded_urls)
-                future.add_done_callback(lambda p: pbar.update(1))
-                futures.append(future)
-            
-            # すべてのダウンロードが完了するまで待機
-            for future in futures:
-                future.result()
-
 def main():
     import argparse
     
     # コマンドライン引数の解析
     parser = argparse.ArgumentParser(description='Download assets from asset list files')
     parser.add_argument('--threads', type=int, default=10, help='Number of download threads (default: 10)')
-    parser.add_argument('--retry', action='store_true', help='Retry failed downloads')
+    parser.add_argument('--per-host', type=int, default=asset_fetcher.DEFAULT_PER_HOST,
+                        help=f'Max concurrent downloads per host (default: {asset_fetcher.DEFAULT_PER_HOST})')
+    parser.add_argument('--retry', action='store_true', help='Retry only the downloads that failed last time')
+    parser.add_argument('--no-css-deps', action='store_true',
+                        help='Do not fetch files referenced from stylesheets or rewrite them to local paths')
+    parser.add_argument('--allow-domain', action='append', default=[], metavar='DOMAIN',
+                        help='Only download from these domains and their subdomains (repeatable)')
+    parser.add_argument('--deny-domain', action='append', default=[], metavar='DOMAIN',
+                        help=f'Never download from these domains, in addition to {domain_policy.POLICY_FILE} (repeatable)')
     parser.add_argument('--css-only', action='store_true', help='Download only CSS files')
     parser.add_argument('--js-only', action='store_true', help='Download only JS files')
     args = parser.parse_args()
     
     # アセット用ディレクトリを作成
     os.makedirs(ASSETS_DIR, exist_ok=True)
+    # 同時ダウンロード数に合わせてホストごとのkeep-alive接続プールを用意
+    asset_fetcher.configure_session(max_workers=args.threads, per_host=args.per_host)
     
     # ダウンロード済みURLのリストを読み込む
-    downloaded_urls = load_downloaded_urls()
-    if args.retry:
-        downloaded_urls = set()  # リトライモードの場合は全てダウンロード
+    downloaded_urls = asset_fetcher.load_downloaded_urls()
     
     # アセットリストからURLを読み込む
     if args.css_only:
@@ -179,20 +72,45 @@ def main():
     else:
         urls = load_asset_urls()
     
+    # ダウンロードするドメインの許可・拒否リスト（assets/domain_policy.jsonとコマンドライン）
+    policy = domain_policy.DomainPolicy.load(allow=args.allow_domain, deny=args.deny_domain)
+    allowed_urls, denied_urls = policy.split(sorted(urls))
+    urls = set(allowed_urls)
+    print(f"Excluded {len(denied_urls)} URLs on denied domains")
+    
+    # リトライモードの場合は前回失敗したURLだけを対象にする
+    # 最近失敗したURLはステータスに応じた期間（404/410は数日、5xxは1時間）取得しない
+    negative_cache = asset_manifest.get_manifest().negatively_cached()
+    if args.retry:
+        failed_urls = set(asset_manifest.get_manifest().failed_urls())
+        urls = {url for url in urls if asset_fetcher.normalize_url(url) in failed_urls}
+        negative_cache = {}
+        print(f"Retrying {len(urls)} failed downloads")
+    
     # ダウンロード済みファイル数
-    already_downloaded = sum(1 for url in urls if normalize_url(url) in downloaded_urls)
+    already_downloaded = sum(1 for url in urls if asset_fetcher.normalize_url(url) in downloaded_urls)
     print(f"Already downloaded: {already_downloaded} files")
     print(f"Remaining to download: {len(urls) - already_downloaded} files")
     
-    # 並列ダウンロード（進捗表示付き）
+    # 並列ダウンロード（進捗表示付き、表示に必要なCSSから先に取得）
     start_time = time.time()
-    download_with_progress(urls, downloaded_urls, max_workers=args.threads)
+    priority = asset_fetcher.load_priority()
+    asset_fetcher.download_with_progress(urls, downloaded_urls, max_workers=args.threads, per_host=args.per_host,
+                           policy=policy, negative_cache=negative_cache, priority=priority)
+    # CSSが参照する画像・フォント・@importされたCSSも取得し、CSS内の参照をローカルパスに書き換える
+    if not args.no_css_deps:
+        css_assets.fetch_dependencies(lambda css_urls: asset_fetcher.download_with_progress(
+            css_urls, downloaded_urls, max_workers=args.threads, per_host=args.per_host,
+            policy=policy, negative_cache=negative_cache, priority=priority))
+        print(f"Rewrote {css_assets.rewrite_stylesheets()} stylesheets to local asset paths")
+    # マニフェストに残っている記録を書き込む
+    asset_manifest.get_manifest().close()
     elapsed_time = time.time() - start_time
     
     print(f"Download completed in {elapsed_time:.2f} seconds!")
     
     # ダウンロード結果の表示
-    downloaded_files = sum(1 for _ in Path(ASSETS_DIR).rglob('*') if _.is_file() and _.name != 'downloaded_urls.txt')
+    downloaded_files = sum(1 for _ in blob_store.iter_asset_files(ASSETS_DIR))
     print(f"Total files downloaded: {downloaded_files}")
 
 if __name__ == "__main__":
@@ -1,32 +1,55 @@
-import requests
 from bs4 import BeautifulSoup
+import argparse
+import asyncio
+import hashlib
+import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
+from crawl_store import CrawlStore
+from fetch_manifest import FetchManifest, NOT_MODIFIED
+from frontier_store import FrontierStore
+from http_client import download_page
+from link_extractor import extract_listing_links
+from rate_limiter import HostRateLimiter
 
 BASE_URL = "https://blog.goo.ne.jp/ikuoikuo_2005/"
 START_ARCHIVE_URL = urljoin(BASE_URL, "arcv")
 OUTPUT_DIR = "raw_html"
 POST_SUBDIR_NAME = "ikuoikuo_2005" # Subdirectory name for posts
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
+# HTTP validators and content hashes of fetched pages, kept inside OUTPUT_DIR
+MANIFEST_FILENAME = "fetch_manifest.json"
+# High-water mark and archive page fingerprints for --delta crawls, kept inside OUTPUT_DIR
+DELTA_STATE_FILENAME = "delta_state.json"
+# SQLite checkpoint of the crawl frontier, so an interrupted crawl can resume, kept inside OUTPUT_DIR
+FRONTIER_FILENAME = "frontier.sqlite3"
+# Async crawl defaults: requests per second and concurrent requests, per host
+DEFAULT_RATE = 2.0
+DEFAULT_MAX_IN_FLIGHT = 4
+# Max posts waiting in the async crawl's download queue
+DEFAULT_QUEUE_SIZE = 200
 
-def download_page(url):
-    """Downloads the HTML content of a given URL."""
-    print(f"Fetching {url}...")
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        # Explicitly set encoding based on HTTP headers or meta tags if necessary
-        response.encoding = response.apparent_encoding
-        return response.text
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching {url}: {e}")
-        return None
+# Optional single-file crawl store (see crawl_store.py); None saves loose files
+crawl_store = None
+
+def store_path_for(filename, directory):
+    """Returns the OUTPUT_DIR-relative path a page is filed under in the crawl store."""
+    return os.path.relpath(os.path.join(directory, filename), OUTPUT_DIR).replace(os.sep, '/')
 
-def save_html(content, filename, directory):
-    """Saves HTML content to a file in the specified directory."""
+def is_saved(filename, directory):
+    """Returns True if the page is already in the output directory, or in the crawl store if one is used."""
+    if crawl_store is not None:
+        return store_path_for(filename, directory) in crawl_store
+    return os.path.exists(os.path.join(directory, filename))
+
+def save_html(content, filename, directory, url=None):
+    """Saves HTML content to a file in the specified directory, or to the crawl store if one is used."""
+    if crawl_store is not None:
+        path = store_path_for(filename, directory)
+        crawl_store.append(url, path, content)
+        print(f"Saved {path} to {crawl_store.path}")
+        return
     filepath = os.path.join(directory, filename)
     try:
         # Ensure the directory exists before writing
@@ -48,7 +71,66 @@ def get_post_filename(url):
     base = os.path.basename(urlparse(url).path)
     return base + ".html" if base else "unknown_post.html"
 
-def main():
+def select_post_links(main_links, all_links, page_url):
+    """Picks the post links out of an archive page's (text, href) anchors, in page order and without duplicates.
+
+    Links inside div#main are used when there are any; otherwise any post link on the page.
+    """
+    # href -> link text; dicts keep insertion order, so this is an ordered seen-set
+    post_links = {}
+    for text, href in main_links:
+        # Check if it looks like a post link (contains '/e/')
+        if '/e/' in href and href.startswith(BASE_URL):
+            # Avoid duplicates from same page
+            post_links.setdefault(href, text)
+
+    if not post_links:
+        print("No post links found on this archive page. Trying broader search...")
+        # Fallback: find any link containing /e/
+        for text, href in all_links:
+            absolute_href = urljoin(page_url, href)
+            if '/e/' in absolute_href and absolute_href.startswith(BASE_URL):
+                post_links.setdefault(absolute_href, text)
+
+    return [(text, href) for href, text in post_links.items()]
+
+def extract_post_links(soup, page_url):
+    """Finds post links in a parsed archive page, in page order and without duplicates."""
+    # Looking for links within the main article list section
+    article_list_section = soup.find('div', id='main')
+    main_links = ([(link.text.strip(), link['href']) for link in article_list_section.find_all('a', href=True)]
+                  if article_list_section else [])
+    all_links = [(link.text.strip(), link['href']) for link in soup.find_all('a', href=True)]
+    return select_post_links(main_links, all_links, page_url)
+
+def find_next_page_url(soup, page_url):
+    """Returns the absolute URL of the "Next Page" link, or None on the last page."""
+    # Find the "Next Page" link (adjust selector based on actual HTML)
+    next_page_link = soup.find('a', string='次ページ') # Assuming text content identifies the link
+    if next_page_link and next_page_link['href']:
+        return urljoin(page_url, next_page_link['href'])
+    return None
+
+def extract_archive_links(archive_html, page_url):
+    """Returns (post_links, next_url) of an archive page.
+
+    Only the anchors are read, in one streaming pass; the full BeautifulSoup
+    parse is kept as a fallback for pages the streaming pass can't handle.
+    """
+    try:
+        links = extract_listing_links(archive_html)
+    except Exception as e:
+        print(f"Streaming link extraction failed on {page_url} ({e}), parsing the whole page.")
+        links = None
+    if links is not None and links.all_links:
+        next_url = urljoin(page_url, links.next_href) if links.next_href else None
+        return select_post_links(links.main_links, links.all_links, page_url), next_url
+
+    soup = BeautifulSoup(archive_html, 'html.parser')
+    return extract_post_links(soup, page_url), find_next_page_url(soup, page_url)
+
+def prepare_output_dirs():
+    """Creates the output directories and returns the post directory."""
     # Base output directory
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
@@ -56,84 +138,381 @@ def main():
     post_output_dir = os.path.join(OUTPUT_DIR, POST_SUBDIR_NAME)
     if not os.path.exists(post_output_dir):
         os.makedirs(post_output_dir)
+    return post_output_dir
+
+def process_archive_page(archive_url, page_num, manifest=None, frontier_store=None):
+    """Fetches and saves an archive page; returns (post_urls, next_url), or None on failure.
+
+    If the page is unchanged since the last crawl, the links recorded in the
+    manifest are reused and the page is neither parsed nor rewritten.
+    """
+    archive_filename = f"arcv_{page_num}.html"
+    cached_links = None
+    if manifest is not None and is_saved(archive_filename, OUTPUT_DIR):
+        cached_links = manifest.get_links(archive_url)
+
+    archive_html = download_page(archive_url, manifest, conditional=cached_links is not None,
+                                 fetch_log=frontier_store)
+    if archive_html == NOT_MODIFIED:
+        return cached_links
+    if not archive_html:
+        return None
+
+    # Save the current archive page itself
+    save_html(archive_html, archive_filename, OUTPUT_DIR, url=archive_url) # Save in the root output dir
+
+    post_links, next_url = extract_archive_links(archive_html, archive_url)
+    print(f"Found {len(post_links)} potential post links.")
+
+    post_urls = [urljoin(archive_url, href) for title, href in post_links]
+    if manifest is not None:
+        manifest.set_links(archive_url, post_urls, next_url)
+    return post_urls, next_url
+
+def download_post(post_url, post_output_dir, manifest=None, refresh=False, frontier_store=None):
+    """Downloads a post; returns True if a request was made.
+
+    Posts already on disk are skipped, or revalidated with a conditional GET
+    when refresh is set. The outcome is checkpointed in the frontier store.
+    """
+    filename = get_post_filename(post_url)
+    has_local_copy = is_post_saved(post_url, post_output_dir, frontier_store)
+    if has_local_copy and not refresh:
+        print(f"Already downloaded: {filename}, skipping.")
+        if frontier_store is not None:
+            frontier_store.post_done(post_url)
+        return False
+
+    if frontier_store is not None:
+        frontier_store.post_in_flight(post_url)
+    post_html = download_page(post_url, manifest, conditional=has_local_copy, fetch_log=frontier_store)
+    if post_html == NOT_MODIFIED:
+        status = 'not_modified'
+    elif post_html:
+        save_html(post_html, filename, post_output_dir, url=post_url)
+        status = 'saved'
+    else:
+        print(f"Skipping failed download: {post_url}")
+        status = 'failed'
+    if frontier_store is not None:
+        frontier_store.post_done(post_url, succeeded=bool(post_html))
+        frontier_store.index_post(get_post_id(post_url), post_url, store_path_for(filename, post_output_dir), status)
+    return True
+
+def open_manifest():
+    """Loads the fetch manifest kept next to the crawled pages."""
+    return FetchManifest(os.path.join(OUTPUT_DIR, MANIFEST_FILENAME))
+
+def is_post_saved(post_url, post_output_dir, frontier_store=None):
+    """Returns True if the post is already stored.
+
+    With a frontier store each post is looked up on disk at most once per
+    crawl, however many archive pages list it.
+    """
+    filename = get_post_filename(post_url)
+    if frontier_store is None:
+        return is_saved(filename, post_output_dir)
+    return frontier_store.resolve_post(get_post_id(post_url), post_url, store_path_for(filename, post_output_dir),
+                                       lambda: is_saved(filename, post_output_dir))
+
+def open_frontier_store(restart=False):
+    """Opens the frontier checkpoint and resumes its unfinished run, unless restart is set."""
+    frontier_store = FrontierStore(os.path.join(OUTPUT_DIR, FRONTIER_FILENAME))
+    if frontier_store.start(START_ARCHIVE_URL, restart=restart):
+        print(f"Resuming interrupted crawl run {frontier_store.run_id} from {frontier_store.path}")
+    return frontier_store
+
+def close_frontier_store(frontier_store, completed):
+    """Closes the run if it completed and prints its statistics."""
+    frontier_store.finish(completed)
+    frontier_store.print_stats()
+    frontier_store.close()
+
+def get_post_id(url):
+    """Returns the unique post ID (the filename without .html) of a post URL."""
+    return os.path.splitext(get_post_filename(url))[0]
+
+def archive_fingerprint(post_urls):
+    """Order-independent digest of the post IDs listed on an archive page."""
+    post_ids = sorted(set(get_post_id(url) for url in post_urls))
+    return hashlib.sha1('\n'.join(post_ids).encode('utf-8')).hexdigest()
+
+class DeltaState:
+    """Remembers where the last crawl of the newest-first listing ended.
+
+    The listing is ordered newest first, so a delta crawl can stop paginating at
+    the first page that holds nothing new: a page containing the previous
+    high-water mark post, or a page whose posts are all already on disk (and
+    whose fingerprint may also match the last run).
+
+    The new fingerprints and high-water mark are only written once a crawl
+    has completed with every post saved or not modified, so an interrupted
+    or partly failed run never hides posts from the next one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.high_water_mark = None
+        self.fingerprints = {}
+        self.new_high_water_mark = None
+        # Fingerprints of the pages fetched by this crawl, written by save()
+        self.new_fingerprints = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.high_water_mark = state.get('high_water_mark')
+            self.fingerprints = state.get('fingerprints', {})
 
-    current_archive_url = START_ARCHIVE_URL
-    processed_archive_urls = set()
-    page_num = 1
+    def is_last_new_page(self, page_num, post_urls, post_output_dir, frontier_store=None):
+        """Records the page's fingerprint and returns True if pagination can stop after it."""
+        if page_num == 1 and post_urls:
+            self.new_high_water_mark = {'post_id': get_post_id(post_urls[0]), 'url': post_urls[0],
+                                        'recorded_at': time.time()}
 
-    while current_archive_url and current_archive_url not in processed_archive_urls:
+        fingerprint = archive_fingerprint(post_urls)
+        self.new_fingerprints[str(page_num)] = fingerprint
+
+        if self.high_water_mark and self.high_water_mark['post_id'] in (get_post_id(url) for url in post_urls):
+            print(f"Delta: page {page_num} reaches the previous high-water mark {self.high_water_mark['post_id']}.")
+            return True
+        # A matching fingerprint alone is not enough: the posts of that page may never have been saved
+        if not all(is_post_saved(url, post_output_dir, frontier_store) for url in post_urls):
+            return False
+        if fingerprint == self.fingerprints.get(str(page_num)):
+            print(f"Delta: page {page_num} is unchanged since the last crawl and its posts are stored.")
+            return True
+        if post_urls:
+            print(f"Delta: every post on page {page_num} is already stored.")
+            return True
+        return False
+
+    def save(self, completed):
+        """Writes the new fingerprints and high-water mark if the crawl completed with every post stored.
+
+        Otherwise the state of the last such crawl is kept as it is.
+        """
+        if not completed:
+            return
+        self.fingerprints.update(self.new_fingerprints)
+        if self.new_high_water_mark:
+            self.high_water_mark = self.new_high_water_mark
+        state = {'high_water_mark': self.high_water_mark, 'fingerprints': self.fingerprints}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+def open_delta_state(delta):
+    """Loads the delta crawl state when delta mode is on."""
+    return DeltaState(os.path.join(OUTPUT_DIR, DELTA_STATE_FILENAME)) if delta else None
+
+def crawl_sequential(refresh=False, delta=False, restart=False):
+    """Walks the archive pages one by one, sleeping between requests."""
+    post_output_dir = prepare_output_dirs()
+    manifest = open_manifest()
+    delta_state = open_delta_state(delta)
+    frontier_store = open_frontier_store(restart)
+    completed = False
+
+    try:
+        # Posts an interrupted run had queued but not downloaded yet
+        for post_url in frontier_store.pending_posts():
+            if download_post(post_url, post_output_dir, manifest, refresh, frontier_store):
+                time.sleep(1)
+
+        next_archive_page = frontier_store.next_archive_page()
+        while next_archive_page:
+            current_archive_url, page_num = next_archive_page
+            print(f"--- Processing Archive Page {page_num}: {current_archive_url} ---")
+            frontier_store.archive_in_flight(current_archive_url)
+            archive_links = process_archive_page(current_archive_url, page_num, manifest, frontier_store)
+
+            if archive_links is None:
+                frontier_store.archive_failed(current_archive_url)
+                print(f"Failed to download archive page: {current_archive_url}, stopping.")
+                break
+
+            post_urls, next_url = archive_links
+            is_last_new_page = delta_state is not None and delta_state.is_last_new_page(
+                page_num, post_urls, post_output_dir, frontier_store)
+            if is_last_new_page:
+                next_url = None
+            for post_url in frontier_store.archive_done(current_archive_url, post_urls, next_url):
+                if download_post(post_url, post_output_dir, manifest, refresh, frontier_store):
+                    time.sleep(1) # Be polite, wait 1 second between requests
+
+            next_archive_page = frontier_store.next_archive_page()
+            if not next_url and not is_last_new_page:
+                print("No 'Next Page' link found.")
+
+            print("--- Finished Processing Archive Page ---")
+            if next_archive_page:
+                time.sleep(1) # Wait before fetching next archive page
+        else:
+            completed = True
+    finally:
+        manifest.save()
+        if delta_state is not None:
+            delta_state.save(completed and frontier_store.all_posts_done())
+        close_frontier_store(frontier_store, completed)
+
+    print("Blog download process finished.")
+
+async def download_post_async(post_url, post_output_dir, limiter, manifest=None, refresh=False,
+                              frontier_store=None):
+    """Downloads a single post in a worker thread once the host limiter admits the request."""
+    if not refresh and await asyncio.to_thread(is_post_saved, post_url, post_output_dir, frontier_store):
+        print(f"Already downloaded: {get_post_filename(post_url)}, skipping.")
+        if frontier_store is not None:
+            await asyncio.to_thread(frontier_store.post_done, post_url)
+        return
+
+    async with limiter.limit(post_url):
+        await asyncio.to_thread(download_post, post_url, post_output_dir, manifest, refresh, frontier_store)
+
+class CrawlFrontier:
+    """Crawl frontier: archive pages still to visit plus a bounded queue of posts to fetch.
+
+    The archive walker is the producer and the post workers are the consumers.
+    The walker only waits when the queue is full (backpressure), never on an
+    individual post fetch, so pagination keeps moving while posts download.
+    Which pages and posts are pending or done lives in the frontier store, so
+    the queue only ever holds posts that are new to the run.
+    """
+
+    def __init__(self, frontier_store, post_output_dir, queue_size=DEFAULT_QUEUE_SIZE):
+        self.store = frontier_store
+        self.post_output_dir = post_output_dir
+        self.post_queue = asyncio.Queue(maxsize=queue_size)
+
+    async def next_archive_page(self):
+        return await asyncio.to_thread(self.store.next_archive_page)
+
+    async def add_post(self, post_url):
+        await self.post_queue.put(post_url)
+
+async def walk_archive_pages(frontier, limiter, manifest=None, delta_state=None):
+    """Producer: fetches archive pages, queues their posts and follows the next-page link.
+
+    Returns True if pagination ended normally rather than on a failed page.
+    """
+    # Posts an interrupted run had queued but not downloaded yet
+    for post_url in await asyncio.to_thread(frontier.store.pending_posts):
+        await frontier.add_post(post_url)
+
+    next_archive_page = await frontier.next_archive_page()
+    while next_archive_page:
+        current_archive_url, page_num = next_archive_page
         print(f"--- Processing Archive Page {page_num}: {current_archive_url} ---")
-        processed_archive_urls.add(current_archive_url)
-        archive_html = download_page(current_archive_url)
+        await asyncio.to_thread(frontier.store.archive_in_flight, current_archive_url)
+        async with limiter.limit(current_archive_url):
+            archive_links = await asyncio.to_thread(process_archive_page, current_archive_url, page_num,
+                                                    manifest, frontier.store)
 
-        if not archive_html:
+        if archive_links is None:
+            await asyncio.to_thread(frontier.store.archive_failed, current_archive_url)
             print(f"Failed to download archive page: {current_archive_url}, stopping.")
-            break
-
-        # Save the current archive page itself
-        archive_filename = f"arcv_{page_num}.html"
-        save_html(archive_html, archive_filename, OUTPUT_DIR) # Save in the root output dir
-
-        soup = BeautifulSoup(archive_html, 'html.parser')
-
-        # Find post links (adjust selector based on actual HTML structure)
-        # Looking for links within the main article list section
-        post_links = []
-        article_list_section = soup.find('div', id='main') # Heuristic, might need adjustment
-        if article_list_section:
-            for link in article_list_section.find_all('a', href=True):
-                href = link['href']
-                # Check if it looks like a post link (contains '/e/')
-                if '/e/' in href and href.startswith(BASE_URL):
-                     # Avoid duplicates from same page
-                    if href not in [p[1] for p in post_links]:
-                         post_links.append((link.text.strip(), href))
-
-
-        if not post_links:
-             print("No post links found on this archive page. Trying broader search...")
-             # Fallback: find any link containing /e/
-             for link in soup.find_all('a', href=True):
-                 href = link['href']
-                 absolute_href = urljoin(current_archive_url, href)
-                 if '/e/' in absolute_href and absolute_href.startswith(BASE_URL):
-                      if absolute_href not in [p[1] for p in post_links]:
-                         post_links.append((link.text.strip(), absolute_href))
-
-
-        print(f"Found {len(post_links)} potential post links.")
-
-        for title, post_url in post_links:
-             absolute_post_url = urljoin(current_archive_url, post_url)
-             filename = get_post_filename(absolute_post_url)
-             filepath = os.path.join(post_output_dir, filename)
-
-             if not os.path.exists(filepath):
-                 post_html = download_page(absolute_post_url)
-                 if post_html:
-                     save_html(post_html, filename, post_output_dir)
-                     time.sleep(1) # Be polite, wait 1 second between requests
-                 else:
-                     print(f"Skipping failed download: {absolute_post_url}")
-             else:
-                 print(f"Already downloaded: {filename}, skipping.")
-
-
-        # Find the "Next Page" link (adjust selector based on actual HTML)
-        next_page_link = soup.find('a', string='次ページ') # Assuming text content identifies the link
-        if next_page_link and next_page_link['href']:
-            current_archive_url = urljoin(current_archive_url, next_page_link['href'])
-            page_num += 1
-        else:
+            return False
+
+        post_urls, next_url = archive_links
+        if delta_state is not None and delta_state.is_last_new_page(page_num, post_urls, frontier.post_output_dir,
+                                                                    frontier.store):
+            next_url = None
+        elif not next_url:
             print("No 'Next Page' link found.")
-            current_archive_url = None # Stop the loop
+        new_post_urls = await asyncio.to_thread(frontier.store.archive_done, current_archive_url, post_urls, next_url)
+        for post_url in new_post_urls:
+            await frontier.add_post(post_url)
 
-        print("--- Finished Processing Archive Page ---")
-        if current_archive_url:
-            time.sleep(1) # Wait before fetching next archive page
+        next_archive_page = await frontier.next_archive_page()
+    return True
 
+async def post_worker(frontier, post_output_dir, limiter, manifest=None, refresh=False):
+    """Consumer: downloads queued posts until cancelled."""
+    while True:
+        post_url = await frontier.post_queue.get()
+        try:
+            await download_post_async(post_url, post_output_dir, limiter, manifest, refresh, frontier.store)
+        except Exception as e:
+            print(f"Error downloading {post_url}: {e}")
+        finally:
+            frontier.post_queue.task_done()
+
+async def crawl_async(rate=DEFAULT_RATE, max_in_flight=DEFAULT_MAX_IN_FLIGHT, queue_size=DEFAULT_QUEUE_SIZE,
+                      refresh=False, delta=False, restart=False):
+    """Crawls with asyncio: one archive walker feeds a bounded queue drained by post workers.
+
+    Requests share a per-host token bucket that replaces the fixed one-second
+    sleeps of the sequential crawl. One in-flight slot is left to the archive
+    walker, so the next archive page is never stuck behind post downloads.
+    """
+    post_output_dir = prepare_output_dirs()
+    # download_page blocks, so size the thread pool to the in-flight limit
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_in_flight))
+    limiter = HostRateLimiter(rate=rate, max_in_flight=max_in_flight)
+    frontier_store = open_frontier_store(restart)
+    frontier = CrawlFrontier(frontier_store, post_output_dir, queue_size=queue_size)
+    manifest = open_manifest()
+    delta_state = open_delta_state(delta)
+    completed = False
+
+    workers = [asyncio.create_task(post_worker(frontier, post_output_dir, limiter, manifest, refresh))
+               for _ in range(max(1, max_in_flight - 1))]
+    try:
+        pagination_completed = await walk_archive_pages(frontier, limiter, manifest, delta_state)
+        print(f"Waiting for {frontier.post_queue.qsize()} queued post downloads to finish...")
+        await frontier.post_queue.join()
+        completed = pagination_completed
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        manifest.save()
+        if delta_state is not None:
+            delta_state.save(completed and frontier_store.all_posts_done())
+        close_frontier_store(frontier_store, completed)
 
     print("Blog download process finished.")
 
+def configure(base_url=None, output_dir=None, store_path=None):
+    """Points the crawler at another blog root (e.g. a local replay server), output directory or crawl store."""
+    global BASE_URL, START_ARCHIVE_URL, OUTPUT_DIR, crawl_store
+    if base_url:
+        BASE_URL = base_url if base_url.endswith('/') else base_url + '/'
+        START_ARCHIVE_URL = urljoin(BASE_URL, "arcv")
+    if output_dir:
+        OUTPUT_DIR = output_dir
+    crawl_store = CrawlStore(store_path) if store_path else None
+
+def main():
+    parser = argparse.ArgumentParser(description='Download blog archive pages and posts')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Crawl concurrently with asyncio instead of the sequential loop')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'Async mode: max requests per second per host (default: {DEFAULT_RATE})')
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help=f'Async mode: max concurrent requests per host (default: {DEFAULT_MAX_IN_FLIGHT})')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f'Async mode: max posts waiting for download (default: {DEFAULT_QUEUE_SIZE})')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Revalidate already downloaded posts with conditional GETs instead of skipping them')
+    parser.add_argument('--delta', action='store_true',
+                        help='Stop paginating at the first archive page with no new posts')
+    parser.add_argument('--restart', action='store_true',
+                        help='Start a new crawl instead of resuming an interrupted one')
+    parser.add_argument('--base-url', help=f'Blog root to crawl (default: {BASE_URL})')
+    parser.add_argument('--output-dir', help=f'Directory to save pages to (default: {OUTPUT_DIR})')
+    parser.add_argument('--store', help='Save pages into this compressed crawl store (e.g. raw_html.warc.gz) '
+                                        'instead of loose files')
+    args = parser.parse_args()
+    configure(base_url=args.base_url, output_dir=args.output_dir, store_path=args.store)
+
+    if args.use_async:
+        asyncio.run(crawl_async(rate=args.rate, max_in_flight=args.max_in_flight,
+                                queue_size=args.queue_size, refresh=args.refresh,
+                                delta=args.delta, restart=args.restart))
+    else:
+        crawl_sequential(refresh=args.refresh, delta=args.delta, restart=args.restart)
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
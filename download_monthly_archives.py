@@ -1,41 +1,58 @@
-import requests
 from bs4 import BeautifulSoup
+import argparse
+import asyncio
+import json
 import os
-import time
+import re
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
+from crawl_store import CrawlStore
+from fetch_manifest import FetchManifest, NOT_MODIFIED
+from http_client import download_page
+from link_extractor import extract_listing_links
+from rate_limiter import HostRateLimiter
 
 BASE_URL = "https://blog.goo.ne.jp/ikuoikuo_2005/"
 OUTPUT_DIR = "raw_html"
 MONTH_ARCHIVE_DIR = os.path.join(OUTPUT_DIR, "monthly_archives")
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
-
-# List of monthly archive URLs extracted from the HTML
-MONTH_ARCHIVES = [
-    # Format: YYYYMM (Year and Month)
-    "201004", "200911", "200906", "200903", "200902", 
-    "200810", "200809", "200807", "200803", "200802", "200801",
-    "200712", "200711", "200710", "200708", "200707", "200706", "200705", "200704", "200703", "200702", "200701",
-    "200612", "200611", "200610", "200609", "200608", "200607", "200606", "200605", "200604", "200603", "200602", "200601",
-    "200512", "200511", "200510"
-]
-
-def download_page(url):
-    """Downloads the HTML content of a given URL."""
-    print(f"Fetching {url}...")
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        # Explicitly set encoding based on HTTP headers or meta tags if necessary
-        response.encoding = response.apparent_encoding
-        return response.text
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching {url}: {e}")
-        return None
+# Shared with download_blog.py: HTTP validators and content hashes of fetched pages
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, "fetch_manifest.json")
+# Per-month pagination progress, so reruns only fetch the pages that are missing
+CHECKPOINT_FILE = os.path.join(OUTPUT_DIR, "monthly_state.json")
+# Requests per second and concurrent requests, shared by all months
+DEFAULT_RATE = 2.0
+DEFAULT_MAX_IN_FLIGHT = 4
+
+# Month links look like /ikuoikuo_2005/m/YYYYMM
+MONTH_LINK_PATTERN = re.compile(r'/m/(\d{6})/?$')
+
+# Optional single-file crawl store (see crawl_store.py); None saves loose files
+crawl_store = None
+
+def store_path_for(filename, directory):
+    """Returns the OUTPUT_DIR-relative path a page is filed under in the crawl store."""
+    return os.path.relpath(os.path.join(directory, filename), OUTPUT_DIR).replace(os.sep, '/')
 
-def save_html(content, filename, directory):
-    """Saves HTML content to a file in the specified directory."""
+def is_saved(filename, directory):
+    """Returns True if the page is already in the output directory, or in the crawl store if one is used."""
+    if crawl_store is not None:
+        return store_path_for(filename, directory) in crawl_store
+    return os.path.exists(os.path.join(directory, filename))
+
+def load_html(filename, directory):
+    """Reads a saved page back from the output directory or the crawl store."""
+    if crawl_store is not None:
+        return crawl_store.get(store_path_for(filename, directory)).content
+    with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def save_html(content, filename, directory, url=None):
+    """Saves HTML content to a file in the specified directory, or to the crawl store if one is used."""
+    if crawl_store is not None:
+        path = store_path_for(filename, directory)
+        crawl_store.append(url, path, content)
+        print(f"Saved {path} to {crawl_store.path}")
+        return
     filepath = os.path.join(directory, filename)
     try:
         # Ensure the directory exists before writing
@@ -46,53 +63,204 @@ def save_html(content, filename, directory):
     except IOError as e:
         print(f"Error saving {filepath}: {e}")
 
-def main():
+def month_page_filename(month_code, page_num):
+    """month_YYYYMM.html for a month's first page, month_YYYYMM_pageN.html for the ones after it."""
+    if page_num == 1:
+        return f"month_{month_code}.html"
+    return f"month_{month_code}_page{page_num}.html"
+
+def extract_month_codes(soup):
+    """Returns the YYYYMM codes linked from the バックナンバー module, newest first."""
+    back_numbers = soup.find('div', id='mod-back-numbers-scroll')
+    if back_numbers is None:
+        # Fall back to the module's heading if the id ever changes
+        heading = soup.find(lambda tag: tag.name in ('h3', 'h4') and 'バックナンバー' in tag.get_text())
+        back_numbers = heading.find_parent('div', class_='module') if heading else None
+    if back_numbers is None:
+        return []
+
+    month_codes = []
+    for link in back_numbers.find_all('a', href=True):
+        match = MONTH_LINK_PATTERN.search(urlparse(link['href']).path)
+        if match and match.group(1) not in month_codes:
+            month_codes.append(match.group(1))
+    return month_codes
+
+def find_older_page_url(html_content, page_url):
+    """Returns the URL of the month's next (older) page, or None on its last page.
+
+    goo lists a month newest first; the link to the older posts is labelled
+    前ページ and points at /m/YYYYMM/1, /m/YYYYMM/2 and so on. Only the anchors
+    are read, with a full BeautifulSoup parse as the fallback.
+    """
+    try:
+        links = extract_listing_links(html_content)
+    except Exception as e:
+        print(f"Streaming link extraction failed on {page_url} ({e}), parsing the whole page.")
+        links = None
+    if links is not None and links.all_links:
+        return urljoin(page_url, links.prev_href) if links.prev_href else None
+    return find_older_page_url_in_soup(BeautifulSoup(html_content, 'html.parser'), page_url)
+
+def find_older_page_url_in_soup(soup, page_url):
+    """find_older_page_url on an already parsed page."""
+    older_link = soup.select_one('li.mod-pre-nex-prev a[href]')
+    if older_link is None:
+        older_link = soup.find(lambda tag: tag.name == 'a' and tag.has_attr('href') and '前ページ' in tag.get_text())
+    if older_link is None:
+        return None
+    return urljoin(page_url, older_link['href'])
+
+def discover_months(manifest):
+    """Reads the month list from the バックナンバー module of the blog's top page.
+
+    Falls back to a saved monthly page if the top page can't be fetched.
+    """
+    top_html = download_page(BASE_URL, manifest)
+    month_codes = extract_month_codes(BeautifulSoup(top_html, 'html.parser')) if top_html else []
+    if month_codes:
+        return month_codes
+
+    print("Could not read the month list from the top page, trying saved monthly archives...")
+    saved_files = ([os.path.basename(path) for path in crawl_store.paths] if crawl_store is not None
+                   else os.listdir(MONTH_ARCHIVE_DIR))
+    for filename in sorted(name for name in saved_files if re.fullmatch(r'month_\d{6}\.html', name)):
+        month_codes = extract_month_codes(BeautifulSoup(load_html(filename, MONTH_ARCHIVE_DIR), 'html.parser'))
+        if month_codes:
+            return month_codes
+    return []
+
+class MonthCheckpoint:
+    """Per-month pagination progress: pages done, the next page to fetch, and whether the month is complete."""
+
+    def __init__(self, path):
+        self.path = path
+        self.months = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.months = json.load(f).get('months', {})
+
+    def resume_point(self, month_code, month_url, refresh=False):
+        """Returns (page_url, page_num) to continue the month from, or None if it is complete."""
+        month = self.months.get(month_code)
+        if month is None or refresh:
+            return month_url, 1
+        if month['complete']:
+            return None
+        return month['next_url'], month['pages'] + 1
+
+    def page_done(self, month_code, page_num, next_url):
+        """Records a saved page and where the month's pagination continues."""
+        self.months[month_code] = {'pages': page_num, 'next_url': next_url, 'complete': next_url is None}
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'months': self.months}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+def fetch_month_page(page_url, filename, manifest, has_local_copy=False):
+    """Downloads a month page, revalidating a saved copy if there is one; returns its HTML or None on failure."""
+    html_content = download_page(page_url, manifest, conditional=has_local_copy)
+    if html_content == NOT_MODIFIED:
+        return load_html(filename, MONTH_ARCHIVE_DIR)
+    if html_content:
+        save_html(html_content, filename, MONTH_ARCHIVE_DIR, url=page_url)
+    return html_content
+
+async def download_month(month_code, limiter, manifest, checkpoint, refresh=False):
+    """Follows one month's pagination to its last page; returns the number of pages saved."""
+    month_url = urljoin(BASE_URL, f"m/{month_code}")
+    resume_point = checkpoint.resume_point(month_code, month_url, refresh)
+    if resume_point is None:
+        print(f"Month {month_code} is complete, skipping.")
+        return 0
+
+    page_url, page_num = resume_point
+    saved_pages = 0
+    while page_url:
+        filename = month_page_filename(month_code, page_num)
+        has_local_copy = is_saved(filename, MONTH_ARCHIVE_DIR)
+        if has_local_copy and not refresh:
+            # Saved by an earlier run; only its link to the next page is needed
+            print(f"Already downloaded: {filename}, reading saved copy.")
+            html_content = await asyncio.to_thread(load_html, filename, MONTH_ARCHIVE_DIR)
+        else:
+            async with limiter.limit(page_url):
+                html_content = await asyncio.to_thread(fetch_month_page, page_url, filename, manifest, has_local_copy)
+        if not html_content:
+            print(f"Failed to download {page_url}; month {month_code} will resume here next time.")
+            return saved_pages
+
+        next_url = find_older_page_url(html_content, page_url)
+        checkpoint.page_done(month_code, page_num, next_url)
+        saved_pages += 1
+        page_url = next_url
+        page_num += 1
+    return saved_pages
+
+async def download_month_archives(manifest, rate=DEFAULT_RATE, max_in_flight=DEFAULT_MAX_IN_FLIGHT, refresh=False):
+    """Discovers the months and downloads them concurrently under one per-host rate limit."""
+    # download_page blocks, so size the thread pool to the in-flight limit
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_in_flight))
+    month_codes = await asyncio.to_thread(discover_months, manifest)
+    if not month_codes:
+        print("No monthly archives found.")
+        return
+    print(f"Found {len(month_codes)} monthly archives.")
+
+    limiter = HostRateLimiter(rate=rate, max_in_flight=max_in_flight)
+    checkpoint = MonthCheckpoint(CHECKPOINT_FILE)
+    results = await asyncio.gather(*(download_month(month_code, limiter, manifest, checkpoint, refresh)
+                                     for month_code in month_codes), return_exceptions=True)
+    for month_code, result in zip(month_codes, results):
+        if isinstance(result, Exception):
+            print(f"Error downloading month {month_code}: {result}")
+    incomplete = [code for code in month_codes if not checkpoint.months.get(code, {}).get('complete')]
+    if incomplete:
+        print(f"Incomplete months, rerun to resume: {', '.join(incomplete)}")
+
+def crawl_monthly(rate=DEFAULT_RATE, max_in_flight=DEFAULT_MAX_IN_FLIGHT, refresh=False):
+    """Downloads every monthly archive into MONTH_ARCHIVE_DIR (or the crawl store)."""
     # Create output directories if they don't exist
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     os.makedirs(MONTH_ARCHIVE_DIR, exist_ok=True)
-    
-    # Download each monthly archive
-    for month_code in MONTH_ARCHIVES:
-        # Construct the URL for the monthly archive
-        month_url = urljoin(BASE_URL, f"m/{month_code}")
-        
-        # Create a filename based on the month code
-        filename = f"month_{month_code}.html"
-        filepath = os.path.join(MONTH_ARCHIVE_DIR, filename)
-        
-        # Skip if already downloaded
-        if os.path.exists(filepath):
-            print(f"Already downloaded: {filename}, skipping.")
-            continue
-            
-        html_content = download_page(month_url)
-        if html_content:
-            save_html(html_content, filename, MONTH_ARCHIVE_DIR)
-            
-            # Check for pagination in monthly archives
-            soup = BeautifulSoup(html_content, 'html.parser')
-            pagination_links = soup.find_all('a', string=lambda s: s and ('次ページ' in s or 'Next Page' in s))
-            
-            page_num = 2
-            for page_link in pagination_links:
-                if 'href' in page_link.attrs:
-                    next_page_url = urljoin(month_url, page_link['href'])
-                    page_filename = f"month_{month_code}_page{page_num}.html"
-                    page_filepath = os.path.join(MONTH_ARCHIVE_DIR, page_filename)
-                    
-                    if not os.path.exists(page_filepath):
-                        page_html = download_page(next_page_url)
-                        if page_html:
-                            save_html(page_html, page_filename, MONTH_ARCHIVE_DIR)
-                            page_num += 1
-                            time.sleep(1)  # Be polite, wait 1 second between requests
-            
-            # Wait between downloads to be respectful to the server
-            time.sleep(1)
-        else:
-            print(f"Failed to download {month_url}")
-    
+    manifest = FetchManifest(MANIFEST_FILE)
+    try:
+        asyncio.run(download_month_archives(manifest, rate=rate, max_in_flight=max_in_flight, refresh=refresh))
+    finally:
+        manifest.save()
+
     print("Monthly archive download process finished.")
 
+def configure(base_url=None, output_dir=None, store_path=None):
+    """Points the downloader at another blog root (e.g. a local replay server), output directory or crawl store."""
+    global BASE_URL, OUTPUT_DIR, MONTH_ARCHIVE_DIR, MANIFEST_FILE, CHECKPOINT_FILE, crawl_store
+    if base_url:
+        BASE_URL = base_url if base_url.endswith('/') else base_url + '/'
+    if output_dir:
+        OUTPUT_DIR = output_dir
+        MONTH_ARCHIVE_DIR = os.path.join(OUTPUT_DIR, "monthly_archives")
+        MANIFEST_FILE = os.path.join(OUTPUT_DIR, "fetch_manifest.json")
+        CHECKPOINT_FILE = os.path.join(OUTPUT_DIR, "monthly_state.json")
+    crawl_store = CrawlStore(store_path) if store_path else None
+
+def main():
+    parser = argparse.ArgumentParser(description='Download monthly archive pages')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Revalidate already downloaded pages with conditional GETs instead of skipping them')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'Max requests per second (default: {DEFAULT_RATE})')
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help=f'Max concurrent requests (default: {DEFAULT_MAX_IN_FLIGHT})')
+    parser.add_argument('--base-url', help=f'Blog root to crawl (default: {BASE_URL})')
+    parser.add_argument('--output-dir', help=f'Directory to save pages to (default: {OUTPUT_DIR})')
+    parser.add_argument('--store', help='Save pages into this compressed crawl store (e.g. raw_html.warc.gz) '
+                                        'instead of loose files')
+    args = parser.parse_args()
+    configure(base_url=args.base_url, output_dir=args.output_dir, store_path=args.store)
+    crawl_monthly(rate=args.rate, max_in_flight=args.max_in_flight, refresh=args.refresh)
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
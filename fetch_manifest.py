@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Returned by the crawlers' download_page when the server answers 304 (or the body is unchanged)
+NOT_MODIFIED = "__not_modified__"
+# Save to disk after this many updates so a crash loses little
+AUTOSAVE_EVERY = 25
+
+def content_hash(content):
+    """SHA-256 hex digest of a page body (str or bytes)."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+class FetchManifest:
+    """Persistent per-URL record of HTTP validators, content hash and fetch time.
+
+    Stored as JSON: {url: {"etag", "last_modified", "sha256", "fetched_at",
+    "checked_at", "encoding", "encoding_source", "links"}}. "links" is optional and lets a crawler reuse an
+    archive page's post links and next-page URL without re-parsing it on a 304.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def get(self, url):
+        with self._lock:
+            return dict(self.entries.get(url, {}))
+
+    def conditional_headers(self, url):
+        """Returns If-None-Match / If-Modified-Since headers for a previously fetched URL."""
+        entry = self.get(url)
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record(self, url, response, content, encoding=None, encoding_source=None):
+        """Stores the response validators and content hash; returns True if the content changed.
+
+        encoding_source says how the charset was chosen (see html_decoding.choose_encoding).
+        """
+        digest = content_hash(content)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.setdefault(url, {})
+            changed = entry.get('sha256') != digest
+            entry['etag'] = response.headers.get('ETag')
+            entry['last_modified'] = response.headers.get('Last-Modified')
+            entry['sha256'] = digest
+            entry['checked_at'] = now
+            if encoding:
+                entry['encoding'] = encoding
+                entry['encoding_source'] = encoding_source
+            if changed:
+                entry['fetched_at'] = now
+                entry.pop('links', None)
+        self._changed()
+        return changed
+
+    def mark_not_modified(self, url):
+        """Records a successful revalidation (304) of a URL."""
+        with self._lock:
+            self.entries.setdefault(url, {})['checked_at'] = time.time()
+        self._changed()
+
+    def set_links(self, url, post_urls, next_url):
+        """Caches the links parsed from an archive page."""
+        with self._lock:
+            self.entries.setdefault(url, {})['links'] = {'posts': list(post_urls), 'next': next_url}
+        self._changed()
+
+    def get_links(self, url):
+        """Returns (post_urls, next_url) cached for a page, or None."""
+        links = self.get(url).get('links')
+        if links is None:
+            return None
+        return links['posts'], links['next']
+
+    def _changed(self):
+        with self._lock:
+            self._unsaved += 1
+            due = self._unsaved >= AUTOSAVE_EVERY
+        if due:
+            self.save()
+
+    def save(self):
+        """Writes the manifest atomically."""
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self.entries, ensure_ascii=False, indent=1, sort_keys=True)
+                self._unsaved = 0
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
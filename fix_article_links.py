@@ -6,6 +6,21 @@ from pathlib import Path
 # ディレクトリパス
 HTML_DIR = "local_html/ikuoikuo_2005/e"
 
+# パス修正パターン
+PATH_PATTERNS = [
+    # https://blog.goo.ne.jp/ikuoikuo_2005/e/xxx 形式を /ikuoikuo_2005/e/xxx.html に変換
+    (r'href=["\'](https?://blog\.goo\.ne\.jp/ikuoikuo_2005/e/([a-f0-9]+))["\']', r'href="/ikuoikuo_2005/e/\2.html"'),
+    
+    # /assets/blog.goo.ne.jp/ikuoikuo_2005/e/xxx 形式を /ikuoikuo_2005/e/xxx.html に変換
+    (r'href=["\']/?assets/blog\.goo\.ne\.jp/ikuoikuo_2005/e/([a-f0-9]+)["\']', r'href="/ikuoikuo_2005/e/\1.html"'),
+    
+    # 相対パス ../ikuoikuo_2005/e/xxx 形式を /ikuoikuo_2005/e/xxx.html に変換
+    (r'href=["\']\.\./ikuoikuo_2005/e/([a-f0-9]+)["\']', r'href="/ikuoikuo_2005/e/\1.html"'),
+    
+    # /ikuoikuo_2005/e/xxx 形式（.htmlなし）を /ikuoikuo_2005/e/xxx.html に変換
+    (r'href=["\']/?ikuoikuo_2005/e/([a-f0-9]+)["\']((?!\.html).*?)', r'href="/ikuoikuo_2005/e/\1.html"\2'),
+]
+
 def fix_article_links():
     """ブログ記事へのリンクを修正する"""
     html_files = list(Path(HTML_DIR).glob("**/*.html")) + list(Path("local_html/ikuoikuo_2005").glob("*.html"))
@@ -16,21 +31,6 @@ def fix_article_links():
     
     print(f"Processing {len(html_files)} HTML files...")
     
-    # パス修正パターン
-    path_patterns = [
-        # https://blog.goo.ne.jp/ikuoikuo_2005/e/xxx 形式を /ikuoikuo_2005/e/xxx.html に変換
-        (r'href=["\'](https?://blog\.goo\.ne\.jp/ikuoikuo_2005/e/([a-f0-9]+))["\']', r'href="/ikuoikuo_2005/e/\2.html"'),
-        
-        # /assets/blog.goo.ne.jp/ikuoikuo_2005/e/xxx 形式を /ikuoikuo_2005/e/xxx.html に変換
-        (r'href=["\']/?assets/blog\.goo\.ne\.jp/ikuoikuo_2005/e/([a-f0-9]+)["\']', r'href="/ikuoikuo_2005/e/\1.html"'),
-        
-        # 相対パス ../ikuoikuo_2005/e/xxx 形式を /ikuoikuo_2005/e/xxx.html に変換
-        (r'href=["\']\.\./ikuoikuo_2005/e/([a-f0-9]+)["\']', r'href="/ikuoikuo_2005/e/\1.html"'),
-        
-        # /ikuoikuo_2005/e/xxx 形式（.htmlなし）を /ikuoikuo_2005/e/xxx.html に変換
-        (r'href=["\']/?ikuoikuo_2005/e/([a-f0-9]+)["\']((?!\.html).*?)', r'href="/ikuoikuo_2005/e/\1.html"\2'),
-    ]
-    
     modified_files = 0
     modified_links = 0
     
@@ -41,7 +41,7 @@ def fix_article_links():
         original_content = content
         
         # パターンに基づいてパスを修正
-        for pattern, replacement in path_patterns:
+        for pattern, replacement in PATH_PATTERNS:
             # 各置換操作で何個のリンクが変更されたかカウント
             new_content, count = re.subn(pattern, replacement, content)
             modified_links += count
@@ -6,6 +6,18 @@ from pathlib import Path
 # ディレクトリパス
 HTML_DIR = "local_html/ikuoikuo_2005/e"
 
+# パス修正パターン
+PATH_PATTERNS = [
+    # /css/ から始まるパスを /assets/blog.goo.ne.jp/css/ に変換
+    (r'(href=["\'])/css/([^"\']+)(["\'])', r'\1/assets/blog.goo.ne.jp/css/\2\3'),
+    # /js/ から始まるパスを /assets/blog.goo.ne.jp/js/ に変換
+    (r'(src=["\'])/js/([^"\']+)(["\'])', r'\1/assets/blog.goo.ne.jp/js/\2\3'),
+    # /tpl_master/ から始まるパスを /assets/blog.goo.ne.jp/tpl_master/ に変換
+    (r'(href=["\'])/tpl_master/([^"\']+)(["\'])', r'\1/assets/blog.goo.ne.jp/tpl_master/\2\3'),
+    # その他のアセットパス
+    (r'(href=["\']/[^"\']+\.(css|js|jpg|jpeg|png|gif|svg)(?:\?[^"\']*)?["\'])', r'\1'),
+]
+
 def fix_html_paths():
     """HTMLファイル内のパスを修正する"""
     html_files = list(Path(HTML_DIR).glob("**/*.html"))
@@ -16,18 +28,6 @@ def fix_html_paths():
     
     print(f"Processing {len(html_files)} HTML files...")
     
-    # パス修正パターン
-    path_patterns = [
-        # /css/ から始まるパスを /assets/blog.goo.ne.jp/css/ に変換
-        (r'(href=["\'])/css/([^"\']+)(["\'])', r'\1/assets/blog.goo.ne.jp/css/\2\3'),
-        # /js/ から始まるパスを /assets/blog.goo.ne.jp/js/ に変換
-        (r'(src=["\'])/js/([^"\']+)(["\'])', r'\1/assets/blog.goo.ne.jp/js/\2\3'),
-        # /tpl_master/ から始まるパスを /assets/blog.goo.ne.jp/tpl_master/ に変換
-        (r'(href=["\'])/tpl_master/([^"\']+)(["\'])', r'\1/assets/blog.goo.ne.jp/tpl_master/\2\3'),
-        # その他のアセットパス
-        (r'(href=["\']/[^"\']+\.(css|js|jpg|jpeg|png|gif|svg)(?:\?[^"\']*)?["\'])', r'\1'),
-    ]
-    
     modified_files = 0
     
     for html_file in html_files:
@@ -37,7 +37,7 @@ def fix_html_paths():
         original_content = content
         
         # パターンに基づいてパスを修正
-        for pattern, replacement in path_patterns:
+        for pattern, replacement in PATH_PATTERNS:
             content = re.sub(pattern, replacement, content)
         
         # 変更があった場合のみファイルを上書き
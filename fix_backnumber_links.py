@@ -16,10 +16,8 @@ def find_all_html_files(directory):
                 html_files.append(os.path.join(root, file))
     return html_files
 
-def update_backnumber_links(html_content):
-    """Update backnumber links to include .html extension"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
+def update_backnumber_links_in_soup(soup):
+    """Add the .html extension to the backnumber links of a parsed page; returns the number of links changed"""
     # Find the backnumber section
     backnumber_module = soup.find('div', id='mod-back-numbers-scroll')
     if not backnumber_module:
@@ -30,7 +28,7 @@ def update_backnumber_links(html_content):
                 break
     
     if not backnumber_module:
-        return html_content, 0  # No changes made
+        return 0  # No changes made
     
     # Update links in the backnumber module
     link_count = 0
@@ -42,6 +40,14 @@ def update_backnumber_links(html_content):
             a_tag['href'] = href + '.html'
             link_count += 1
     
+    return link_count
+
+def update_backnumber_links(html_content):
+    """Update backnumber links to include .html extension"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    link_count = update_backnumber_links_in_soup(soup)
+    if not link_count:
+        return html_content, 0  # No changes made
     return str(soup), link_count
 
 def main():
@@ -7,10 +7,8 @@ from pathlib import Path
 # ディレクトリパス
 LOCAL_HTML_DIR = "local_html"
 
-def fix_backnumber_links(html_content):
-    """バックナンバーリンクに.htmlを追加する"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
+def fix_backnumber_links_in_soup(soup):
+    """解析済みのページのバックナンバーリンクに.htmlを追加し、(修正前, 修正後)のリストを返す"""
     # バックナンバーセクションを見つける
     backnumber_heading = None
     for heading in soup.find_all('h4'):
@@ -19,15 +17,15 @@ def fix_backnumber_links(html_content):
             break
     
     if not backnumber_heading:
-        return html_content, 0
+        return []
     
     # バックナンバーセクションの下にあるリンクを修正
     module_body = backnumber_heading.find_next_sibling('div', class_='module-body')
     
     if not module_body:
-        return html_content, 0
+        return []
     
-    links_modified = 0
+    changes = []
     
     # すべてのリンクをチェック
     for link in module_body.find_all('a', href=True):
@@ -39,10 +37,20 @@ def fix_backnumber_links(html_content):
             # .html を追加
             new_href = href + '.html'
             link['href'] = new_href
-            links_modified += 1
-            print(f"  修正: {href} -> {new_href}")
+            changes.append((href, new_href))
     
-    return str(soup), links_modified
+    return changes
+
+def fix_backnumber_links(html_content):
+    """バックナンバーリンクに.htmlを追加する"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    changes = fix_backnumber_links_in_soup(soup)
+    for href, new_href in changes:
+        print(f"  修正: {href} -> {new_href}")
+    
+    if not changes:
+        return html_content, 0
+    return str(soup), len(changes)
 
 def process_html_files():
     """すべてのHTMLファイルを処理"""
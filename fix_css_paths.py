@@ -6,6 +6,20 @@ from pathlib import Path
 # ディレクトリパス
 HTML_DIR = "local_html/ikuoikuo_2005"
 
+# パス修正パターン
+PATH_PATTERNS = [
+    # /css/ から始まるパスを /assets/blog.goo.ne.jp/css/ に変換
+    (r'href=["\']\/css\/([^"\']+)["\']', r'href="/assets/blog.goo.ne.jp/css/\1"'),
+    # /js/ から始まるパスを /assets/blog.goo.ne.jp/js/ に変換
+    (r'src=["\']\/js\/([^"\']+)["\']', r'src="/assets/blog.goo.ne.jp/js/\1"'),
+    # /tpl_master/ から始まるパスを /assets/blog.goo.ne.jp/tpl_master/ に変換
+    (r'href=["\']\/tpl_master\/([^"\']+)["\']', r'href="/assets/blog.goo.ne.jp/tpl_master/\1"'),
+    # blog.goo.ne.jp のフルパスをアセットパスに変換
+    (r'href=["\'](https?:\/\/blog\.goo\.ne\.jp\/[^"\']+)["\']', r'href="/assets/blog.goo.ne.jp/\1"'),
+    # i.xgoo.jp のパスをアセットパスに変換
+    (r'(href|src)=["\'](https?:)?\/\/i\.xgoo\.jp\/([^"\']+)["\']', r'\1="/assets/i.xgoo.jp/\3"'),
+]
+
 def fix_html_paths():
     """ikuoikuo_2005ディレクトリ内のHTMLファイルのCSS参照を修正する"""
     html_files = list(Path(HTML_DIR).glob("*.html"))
@@ -16,20 +30,6 @@ def fix_html_paths():
     
     print(f"Processing {len(html_files)} HTML files...")
     
-    # パス修正パターン
-    path_patterns = [
-        # /css/ から始まるパスを /assets/blog.goo.ne.jp/css/ に変換
-        (r'href=["\']\/css\/([^"\']+)["\']', r'href="/assets/blog.goo.ne.jp/css/\1"'),
-        # /js/ から始まるパスを /assets/blog.goo.ne.jp/js/ に変換
-        (r'src=["\']\/js\/([^"\']+)["\']', r'src="/assets/blog.goo.ne.jp/js/\1"'),
-        # /tpl_master/ から始まるパスを /assets/blog.goo.ne.jp/tpl_master/ に変換
-        (r'href=["\']\/tpl_master\/([^"\']+)["\']', r'href="/assets/blog.goo.ne.jp/tpl_master/\1"'),
-        # blog.goo.ne.jp のフルパスをアセットパスに変換
-        (r'href=["\'](https?:\/\/blog\.goo\.ne\.jp\/[^"\']+)["\']', r'href="/assets/blog.goo.ne.jp/\1"'),
-        # i.xgoo.jp のパスをアセットパスに変換
-        (r'(href|src)=["\'](https?:)?\/\/i\.xgoo\.jp\/([^"\']+)["\']', r'\1="/assets/i.xgoo.jp/\3"'),
-    ]
-    
     modified_files = 0
     
     for html_file in html_files:
@@ -39,7 +39,7 @@ def fix_html_paths():
         original_content = content
         
         # パターンに基づいてパスを修正
-        for pattern, replacement in path_patterns:
+        for pattern, replacement in PATH_PATTERNS:
             content = re.sub(pattern, replacement, content)
         
         # 変更があった場合のみファイルを上書き
@@ -54,6 +54,36 @@ def fix_asset_path(path):
     
     return path
 
+def fix_soup_paths(soup):
+    """Fix asset paths in the img tags and image links of a parsed page; returns (label, old, new) for each change"""
+    changes = []
+    
+    # Fix asset paths in img tags
+    for img in soup.find_all('img', src=True):
+        original_src = img['src']
+        new_src = fix_asset_path(original_src)
+        if new_src != original_src:
+            img['src'] = new_src
+            changes.append(('img src', original_src, new_src))
+    
+    # Fix image links in a tags (often galleries or enlarged images)
+    for a in soup.find_all('a', href=True):
+        original_href = a['href']
+        # Only fix image links
+        if any(ext in original_href.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif']):
+            new_href = fix_asset_path(original_href)
+            if new_href != original_href:
+                a['href'] = new_href
+                changes.append(('img href', original_href, new_href))
+        # Specifically check for blogimg.goo.ne.jp links
+        elif 'blogimg.goo.ne.jp' in original_href:
+            new_href = fix_asset_path(original_href)
+            if new_href != original_href:
+                a['href'] = new_href
+                changes.append(('blogimg href', original_href, new_href))
+    
+    return changes
+
 def fix_html_paths(directories):
     """Fix paths in HTML files across multiple directories"""
     total_files = 0
@@ -75,38 +105,12 @@ def fix_html_paths(directories):
             with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
                 soup = BeautifulSoup(f.read(), 'html.parser')
             
-            # Track if any changes were made to this file
-            changes_made = False
-            
-            # Fix asset paths in img tags
-            for img in soup.find_all('img', src=True):
-                original_src = img['src']
-                new_src = fix_asset_path(original_src)
-                if new_src != original_src:
-                    img['src'] = new_src
-                    changes_made = True
-                    print(f"  Fixed img src: {original_src} -> {new_src}")
-            
-            # Fix image links in a tags (often galleries or enlarged images)
-            for a in soup.find_all('a', href=True):
-                original_href = a['href']
-                # Only fix image links
-                if any(ext in original_href.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif']):
-                    new_href = fix_asset_path(original_href)
-                    if new_href != original_href:
-                        a['href'] = new_href
-                        changes_made = True
-                        print(f"  Fixed img href: {original_href} -> {new_href}")
-                # Specifically check for blogimg.goo.ne.jp links
-                elif 'blogimg.goo.ne.jp' in original_href:
-                    new_href = fix_asset_path(original_href)
-                    if new_href != original_href:
-                        a['href'] = new_href
-                        changes_made = True
-                        print(f"  Fixed blogimg href: {original_href} -> {new_href}")
+            changes = fix_soup_paths(soup)
+            for label, original_path, new_path in changes:
+                print(f"  Fixed {label}: {original_path} -> {new_path}")
             
             # Save the modified file if changes were made
-            if changes_made:
+            if changes:
                 with open(html_file, 'w', encoding='utf-8') as f:
                     f.write(str(soup))
                 modified_files += 1
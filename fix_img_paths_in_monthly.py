@@ -10,13 +10,11 @@ HTML_DIRS = [
     "local_html/ikuoikuo_2005/m",  # 月別アーカイブ
 ]
 
-def fix_image_paths(html_content):
-    """Fix image paths in the HTML content"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
+def fix_image_paths_in_soup(soup):
+    """Fix image paths in a parsed page; returns (old, new) for each changed src"""
     # Find all img tags
     img_tags = soup.find_all('img')
-    modified = False
+    changes = []
     
     for img in img_tags:
         if 'src' in img.attrs:
@@ -38,10 +36,18 @@ def fix_image_paths(html_content):
                         # 新しいパスを構築
                         new_src = f"/assets/blogimg.goo.ne.jp/user_image/{path_parts}"
                         img['src'] = new_src
-                        modified = True
-                        print(f"Fixed: {src} -> {new_src}")
+                        changes.append((src, new_src))
+    
+    return changes
+
+def fix_image_paths(html_content):
+    """Fix image paths in the HTML content"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    changes = fix_image_paths_in_soup(soup)
+    for src, new_src in changes:
+        print(f"Fixed: {src} -> {new_src}")
     
-    if modified:
+    if changes:
         return str(soup)
     else:
         return html_content
@@ -60,6 +60,46 @@ def fix_internal_link(href):
     
     return href
 
+def fix_soup_paths(soup):
+    """Fix asset paths and internal links in a parsed page; returns (label, old, new) for each change"""
+    changes = []
+    
+    # Fix asset paths in link tags (CSS)
+    for link in soup.find_all('link', href=True):
+        original_href = link['href']
+        new_href = fix_asset_path(original_href)
+        if new_href != original_href:
+            link['href'] = new_href
+            changes.append(('asset', original_href, new_href))
+    
+    # Fix asset paths in script tags (JS)
+    for script in soup.find_all('script', src=True):
+        original_src = script['src']
+        new_src = fix_asset_path(original_src)
+        if new_src != original_src:
+            script['src'] = new_src
+            changes.append(('asset', original_src, new_src))
+    
+    # Fix asset paths in img tags
+    for img in soup.find_all('img', src=True):
+        original_src = img['src']
+        new_src = fix_asset_path(original_src)
+        if new_src != original_src:
+            img['src'] = new_src
+            changes.append(('asset', original_src, new_src))
+    
+    # Fix internal links in a tags
+    for a in soup.find_all('a', href=True):
+        original_href = a['href']
+        # Only fix internal blog links
+        if 'ikuoikuo_2005' in original_href or '/m/' in original_href or '/e/' in original_href:
+            new_href = fix_internal_link(original_href)
+            if new_href != original_href:
+                a['href'] = new_href
+                changes.append(('link', original_href, new_href))
+    
+    return changes
+
 def fix_html_paths():
     """Fix paths in HTML files"""
     html_files = list(Path(MONTHLY_ARCHIVE_DIR).glob("**/*.html"))
@@ -78,49 +118,12 @@ def fix_html_paths():
         with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
             soup = BeautifulSoup(f.read(), 'html.parser')
         
-        # Track if any changes were made to this file
-        changes_made = False
-        
-        # Fix asset paths in link tags (CSS)
-        for link in soup.find_all('link', href=True):
-            original_href = link['href']
-            new_href = fix_asset_path(original_href)
-            if new_href != original_href:
-                link['href'] = new_href
-                changes_made = True
-                print(f"  Fixed asset: {original_href} -> {new_href}")
-        
-        # Fix asset paths in script tags (JS)
-        for script in soup.find_all('script', src=True):
-            original_src = script['src']
-            new_src = fix_asset_path(original_src)
-            if new_src != original_src:
-                script['src'] = new_src
-                changes_made = True
-                print(f"  Fixed asset: {original_src} -> {new_src}")
-        
-        # Fix asset paths in img tags
-        for img in soup.find_all('img', src=True):
-            original_src = img['src']
-            new_src = fix_asset_path(original_src)
-            if new_src != original_src:
-                img['src'] = new_src
-                changes_made = True
-                print(f"  Fixed asset: {original_src} -> {new_src}")
-        
-        # Fix internal links in a tags
-        for a in soup.find_all('a', href=True):
-            original_href = a['href']
-            # Only fix internal blog links
-            if 'ikuoikuo_2005' in original_href or '/m/' in original_href or '/e/' in original_href:
-                new_href = fix_internal_link(original_href)
-                if new_href != original_href:
-                    a['href'] = new_href
-                    changes_made = True
-                    print(f"  Fixed link: {original_href} -> {new_href}")
+        changes = fix_soup_paths(soup)
+        for label, original_path, new_path in changes:
+            print(f"  Fixed {label}: {original_path} -> {new_path}")
         
         # Save the modified file if changes were made
-        if changes_made:
+        if changes:
             with open(html_file, 'w', encoding='utf-8') as f:
                 f.write(str(soup))
             modified_files += 1
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""SQLite checkpoint of the blog crawl frontier.
+
+Every state change of a crawl run is committed as it happens: archive pages
+(pending, in flight, done, failed) with their next-page pointer, the post links
+each page yielded, and a log of every fetch with its status code. A crawl that
+dies part-way leaves its run open, and the next crawl resumes it from the first
+unfinished archive page and the posts that were still queued.
+
+Across runs it also keeps a post index (post ID -> saved file and status), and
+answers "is this post stored?" at most once per crawl for each post.
+
+    python frontier_store.py stats raw_html/frontier.sqlite3
+"""
+import argparse
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    start_url TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS archive_pages (
+    run_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    page_num INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    next_url TEXT,
+    post_count INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, url)
+);
+CREATE TABLE IF NOT EXISTS posts (
+    run_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    archive_url TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, url)
+);
+CREATE TABLE IF NOT EXISTS fetches (
+    run_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    elapsed REAL NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS post_index (
+    post_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_state ON posts (run_id, state);
+CREATE INDEX IF NOT EXISTS fetches_run ON fetches (run_id, fetched_at);
+"""
+
+# Post index statuses that mean the post is stored
+SAVED_STATUSES = ('saved', 'not_modified')
+
+class FrontierStore:
+    """Transactional frontier for one crawl run at a time; safe to share between worker threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = None
+        self._lock = threading.Lock()
+        # post ID -> post index status, for posts already resolved during this crawl
+        self._resolved_posts = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, params).fetchall()
+
+    def start(self, start_url, restart=False):
+        """Resumes the last unfinished run, or starts a new one; returns True when resuming."""
+        with self._lock, self._db:
+            row = self._db.execute("SELECT id FROM runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1").fetchone()
+            if row and not restart:
+                self.run_id = row[0]
+                # Whatever was in flight when the last run died has to be fetched again
+                now = time.time()
+                self._db.execute("UPDATE archive_pages SET state = 'pending', updated_at = ? "
+                                 "WHERE run_id = ? AND state IN ('in_flight', 'failed')", (now, self.run_id))
+                self._db.execute("UPDATE posts SET state = 'pending', updated_at = ? "
+                                 "WHERE run_id = ? AND state = 'in_flight'", (now, self.run_id))
+                return True
+            if row:
+                self._db.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), row[0]))
+            now = time.time()
+            self.run_id = self._db.execute("INSERT INTO runs (start_url, started_at) VALUES (?, ?)",
+                                           (start_url, now)).lastrowid
+            self._db.execute("INSERT INTO archive_pages (run_id, url, page_num, updated_at) VALUES (?, ?, 1, ?)",
+                             (self.run_id, start_url, now))
+            return False
+
+    def next_archive_page(self):
+        """Returns (url, page_num) of the first archive page still to fetch, or None."""
+        rows = self._execute("SELECT url, page_num FROM archive_pages WHERE run_id = ? AND state = 'pending' "
+                             "ORDER BY page_num LIMIT 1", (self.run_id,))
+        return rows[0] if rows else None
+
+    def pending_posts(self):
+        """Post URLs discovered by this run that have not been downloaded yet, in discovery order."""
+        rows = self._execute("SELECT url FROM posts WHERE run_id = ? AND state = 'pending' ORDER BY rowid",
+                             (self.run_id,))
+        return [url for url, in rows]
+
+    def archive_in_flight(self, url):
+        self._execute("UPDATE archive_pages SET state = 'in_flight', updated_at = ? WHERE run_id = ? AND url = ?",
+                      (time.time(), self.run_id, url))
+
+    def archive_failed(self, url):
+        self._execute("UPDATE archive_pages SET state = 'failed', updated_at = ? WHERE run_id = ? AND url = ?",
+                      (time.time(), self.run_id, url))
+
+    def archive_done(self, url, post_urls, next_url):
+        """Checkpoints a fetched archive page in one transaction; returns the post URLs new to this run.
+
+        The page's posts and its next-page pointer are stored together with the
+        page's done state, so a crash never loses the links of a finished page.
+        A next page this run has already seen is not queued again.
+        """
+        now = time.time()
+        new_post_urls = []
+        with self._lock, self._db:
+            for post_url in post_urls:
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO posts (run_id, url, archive_url, updated_at) VALUES (?, ?, ?, ?)",
+                    (self.run_id, post_url, url, now)).rowcount
+                if inserted:
+                    new_post_urls.append(post_url)
+            page_num, = self._db.execute("SELECT page_num FROM archive_pages WHERE run_id = ? AND url = ?",
+                                         (self.run_id, url)).fetchone()
+            self._db.execute("UPDATE archive_pages SET state = 'done', next_url = ?, post_count = ?, updated_at = ? "
+                             "WHERE run_id = ? AND url = ?", (next_url, len(post_urls), now, self.run_id, url))
+            if next_url:
+                self._db.execute("INSERT OR IGNORE INTO archive_pages (run_id, url, page_num, updated_at) "
+                                 "VALUES (?, ?, ?, ?)", (self.run_id, next_url, page_num + 1, now))
+        return new_post_urls
+
+    def post_in_flight(self, url):
+        self._set_post_state(url, 'in_flight')
+
+    def post_done(self, url, succeeded=True):
+        self._set_post_state(url, 'done' if succeeded else 'failed')
+
+    def _set_post_state(self, url, state):
+        self._execute("UPDATE posts SET state = ?, updated_at = ? WHERE run_id = ? AND url = ?",
+                      (state, time.time(), self.run_id, url))
+
+    def all_posts_done(self):
+        """Returns True if every post this run discovered was saved or found stored (none failed or unfinished)."""
+        rows = self._execute("SELECT COUNT(*) FROM posts WHERE run_id = ? AND state != 'done'", (self.run_id,))
+        return rows[0][0] == 0
+
+    def resolve_post(self, post_id, url, path, is_saved):
+        """Returns True if the post is stored, calling is_saved() only the first time per crawl.
+
+        A post found on disk (or in the crawl store) is recorded in the post index.
+        """
+        with self._lock:
+            status = self._resolved_posts.get(post_id)
+        if status is None:
+            status = 'saved' if is_saved() else 'missing'
+            entry = self.get_post(post_id) if status == 'saved' else None
+            if status == 'saved' and (entry is None or entry['status'] not in SAVED_STATUSES or entry['path'] != path):
+                self.index_post(post_id, url, path, status)
+            else:
+                with self._lock:
+                    self._resolved_posts[post_id] = status
+        return status in SAVED_STATUSES
+
+    def index_post(self, post_id, url, path, status):
+        """Records where a post is stored and how its last download went ('saved', 'not_modified' or 'failed')."""
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO post_index (post_id, url, path, status, updated_at) VALUES (?, ?, ?, ?, ?) "
+                             "ON CONFLICT (post_id) DO UPDATE SET url = excluded.url, path = excluded.path, "
+                             "status = excluded.status, updated_at = excluded.updated_at",
+                             (post_id, url, path, status, time.time()))
+            self._resolved_posts[post_id] = status
+
+    def get_post(self, post_id):
+        """Returns the post index entry for a post ID as a dict, or None."""
+        rows = self._execute("SELECT url, path, status, updated_at FROM post_index WHERE post_id = ?", (post_id,))
+        return dict(zip(('url', 'path', 'status', 'updated_at'), rows[0])) if rows else None
+
+    def record_fetch(self, url, status, elapsed):
+        """Logs one HTTP fetch; status is the status code or the name of the network error."""
+        self._execute("INSERT INTO fetches (run_id, url, status, elapsed, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                      (self.run_id, url, str(status), elapsed, time.time()))
+
+    def finish(self, completed):
+        """Closes the run if it completed; an incomplete run stays open to be resumed."""
+        if completed:
+            self._execute("UPDATE runs SET finished_at = ?, completed = 1 WHERE id = ?", (time.time(), self.run_id))
+
+    def stats(self, run_id=None):
+        """Progress and throughput of a run (the current or latest one by default)."""
+        if run_id is None:
+            run_id = self.run_id
+        if run_id is None:
+            rows = self._execute("SELECT MAX(id) FROM runs")
+            run_id = rows[0][0]
+        run = self._execute("SELECT started_at, finished_at, completed FROM runs WHERE id = ?", (run_id,))
+        if not run:
+            return None
+        started_at, finished_at, completed = run[0]
+        fetch_count, first_fetch, last_fetch, total_elapsed = self._execute(
+            "SELECT COUNT(*), MIN(fetched_at), MAX(fetched_at), SUM(elapsed) FROM fetches WHERE run_id = ?",
+            (run_id,))[0]
+        duration = (last_fetch - first_fetch) if fetch_count > 1 else 0.0
+        return {
+            'run_id': run_id,
+            'started_at': started_at,
+            'finished_at': finished_at,
+            'completed': bool(completed),
+            'archive_pages': dict(self._execute(
+                "SELECT state, COUNT(*) FROM archive_pages WHERE run_id = ? GROUP BY state", (run_id,))),
+            'posts': dict(self._execute(
+                "SELECT state, COUNT(*) FROM posts WHERE run_id = ? GROUP BY state", (run_id,))),
+            'fetches': fetch_count,
+            'pages_per_second': fetch_count / duration if duration else None,
+            'mean_fetch_seconds': total_elapsed / fetch_count if fetch_count else None,
+            'statuses': dict(self._execute(
+                "SELECT status, COUNT(*) FROM fetches WHERE run_id = ? GROUP BY status ORDER BY status", (run_id,))),
+            'post_index': dict(self._execute("SELECT status, COUNT(*) FROM post_index GROUP BY status")),
+        }
+
+    def print_stats(self, run_id=None):
+        stats = self.stats(run_id)
+        if stats is None:
+            print("No crawl runs recorded.")
+            return
+        state = 'completed' if stats['completed'] else ('abandoned' if stats['finished_at'] else 'unfinished')
+        print(f"Crawl run {stats['run_id']} ({state}, started "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats['started_at']))})")
+        for label in ('archive_pages', 'posts', 'post_index'):
+            counts = ", ".join(f"{key}={count}" for key, count in sorted(stats[label].items())) or "none"
+            print(f"  {label.replace('_', ' ')}: {counts}")
+        throughput = f"{stats['pages_per_second']:.2f} pages/sec" if stats['pages_per_second'] else "n/a"
+        mean_fetch = f", {stats['mean_fetch_seconds'] * 1000:.0f} ms mean" if stats['mean_fetch_seconds'] else ""
+        print(f"  fetches: {stats['fetches']} ({throughput}{mean_fetch})")
+        failures = {status: count for status, count in stats['statuses'].items() if status not in ('200', '304')}
+        if failures:
+            print("  failures by status: " + ", ".join(f"{status}={count}" for status, count in failures.items()))
+
+    def close(self):
+        self._db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect the crawl frontier checkpoint')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    stats_parser = subparsers.add_parser('stats', help='Show progress, pages/sec and failures by status')
+    stats_parser.add_argument('db', help='Frontier database, e.g. raw_html/frontier.sqlite3')
+    stats_parser.add_argument('--run', type=int, help='Run ID (default: the latest run)')
+    args = parser.parse_args()
+
+    store = FrontierStore(args.db)
+    try:
+        store.print_stats(args.run)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Deterministic decoding of fetched HTML.
+
+The charset is taken from, in order: a byte-order mark, the HTTP Content-Type
+header, and a <meta charset> / http-equiv declaration in the first few KB.
+Statistical detection over the body only runs when none of these is present.
+"""
+import codecs
+import email.message
+import re
+
+try:
+    from charset_normalizer import detect
+except ImportError:  # requests may be installed with chardet instead
+    from chardet import detect
+
+# How much of the body to search for a <meta> charset declaration
+META_SNIFF_BYTES = 4096
+META_CHARSET_PATTERN = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+# Labels Japanese pages declare that Python's codecs treat too strictly
+ENCODING_ALIASES = {
+    'shift_jis': 'cp932',
+    'shift-jis': 'cp932',
+    'sjis': 'cp932',
+    'x-sjis': 'cp932',
+    'windows-31j': 'cp932',
+}
+FALLBACK_ENCODING = 'utf-8'
+
+def normalize_encoding(label):
+    """Maps a declared charset label to a Python codec name, or None if it is unknown."""
+    if not label:
+        return None
+    label = label.strip().strip('"\'').lower()
+    label = ENCODING_ALIASES.get(label, label)
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+def charset_from_content_type(content_type):
+    """Returns the charset parameter of a Content-Type header value, if any."""
+    if not content_type:
+        return None
+    message = email.message.Message()
+    message['Content-Type'] = content_type
+    return message.get_param('charset')
+
+def charset_from_meta(content):
+    """Returns the charset declared by a <meta> tag near the start of the body, if any."""
+    match = META_CHARSET_PATTERN.search(content[:META_SNIFF_BYTES])
+    return match.group(1).decode('ascii', 'ignore') if match else None
+
+def choose_encoding(content, content_type=None):
+    """Returns (encoding, source); source is 'bom', 'http-header', 'meta' or 'detected'."""
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding, 'bom'
+
+    encoding = normalize_encoding(charset_from_content_type(content_type))
+    if encoding:
+        return encoding, 'http-header'
+
+    encoding = normalize_encoding(charset_from_meta(content))
+    if encoding:
+        return encoding, 'meta'
+
+    encoding = normalize_encoding(detect(content).get('encoding'))
+    return encoding or FALLBACK_ENCODING, 'detected'
+
+def decode_html(content, content_type=None):
+    """Decodes an HTML body; returns (text, encoding, source).
+
+    Undecodable bytes are replaced rather than raising, so a page with a few
+    broken characters is still saved.
+    """
+    encoding, source = choose_encoding(content, content_type)
+    return content.decode(encoding, errors='replace'), encoding, source
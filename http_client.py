@@ -0,0 +1,121 @@
+"""Shared HTTP client for the crawlers and asset downloaders.
+
+Every request goes through one requests.Session, which keeps a keep-alive
+connection pool per host and retries transient failures (connection errors,
+timeouts, 429 and 5xx) with jittered exponential backoff.
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from fetch_manifest import NOT_MODIFIED
+from html_decoding import decode_html
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+TIMEOUT = 10
+# Retries after the first attempt; waits are BACKOFF_FACTOR * 2**n plus up to BACKOFF_JITTER seconds
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Hosts to keep pools for, and keep-alive connections per host
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+class JitteredRetry(Retry):
+    """Retry with up to BACKOFF_JITTER random seconds added to every backoff.
+
+    urllib3 2 has a backoff_jitter argument, but 1.26, which older requests
+    installs still pull in, rejects it, so the jitter is added here.
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, BACKOFF_JITTER) if backoff > 0 else backoff
+
+def create_session(pool_maxsize=POOL_MAXSIZE, max_retries=MAX_RETRIES, pool_connections=POOL_CONNECTIONS):
+    """Builds a session with per-host connection pools, retries and the shared headers."""
+    retry = JitteredRetry(
+        total=max_retries,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        backoff_factor=BACKOFF_FACTOR,
+        respect_retry_after_header=True,
+        # Hand the last response back instead of raising, so callers see the status code
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def configure(pool_maxsize=POOL_MAXSIZE, max_retries=MAX_RETRIES, pool_connections=POOL_CONNECTIONS):
+    """Replaces the shared session, e.g. to size the pools for the number of worker threads."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = create_session(pool_maxsize=pool_maxsize, max_retries=max_retries,
+                                  pool_connections=pool_connections)
+
+def get_session():
+    """Returns the shared session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+def get(url, headers=None, timeout=TIMEOUT, **kwargs):
+    """GET through the shared session; extra headers are added to the shared ones."""
+    return get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+
+def download_page(url, manifest=None, conditional=False, fetch_log=None):
+    """Downloads the HTML content of a given URL.
+
+    With a manifest the response validators are recorded; with conditional=True
+    they are also sent, and NOT_MODIFIED is returned if the page is unchanged.
+    A fetch_log (see frontier_store.py) is told the outcome of every request.
+    """
+    print(f"Fetching {url}...")
+    headers = {}
+    if manifest is not None and conditional:
+        headers.update(manifest.conditional_headers(url))
+    start_time = time.perf_counter()
+    try:
+        response = get(url, headers=headers)
+        if fetch_log is not None:
+            fetch_log.record_fetch(url, response.status_code, time.perf_counter() - start_time)
+        if response.status_code == 304 and manifest is not None:
+            manifest.mark_not_modified(url)
+            print(f"Not modified: {url}")
+            return NOT_MODIFIED
+        response.raise_for_status()  # Raise an exception for bad status codes
+        # Use the declared charset (HTTP header, then <meta>); only detect when neither exists
+        text, encoding, encoding_source = decode_html(response.content, response.headers.get('Content-Type'))
+        if encoding_source == 'detected':
+            print(f"No charset declared for {url}, detected {encoding}")
+        if manifest is not None:
+            changed = manifest.record(url, response, response.content,
+                                      encoding=encoding, encoding_source=encoding_source)
+            # Servers without validators still get caught by the content hash
+            if conditional and not changed:
+                print(f"Unchanged: {url}")
+                return NOT_MODIFIED
+        return text
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching {url}: {e}")
+        if fetch_log is not None and e.response is None:
+            fetch_log.record_fetch(url, type(e).__name__, time.perf_counter() - start_time)
+        return None
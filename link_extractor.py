@@ -0,0 +1,92 @@
+"""Streaming extraction of the links the crawlers follow.
+
+The crawlers only need a handful of anchors from each listing page: the links
+inside div#main, and the pagination links (次ページ / 前ページ). Building a
+full BeautifulSoup tree for that costs far more time and memory than the page
+is worth, so ListingLinkParser reads the anchors in one html.parser pass and
+keeps nothing else. Callers fall back to a full BeautifulSoup parse when the
+streaming pass raises or finds nothing.
+"""
+import collections
+from html.parser import HTMLParser
+
+ListingLinks = collections.namedtuple('ListingLinks', 'main_links all_links next_href prev_href')
+ListingLinks.__doc__ = """Anchors of a listing page, as (text, href) pairs in document order.
+
+main_links are the anchors inside div#main and all_links every anchor on the
+page. next_href is the 次ページ link; prev_href the link in
+li.mod-pre-nex-prev, or else the first anchor mentioning 前ページ.
+"""
+
+NEXT_PAGE_TEXT = '次ページ'
+PREV_PAGE_TEXT = '前ページ'
+PREV_PAGE_CLASS = 'mod-pre-nex-prev'
+
+class ListingLinkParser(HTMLParser):
+    """Collects anchors and pagination links without building a tree."""
+
+    def __init__(self, main_id='main'):
+        super().__init__(convert_charrefs=True)
+        self.main_id = main_id
+        self.main_links = []
+        self.all_links = []
+        self.next_href = None
+        self.prev_href = None
+        self.prev_text_href = None
+        # div nesting depth inside div#main; 0 when outside it
+        self.main_depth = 0
+        self.main_seen = False
+        self.prev_li_depth = 0
+        # (href, text parts, in div#main, in li.mod-pre-nex-prev) of the open <a>
+        self.anchor = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'div':
+            if self.main_depth:
+                self.main_depth += 1
+            elif not self.main_seen and dict(attrs).get('id') == self.main_id:
+                self.main_seen = True
+                self.main_depth = 1
+        elif tag == 'li':
+            if self.prev_li_depth:
+                self.prev_li_depth += 1
+            elif PREV_PAGE_CLASS in (dict(attrs).get('class') or '').split():
+                self.prev_li_depth = 1
+        elif tag == 'a':
+            href = dict(attrs).get('href')
+            self.anchor = (href, [], self.main_depth > 0, self.prev_li_depth > 0) if href is not None else None
+
+    def handle_endtag(self, tag):
+        if tag == 'div' and self.main_depth:
+            self.main_depth -= 1
+        elif tag == 'li' and self.prev_li_depth:
+            self.prev_li_depth -= 1
+        elif tag == 'a' and self.anchor is not None:
+            href, text_parts, in_main, in_prev_li = self.anchor
+            self.anchor = None
+            text = ''.join(text_parts)
+            link = (text.strip(), href)
+            self.all_links.append(link)
+            if in_main:
+                self.main_links.append(link)
+            if self.next_href is None and text == NEXT_PAGE_TEXT:
+                self.next_href = href
+            if in_prev_li and self.prev_href is None:
+                self.prev_href = href
+            if self.prev_text_href is None and PREV_PAGE_TEXT in text:
+                self.prev_text_href = href
+
+    def handle_data(self, data):
+        if self.anchor is not None:
+            self.anchor[1].append(data)
+
+    def result(self):
+        return ListingLinks(self.main_links, self.all_links, self.next_href,
+                            self.prev_href if self.prev_href is not None else self.prev_text_href)
+
+def extract_listing_links(html, main_id='main'):
+    """Returns the ListingLinks of a listing page in a single streaming pass."""
+    parser = ListingLinkParser(main_id)
+    parser.feed(html)
+    parser.close()
+    return parser.result()
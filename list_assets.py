@@ -1,80 +1,36 @@
 #!/usr/bin/env python3
+import argparse
 import os
-import re
-from pathlib import Path
 import urllib.parse
+import asset_extractor
+import domain_policy
+from crawl_store import page_count
 
 # アセットファイルリストを保存するディレクトリ
 ASSETS_DIR = "assets"
 os.makedirs(ASSETS_DIR, exist_ok=True)
 
-def extract_urls_from_html_files():
-    """HTMLファイルからCSSとJSと画像のURLを抽出する"""
-    html_files = list(Path("raw_html").glob("**/*.html"))
+def extract_urls_from_html_files(store_path=None, jobs=None, rescan=False, policy=None):
+    """HTMLファイル（store_pathを指定した場合はクロールストア）からCSSとJSと画像のURLを抽出する
+
+    1ファイル1回の走査をプロセスプールで並列に実行し、前回から変わっていないファイルはスキャンキャッシュの結果を使う
+    policy（domain_policy.DomainPolicy）を指定した場合は拒否されたドメインのURLを除く
+    """
+    total_files = page_count("raw_html", store_path)
     
-    if not html_files:
+    if not total_files:
         print("No HTML files found in raw_html directory!")
         return {}
     
-    print(f"Scanning {len(html_files)} HTML files for assets...")
-    
-    # 種類ごとにURLを保存するディクショナリ
-    asset_urls = {
-        'css': set(),
-        'js': set(),
-        'img': set(),
-        'all': set()
-    }
-    
-    for html_file in html_files:
-        with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            
-            # href属性からCSSファイルのURLを抽出（クエリパラメータを含む）
-            css_urls = re.findall(r'href=["\'](.*?\.css(?:\?[^"\']*)?)["\']', content)
-            
-            # link rel="stylesheet"からもCSSファイルを抽出
-            stylesheet_urls = re.findall(r'<link[^>]*rel=["\'](stylesheet|Stylesheet)["\'][^>]*href=["\'](.*?)["\']', content)
-            stylesheet_urls = [url[1] for url in stylesheet_urls if url[1].endswith('.css') or '.css?' in url[1]]
-            
-            # src属性からJSファイルのURLを抽出（クエリパラメータを含む）
-            js_urls = re.findall(r'src=["\'](.*?\.js(?:\?[^"\']*)?)["\']', content)
-            
-            # src属性から画像ファイルのURLを抽出
-            img_patterns = [
-                r'src=["\'](.*?\.(jpg|jpeg|png|gif|svg)(?:\?[^"\']*)?)["\']',
-                r'background-image:\s*url\(["\']?(.*?\.(jpg|jpeg|png|gif|svg)(?:\?[^"\'\)]*)?)["\']?\)',
-                r'content=["\'](.*?\.(jpg|jpeg|png|gif|svg)(?:\?[^"\']*)?)["\']'
-            ]
-            
-            img_urls = []
-            for pattern in img_patterns:
-                matches = re.findall(pattern, content)
-                if matches:
-                    if isinstance(matches[0], tuple):
-                        img_urls.extend([match[0] for match in matches])
-                    else:
-                        img_urls.extend(matches)
-            
-            # CSSファイルを追加
-            for url in css_urls + stylesheet_urls:
-                # 重複するURLをフィルタリング
-                if url and not url.startswith('#') and not url.startswith('javascript:'):
-                    asset_urls['css'].add(url)
-                    asset_urls['all'].add(url)
-            
-            # JSファイルを追加
-            for url in js_urls:
-                if url and not url.startswith('#') and not url.startswith('javascript:'):
-                    asset_urls['js'].add(url)
-                    asset_urls['all'].add(url)
-            
-            # 画像ファイルを追加
-            for url in img_urls:
-                if url and not url.startswith('#') and not url.startswith('javascript:'):
-                    asset_urls['img'].add(url)
-                    asset_urls['all'].add(url)
+    print(f"Scanning {total_files} HTML files for assets...")
     
+    # 種類ごと（css, js, img, all）のURLの集合
+    asset_urls = asset_extractor.extract_asset_urls("raw_html", store_path, jobs, rescan=rescan)
+    if policy is not None:
+        denied_urls = [url for url in asset_urls['all'] if not policy.allows(url)]
+        for urls in asset_urls.values():
+            urls.difference_update(denied_urls)
+        print(f"Excluded {len(denied_urls)} URLs on denied domains")
     return asset_urls
 
 def normalize_urls(urls):
@@ -159,8 +115,22 @@ def analyze_query_params(asset_urls):
             print(f"  ... and {len(js_with_query) - 10} more")
 
 def main():
+    parser = argparse.ArgumentParser(description='List asset URLs referenced by the crawled HTML')
+    parser.add_argument('--store', help='Read pages from this crawl store instead of raw_html/')
+    parser.add_argument('--jobs', type=int, default=asset_extractor.default_jobs(),
+                        help='Worker processes for scanning pages (default: one per CPU)')
+    parser.add_argument('--rescan', action='store_true', help='Scan every page again instead of reusing the scan cache')
+    parser.add_argument('--allow-domain', action='append', default=[], metavar='DOMAIN',
+                        help='Only list assets on these domains and their subdomains (repeatable)')
+    parser.add_argument('--deny-domain', action='append', default=[], metavar='DOMAIN',
+                        help=f'Never list assets on these domains, in addition to {domain_policy.POLICY_FILE} (repeatable)')
+    args = parser.parse_args()
+    
+    # ダウンロードするドメインの許可・拒否リスト（assets/domain_policy.jsonとコマンドライン）
+    policy = domain_policy.DomainPolicy.load(allow=args.allow_domain, deny=args.deny_domain)
+    
     # HTMLファイルからURLを抽出
-    asset_urls = extract_urls_from_html_files()
+    asset_urls = extract_urls_from_html_files(args.store, args.jobs, args.rescan, policy)
     
     if not asset_urls:
         return
@@ -1,12 +1,18 @@
+import argparse
 import os
+import re
 import shutil
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
+import process_pool
+from crawl_store import iter_pages
 
 # Directories
 RAW_HTML_DIR = "raw_html/monthly_archives"
 LOCAL_HTML_DIR = "local_html"
 MONTHLY_ARCHIVE_DIR = os.path.join(LOCAL_HTML_DIR, "ikuoikuo_2005", "m")
+# Monthly archive URLs: /ikuoikuo_2005/m/YYYYMM, and /ikuoikuo_2005/m/YYYYMM/N for its older pages
+MONTH_LINK_PATTERN = re.compile(r'/ikuoikuo_2005/m/(\d{6})(?:/(\d+))?/?$')
 
 def ensure_directory_exists(directory):
     """Create directory if it doesn't exist"""
@@ -26,6 +32,17 @@ def extract_month_code(filename):
         return month_code
     return None
 
+def extract_page_number(filename):
+    """Extract the page number from the filename (1 for month_YYYYMM.html)"""
+    match = re.search(r'_page(\d+)\.html$', filename)
+    return int(match.group(1)) if match else 1
+
+def monthly_output_path(month_code, page_num):
+    """Local path of a monthly archive page: m/YYYYMM.html, then m/YYYYMM/N.html like the site's /m/YYYYMM/N"""
+    if page_num == 1:
+        return os.path.join(MONTHLY_ARCHIVE_DIR, f"{month_code}.html")
+    return os.path.join(MONTHLY_ARCHIVE_DIR, month_code, f"{page_num - 1}.html")
+
 def process_monthly_archive_html(html_content, month_code):
     """Process the HTML content of a monthly archive page"""
     soup = BeautifulSoup(html_content, 'html.parser')
@@ -47,6 +64,9 @@ def process_monthly_archive_html(html_content, month_code):
         # Fix article links (/ikuoikuo_2005/e/xxx.html)
         if '/ikuoikuo_2005/e/' in href or href.startswith('/e/'):
             a_tag['href'] = fix_article_link(href)
+        # Fix monthly archive links, including the pagination between a month's pages
+        elif MONTH_LINK_PATTERN.search(urlparse(href).path):
+            a_tag['href'] = fix_month_link(href)
         # Fix other internal links
         elif href.startswith('/ikuoikuo_2005/') or href.startswith('https://blog.goo.ne.jp/ikuoikuo_2005/'):
             a_tag['href'] = fix_internal_link(href)
@@ -82,6 +102,13 @@ def fix_article_link(href):
     # If we can't parse it properly, return the original
     return href
 
+def fix_month_link(href):
+    """Fix monthly archive links to the saved files (/ikuoikuo_2005/m/YYYYMM.html, /ikuoikuo_2005/m/YYYYMM/N.html)"""
+    month_code, page = MONTH_LINK_PATTERN.search(urlparse(href).path).groups()
+    if page:
+        return f"/ikuoikuo_2005/m/{month_code}/{page}.html"
+    return f"/ikuoikuo_2005/m/{month_code}.html"
+
 def fix_internal_link(href):
     """Fix other internal links"""
     parsed = urlparse(href)
@@ -94,37 +121,54 @@ def fix_internal_link(href):
     
     return href
 
+def iter_monthly_files(store_path=None):
+    """Yield (filename, html_content) for each saved monthly archive page"""
+    if store_path:
+        for path, html_content in iter_pages(None, store_path, subdir=os.path.basename(RAW_HTML_DIR)):
+            yield os.path.basename(path), html_content
+        return
+    
+    for filename in [f for f in os.listdir(RAW_HTML_DIR) if f.endswith('.html')]:
+        with open(os.path.join(RAW_HTML_DIR, filename), 'r', encoding='utf-8') as f:
+            yield filename, f.read()
+
+def process_monthly_file(page):
+    """Convert one (filename, html_content); returns (filename, month_code, processed_html), month_code None if unknown"""
+    filename, html_content = page
+    # Extract the month code (YYYYMM)
+    month_code = extract_month_code(filename)
+    if not month_code:
+        return filename, None, None
+    return filename, month_code, process_monthly_archive_html(html_content, month_code)
+
 def main():
+    parser = argparse.ArgumentParser(description='Convert saved monthly archive pages for local serving')
+    parser.add_argument('--store', help='Read pages from this crawl store instead of raw_html/')
+    parser.add_argument('--jobs', type=int, default=process_pool.default_jobs(),
+                        help='Worker processes for converting pages; the output does not depend on it (default: one per CPU)')
+    args = parser.parse_args()
+    
     # Ensure the local HTML directory for monthly archives exists
     ensure_directory_exists(MONTHLY_ARCHIVE_DIR)
     
-    # Get all monthly archive files
-    monthly_files = [f for f in os.listdir(RAW_HTML_DIR) if f.endswith('.html')]
-    
-    for filename in monthly_files:
-        filepath = os.path.join(RAW_HTML_DIR, filename)
-        
-        # Extract the month code (YYYYMM)
-        month_code = extract_month_code(filename)
+    processed_count = 0
+    # Pages are converted in parallel but come back, and are written, in the order they were read
+    for filename, month_code, processed_html in process_pool.imap_ordered(
+            process_monthly_file, iter_monthly_files(args.store), args.jobs):
         if not month_code:
             print(f"Could not extract month code from {filename}, skipping.")
             continue
         
-        # Read the HTML content
-        with open(filepath, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        # Process the HTML content
-        processed_html = process_monthly_archive_html(html_content, month_code)
-        
-        # Save the processed HTML to the local HTML directory
-        output_path = os.path.join(MONTHLY_ARCHIVE_DIR, f"{month_code}.html")
+        # Save the processed HTML to the local HTML directory; later pages go in a per-month directory
+        output_path = monthly_output_path(month_code, extract_page_number(filename))
+        ensure_directory_exists(os.path.dirname(output_path))
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(processed_html)
         
         print(f"Processed {filename} -> {output_path}")
+        processed_count += 1
     
-    print(f"Processed {len(monthly_files)} monthly archive files.")
+    print(f"Processed {processed_count} monthly archive files.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
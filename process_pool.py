@@ -0,0 +1,52 @@
+"""Order-preserving process pool map for the per-page stages.
+
+Items go to the workers in batches, only a few batches ahead of the results
+being consumed, so a corpus of any size streams through in bounded memory,
+and results come back in input order, so whatever the caller writes is the
+same as with a serial loop. State every item needs (url_mapping, the rule
+set) is handed to each worker once by an initializer rather than with every
+batch; under the fork start method the workers simply inherit it.
+"""
+import collections
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Items handed to a worker at a time
+BATCH_SIZE = 16
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _run_batch(function, batch):
+    return [function(item) for item in batch]
+
+def imap_ordered(function, items, jobs=1, batch_size=BATCH_SIZE, initializer=None, initargs=()):
+    """Yields function(item) for every item, in order, on jobs worker processes.
+
+    function and initializer must be module-level functions. With jobs=1
+    everything runs in this process, initializer included.
+    """
+    if jobs <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            yield function(item)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as executor:
+        pending = collections.deque()
+        for batch in _batches(items, batch_size):
+            pending.append(executor.submit(_run_batch, function, batch))
+            if len(pending) >= jobs * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,62 @@
+import asyncio
+import contextlib
+import time
+from urllib.parse import urlparse
+
+class TokenBucket:
+    """Asyncio token bucket refilled at `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        # The lock keeps waiters in FIFO order so no request starves
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+class HostRateLimiter:
+    """Per-host limiter: a token bucket for requests/sec plus a cap on requests in flight.
+
+    With rate=None only the in-flight cap applies.
+    """
+
+    def __init__(self, rate=2.0, max_in_flight=4, burst=None):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self.burst = burst
+        self.buckets = {}
+        self.semaphores = {}
+
+    def _get_host_limits(self, url):
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst) if self.rate else None
+            self.semaphores[host] = asyncio.Semaphore(self.max_in_flight)
+        return self.buckets[host], self.semaphores[host]
+
+    @contextlib.asynccontextmanager
+    async def limit(self, url):
+        """Holds an in-flight slot for the URL's host and spends one token before yielding."""
+        bucket, semaphore = self._get_host_limits(url)
+        async with semaphore:
+            if bucket is not None:
+                await bucket.acquire()
+            yield
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Local stand-in for blog.goo.ne.jp that replays the pages saved in raw_html/.
+
+Serves the saved pages under the original URL scheme so the crawlers can be
+benchmarked and regression-tested without touching the real site:
+
+    /ikuoikuo_2005/                  -> raw_html/arcv_1.html (has the バックナンバー module)
+    /ikuoikuo_2005/arcv              -> raw_html/arcv_1.html
+    /ikuoikuo_2005/arcv/?page=N      -> raw_html/arcv_N.html
+    /ikuoikuo_2005/e/<id>            -> raw_html/ikuoikuo_2005/<id>.html
+    /ikuoikuo_2005/m/<YYYYMM>        -> raw_html/monthly_archives/month_<YYYYMM>.html
+    /ikuoikuo_2005/m/<YYYYMM>/N      -> raw_html/monthly_archives/month_<YYYYMM>_page<N+1>.html
+
+Responses can be delayed by a fixed latency plus random jitter, and a share
+of requests can be answered with an error status to exercise retries.
+"""
+import argparse
+import email.utils
+import hashlib
+import http.server
+import os
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+PORT = 8081
+RAW_HTML_DIR = "raw_html"
+BLOG_NAME = "ikuoikuo_2005"
+ORIGINAL_ORIGIN = b"https://blog.goo.ne.jp"
+MONTH_DIR_NAME = "monthly_archives"
+# The link from a month's page to its older posts; dropped from filler pages to end the month there
+OLDER_PAGE_LINK_PATTERN = re.compile(rb'<li class="mod-pre-nex-prev">.*?</li>', re.DOTALL)
+
+class ReplayRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Maps original blog URLs to saved files and serves them after the configured latency."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def resolve_path(self):
+        """Returns (raw_html file, is_filler) for the request path; the file is None if there is no match."""
+        parsed_url = urlparse(self.path)
+        parts = parsed_url.path.strip('/').split('/')
+        if not parts or parts[0] != BLOG_NAME:
+            return None, False
+
+        if len(parts) == 1:
+            return os.path.join(self.server.raw_dir, "arcv_1.html"), False
+
+        if len(parts) in (3, 4) and parts[1] == 'm' and re.fullmatch(r'\d{6}', parts[2]):
+            month_dir = os.path.join(self.server.raw_dir, MONTH_DIR_NAME)
+            if len(parts) == 3:
+                return os.path.join(month_dir, f"month_{parts[2]}.html"), False
+            if not parts[3].isdigit():
+                return None, False
+            month_path = os.path.join(month_dir, f"month_{parts[2]}_page{int(parts[3]) + 1}.html")
+            if not os.path.exists(month_path) and self.server.fill_missing:
+                # Older pages were never saved; stand in with the month's first page, as its last page
+                return os.path.join(month_dir, f"month_{parts[2]}.html"), True
+            return month_path, False
+
+        return self.resolve_post_or_archive_path(parsed_url, parts), False
+
+    def resolve_post_or_archive_path(self, parsed_url, parts):
+        if len(parts) >= 2 and parts[1] == 'arcv':
+            page = parse_qs(parsed_url.query).get('page', ['1'])[0]
+            if not page.isdigit():
+                return None
+            if self.server.max_pages and int(page) > self.server.max_pages:
+                return None
+            return os.path.join(self.server.raw_dir, f"arcv_{int(page)}.html")
+
+        if len(parts) == 3 and parts[1] == 'e':
+            post_path = os.path.join(self.server.raw_dir, BLOG_NAME, f"{parts[2]}.html")
+            if not os.path.exists(post_path) and self.server.fill_missing:
+                # Stand in for posts that were never saved so every post fetch succeeds;
+                # the same ID always maps to the same file so validators stay stable
+                filler_posts = self.server.filler_posts
+                return filler_posts[int(hashlib.md5(parts[2].encode()).hexdigest(), 16) % len(filler_posts)]
+            return post_path
+
+        return None
+
+    def do_GET(self):
+        delay = self.server.response_delay()
+        if delay:
+            time.sleep(delay)
+
+        if self.server.should_fail():
+            self.send_error(self.server.error_status)
+            return
+
+        file_path, is_filler = self.resolve_path()
+        if not file_path or not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        if is_filler:
+            body = OLDER_PAGE_LINK_PATTERN.sub(b'', body, count=1)
+        # Keep absolute links on the replay server instead of the real site
+        body = body.replace(ORIGINAL_ORIGIN, self.server.origin.encode('ascii'))
+
+        # Validators so conditional GETs from the crawlers can be answered with 304
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        last_modified = email.utils.formatdate(os.path.getmtime(file_path), usegmt=True)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+class ReplayServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=PORT, raw_dir=RAW_HTML_DIR, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, max_pages=None, fill_missing=False, seed=None, verbose=False):
+        super().__init__(('127.0.0.1', port), ReplayRequestHandler)
+        self.raw_dir = raw_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_pages = max_pages
+        self.fill_missing = fill_missing
+        self.verbose = verbose
+        # Handler threads share one generator; a seed makes the delays and errors repeatable
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.origin = f"http://127.0.0.1:{self.server_address[1]}"
+        post_dir = os.path.join(raw_dir, BLOG_NAME)
+        self.filler_posts = sorted(os.path.join(post_dir, name) for name in os.listdir(post_dir)
+                                   if name.endswith('.html') and name != 'arcv.html')
+
+    def response_delay(self):
+        """Seconds to hold the next response: the fixed latency plus up to `jitter` more."""
+        if not self.jitter:
+            return self.latency
+        with self._random_lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+    def should_fail(self):
+        """Decides whether to answer the next request with error_status."""
+        if not self.error_rate:
+            return False
+        with self._random_lock:
+            return self.random.random() < self.error_rate
+
+    @property
+    def base_url(self):
+        """Blog root to hand to the crawlers."""
+        return f"{self.origin}/{BLOG_NAME}/"
+
+def start_in_thread(**kwargs):
+    """Starts a replay server on a background thread and returns it."""
+    server = ReplayServer(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay saved raw_html pages under the original blog URLs')
+    parser.add_argument('port', type=int, nargs='?', default=PORT, help=f'Port to listen on (default: {PORT})')
+    parser.add_argument('--raw-dir', default=RAW_HTML_DIR, help=f'Saved pages directory (default: {RAW_HTML_DIR})')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds, at random')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of requests (0-1) answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503, help='Status for injected errors (default: 503)')
+    parser.add_argument('--seed', type=int, help='Random seed for jitter and injected errors')
+    parser.add_argument('--max-pages', type=int, help='Only serve the first N archive pages')
+    parser.add_argument('--fill-missing', action='store_true',
+                        help='Answer unsaved post and monthly page URLs with saved pages instead of 404')
+    args = parser.parse_args()
+
+    server = ReplayServer(port=args.port, raw_dir=args.raw_dir, latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate, error_status=args.error_status,
+                          max_pages=args.max_pages, fill_missing=args.fill_missing, seed=args.seed,
+                          verbose=True)
+    print(f"Replaying {args.raw_dir}/ at {server.base_url}")
+    print("Press Ctrl+C to stop the server")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServer stopped")
+        server.server_close()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""One pass over local_html/ in place of the chain of fix_* scripts.
+
+After convert_html_paths.py, the fix_* scripts each read every page, most
+parse it with BeautifulSoup, and write it back. This runs the same fixes as
+an ordered registry of rules, reading each page once, parsing it at most
+once, and writing it only if a rule changed it:
+
+1. text rules (regex substitutions) on the page as read;
+2. soup rules on a single html.parser parse, serialized once if any of them
+   changed something;
+3. text rules that match BeautifulSoup's serialization of a page (the SNS and
+   icon fixes look for tags written as <img .../>).
+
+Each rule has a scope, a predicate on the page's path relative to the HTML
+directory, matching the directories its script walked. The rules are the
+scripts' own patterns and functions, so the scripts and the engine cannot
+drift apart. Pages are independent, so with --jobs they are spread over a
+process pool. Per-rule hit counts and timings are printed at the end.
+
+    python rewrite_engine.py
+    python rewrite_engine.py --html-dir local_html --rules article_links,backnumber_links
+    python rewrite_engine.py --jobs 8
+"""
+import argparse
+import os
+import re
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+import fix_additional_icon_paths
+import fix_article_links
+import fix_asset_paths
+import fix_backnumber_links
+import fix_backnumber_links_html
+import fix_css_paths
+import fix_img_paths
+import fix_img_paths_in_monthly
+import fix_monthly_archive_assets
+import fix_sns_icon_paths_all
+import process_pool
+
+LOCAL_HTML_DIR = "local_html"
+BLOG_DIR = "ikuoikuo_2005"
+ARTICLE_DIR = f"{BLOG_DIR}/e"
+MONTHLY_DIR = f"{BLOG_DIR}/m"
+
+def under(*directories):
+    """Scope: pages anywhere below the given directories (like Path.glob("**/*.html"))."""
+    prefixes = tuple(directory + '/' for directory in directories)
+    return lambda path: path.startswith(prefixes)
+
+def directly_in(directory):
+    """Scope: pages directly in the directory (like Path.glob("*.html"))."""
+    return lambda path: os.path.dirname(path) == directory
+
+def either(*scopes):
+    return lambda path: any(scope(path) for scope in scopes)
+
+def everywhere(path):
+    return True
+
+def substitute(patterns):
+    """A text fix applying (pattern, replacement) pairs in order; returns (content, substitutions)."""
+    compiled = [(re.compile(pattern), replacement) for pattern, replacement in patterns]
+
+    def fix(content):
+        hits = 0
+        for pattern, replacement in compiled:
+            content, count = pattern.subn(replacement, content)
+            hits += count
+        return content, hits
+    return fix
+
+class TextRule:
+    """fix(content) -> (content, hits) on the page text."""
+
+    def __init__(self, name, scope, fix):
+        self.name = name
+        self.scope = scope
+        self.fix = fix
+
+class SoupRule:
+    """fix(soup) -> hits, changing the parsed page in place."""
+
+    def __init__(self, name, scope, fix):
+        self.name = name
+        self.scope = scope
+        self.fix = fix
+
+# In the order the scripts ran, except that fix_article_links runs before
+# the soup rules and fix_monthly_archive_assets before the icon rules, so
+# that each phase runs once; no rule changes what the ones it moved past
+# match. fix_sns_icon_paths_in_monthly.py applied the same patterns as
+# fix_sns_icon_paths_all.py to a subset of its pages, so it has no rule.
+RULES = [
+    TextRule('asset_paths', under(ARTICLE_DIR), substitute(fix_asset_paths.PATH_PATTERNS)),
+    TextRule('css_paths', directly_in(BLOG_DIR), substitute(fix_css_paths.PATH_PATTERNS)),
+    TextRule('article_links', either(under(ARTICLE_DIR), directly_in(BLOG_DIR)),
+             substitute(fix_article_links.PATH_PATTERNS)),
+    SoupRule('img_paths', under(ARTICLE_DIR, MONTHLY_DIR),
+             lambda soup: len(fix_img_paths.fix_soup_paths(soup))),
+    SoupRule('img_paths_in_monthly', under(MONTHLY_DIR),
+             lambda soup: len(fix_img_paths_in_monthly.fix_image_paths_in_soup(soup))),
+    SoupRule('backnumber_links', under(BLOG_DIR), fix_backnumber_links.update_backnumber_links_in_soup),
+    SoupRule('backnumber_links_html', everywhere,
+             lambda soup: len(fix_backnumber_links_html.fix_backnumber_links_in_soup(soup))),
+    SoupRule('monthly_archive_assets', under(MONTHLY_DIR),
+             lambda soup: len(fix_monthly_archive_assets.fix_soup_paths(soup))),
+    TextRule('sns_icon_paths', under(MONTHLY_DIR, ARTICLE_DIR), fix_sns_icon_paths_all.fix_sns_icon_paths),
+    TextRule('additional_icon_paths', under(MONTHLY_DIR, ARTICLE_DIR),
+             fix_additional_icon_paths.fix_additional_icon_paths),
+]
+
+def phases(rules):
+    """Splits rules into (text rules before parsing, soup rules, text rules after serializing).
+
+    Raises ValueError if a text rule sits between two soup rules, which
+    would take a second parse.
+    """
+    soup_indexes = [index for index, rule in enumerate(rules) if isinstance(rule, SoupRule)]
+    if not soup_indexes:
+        return list(rules), [], []
+    first, last = soup_indexes[0], soup_indexes[-1]
+    between = [rule.name for rule in rules[first:last] if not isinstance(rule, SoupRule)]
+    if between:
+        raise ValueError(f"text rules between soup rules would need a second parse: {', '.join(between)}")
+    return list(rules[:first]), list(rules[first:last + 1]), list(rules[last + 1:])
+
+class RewriteStats:
+    """Pages changed, hits and seconds per rule, plus time spent parsing, serializing and on file I/O."""
+
+    def __init__(self, rules=RULES):
+        self.rules = {rule.name: (0, 0, 0.0) for rule in rules}
+        self.steps = {}
+        self.pages = 0
+        self.modified_pages = 0
+
+    def add_rule(self, name, hits, seconds):
+        pages, total_hits, total_seconds = self.rules[name]
+        self.rules[name] = (pages + (1 if hits else 0), total_hits + hits, total_seconds + seconds)
+
+    def add_step(self, name, seconds):
+        self.steps[name] = self.steps.get(name, 0.0) + seconds
+
+    def merge(self, other):
+        for name, (pages, hits, seconds) in other.rules.items():
+            total_pages, total_hits, total_seconds = self.rules[name]
+            self.rules[name] = (total_pages + pages, total_hits + hits, total_seconds + seconds)
+        for name, seconds in other.steps.items():
+            self.add_step(name, seconds)
+        self.pages += other.pages
+        self.modified_pages += other.modified_pages
+
+    def report(self):
+        print(f"{'rule':<24} {'pages':>6} {'hits':>8} {'seconds':>9}")
+        for name, (pages, hits, seconds) in self.rules.items():
+            print(f"{name:<24} {pages:>6} {hits:>8} {seconds:>9.3f}")
+        for name, seconds in self.steps.items():
+            print(f"{'(' + name + ')':<24} {'':>6} {'':>8} {seconds:>9.3f}")
+        print(f"Modified {self.modified_pages} of {self.pages} pages")
+
+def _apply_text_rules(rules, path, content, stats):
+    for rule in rules:
+        if rule.scope(path):
+            start_time = time.perf_counter()
+            content, hits = rule.fix(content)
+            stats.add_rule(rule.name, hits, time.perf_counter() - start_time)
+    return content
+
+def rewrite_page(path, content, rules=RULES, stats=None):
+    """Applies the rules whose scope covers path (relative to the HTML directory); returns the new content."""
+    stats = RewriteStats(rules) if stats is None else stats
+    text_rules, soup_rules, serialized_rules = phases(rules)
+    content = _apply_text_rules(text_rules, path, content, stats)
+
+    soup_rules = [rule for rule in soup_rules if rule.scope(path)]
+    if soup_rules:
+        start_time = time.perf_counter()
+        soup = BeautifulSoup(content, 'html.parser')
+        stats.add_step('parse', time.perf_counter() - start_time)
+        changed = False
+        for rule in soup_rules:
+            start_time = time.perf_counter()
+            hits = rule.fix(soup)
+            stats.add_rule(rule.name, hits, time.perf_counter() - start_time)
+            changed = changed or hits > 0
+        # Like the scripts, a page none of them changed keeps its own markup
+        if changed:
+            start_time = time.perf_counter()
+            content = str(soup)
+            stats.add_step('serialize', time.perf_counter() - start_time)
+
+    return _apply_text_rules(serialized_rules, path, content, stats)
+
+def html_paths(html_dir):
+    """Paths of every page below html_dir, relative to it and in POSIX form, sorted."""
+    base_dir = Path(html_dir)
+    return sorted(html_file.relative_to(base_dir).as_posix() for html_file in base_dir.glob("**/*.html"))
+
+# What each worker process rewrites with, set once when the pool starts
+_worker_html_dir = None
+_worker_rules = None
+
+def _init_worker(html_dir, rule_names):
+    global _worker_html_dir, _worker_rules
+    _worker_html_dir = html_dir
+    _worker_rules = [rule for rule in RULES if rule.name in rule_names]
+
+def rewrite_file(path):
+    """Rewrites one page in place with the worker's rules; returns its RewriteStats."""
+    stats = RewriteStats(_worker_rules)
+    file_path = os.path.join(_worker_html_dir, path)
+    start_time = time.perf_counter()
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    stats.add_step('read', time.perf_counter() - start_time)
+
+    new_content = rewrite_page(path, content, _worker_rules, stats)
+    stats.pages += 1
+    if new_content != content:
+        start_time = time.perf_counter()
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(new_content)
+        stats.add_step('write', time.perf_counter() - start_time)
+        stats.modified_pages += 1
+    return stats
+
+def rewrite_tree(html_dir=LOCAL_HTML_DIR, rules=RULES, jobs=1):
+    """Rewrites every page below html_dir in place on jobs processes; returns the RewriteStats.
+
+    Every page only depends on itself, so the result is the same for any
+    number of jobs; rule timings are then summed over the workers.
+    """
+    phases(rules)
+    rule_names = [rule.name for rule in rules]
+    stats = RewriteStats(rules)
+    for page_stats in process_pool.imap_ordered(rewrite_file, html_paths(html_dir), jobs,
+                                                initializer=_init_worker, initargs=(html_dir, rule_names)):
+        stats.merge(page_stats)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply the fix_* rewrites to the local HTML in one pass')
+    parser.add_argument('--html-dir', default=LOCAL_HTML_DIR, help=f'Directory to rewrite (default: {LOCAL_HTML_DIR})')
+    parser.add_argument('--rules', help='Comma-separated rule names to apply, in registry order (default: all)')
+    parser.add_argument('--jobs', type=int, default=process_pool.default_jobs(),
+                        help='Worker processes; the output does not depend on it (default: one per CPU)')
+    args = parser.parse_args()
+
+    rules = RULES
+    if args.rules:
+        names = args.rules.split(',')
+        unknown = set(names) - {rule.name for rule in RULES}
+        if unknown:
+            parser.error(f"unknown rules: {', '.join(sorted(unknown))}")
+        rules = [rule for rule in RULES if rule.name in names]
+
+    start_time = time.perf_counter()
+    stats = rewrite_tree(args.html_dir, rules, args.jobs)
+    stats.report()
+    print(f"Completed in {time.perf_counter() - start_time:.2f} seconds")
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ import sys
 import urllib.parse
 from pathlib import Path
 
+import asset_paths
+
 PORT = 8080
 
 class MyHttpRequestHandler(http.server.SimpleHTTPRequestHandler):
@@ -24,6 +26,12 @@ class MyHttpRequestHandler(http.server.SimpleHTTPRequestHandler):
         # Get the relative path
         rel_path = os.path.relpath(translated_path, os.getcwd())
         
+        # Query-string assets were saved under their own names; look them up in the URL table
+        if parsed_url.query:
+            saved_path = asset_paths.get_table().get(path)
+            if saved_path:
+                return os.path.join(os.getcwd(), 'assets', saved_path)
+        
         # If it starts with local_html or assets, serve directly
         if rel_path.startswith(('local_html/', 'assets/')):
             return translated_path
@@ -41,19 +49,6 @@ class MyHttpRequestHandler(http.server.SimpleHTTPRequestHandler):
             if os.path.exists(assets_path):
                 return assets_path
             
-            # Check if there's a file in assets directory with a similar name (ignoring query params)
-            assets_dir = os.path.dirname(assets_path)
-            if os.path.exists(assets_dir):
-                filename = os.path.basename(rel_path)
-                # Remove query params from filename if any
-                if '?' in filename:
-                    filename = filename.split('?')[0]
-                
-                # Check if file exists in the directory
-                for file in os.listdir(assets_dir):
-                    if file.startswith(filename):
-                        return os.path.join(assets_dir, file)
-                
             return translated_path
 
 def run_server(port=PORT):
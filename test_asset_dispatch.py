@@ -0,0 +1,62 @@
+"""Order and per-host cap of asset_fetcher.download_all.
+
+    python -m pytest -q test_asset_dispatch.py
+"""
+import collections
+import threading
+import time
+
+import asset_fetcher
+
+class Recorder:
+    """download() stand-in that records start order and the most downloads in flight per host."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.started = []
+        self.in_flight = collections.Counter()
+        self.peak = collections.Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        host = url.split('/')[2]
+        with self._lock:
+            self.started.append(url)
+            self.in_flight[host] += 1
+            self.peak[host] = max(self.peak[host], self.in_flight[host])
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight[host] -= 1
+        return url
+
+def urls_for(hosts, count):
+    return [f"https://{host}/{i}.png" for i in range(count) for host in hosts]
+
+def rank(url):
+    """Priority that reverses the input order: the highest number starts first."""
+    return (-int(url.rsplit('/', 1)[1].split('.')[0]), url)
+
+def test_urls_start_in_priority_order():
+    urls = urls_for(['a.example', 'b.example'], 20)
+    download = Recorder()
+
+    results = asset_fetcher.download_all(urls, download, max_workers=1, per_host=1, priority=rank)
+
+    assert download.started == sorted(urls, key=rank)
+    assert results == urls
+
+def test_per_host_cap_holds_while_other_hosts_run():
+    urls = urls_for(['a.example', 'b.example', 'c.example'], 12)
+    download = Recorder(delay=0.01)
+    done = []
+
+    results = asset_fetcher.download_all(urls, download, max_workers=6, per_host=2, priority=rank,
+                                         on_done=lambda url, result: done.append(url))
+
+    assert download.peak == {'a.example': 2, 'b.example': 2, 'c.example': 2}
+    assert sorted(done) == sorted(urls)
+    assert results == urls
+    # Each host's URLs still start best first
+    for host in ('a.example', 'b.example', 'c.example'):
+        started = [url for url in download.started if f"//{host}/" in url]
+        assert started == sorted(started, key=rank)
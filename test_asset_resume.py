@@ -0,0 +1,113 @@
+"""Resuming an interrupted asset download from its .part file (asset_fetcher.stream_to_file).
+
+A local range-capable http.server cuts the first response off partway
+through the body; the next stream_to_file call must continue the .part with
+a Range/If-Range request and end up with the same bytes as the server's.
+
+    python -m pytest -q test_asset_resume.py
+"""
+import http.server
+import os
+import random
+import threading
+
+import pytest
+
+import asset_fetcher
+
+BODY_SIZE = 1024 * 1024
+# Bytes of the first response sent before the connection is dropped
+CUT_AT = 300 * 1024
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serves server.body with an ETag, honours Range guarded by If-Range, and can cut a response short."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body = server.body
+        etag = f'"{server.etag}"'
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and self.headers.get('If-Range', etag) == etag:
+            start = int(range_header[len('bytes='):].rstrip('-'))
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(body)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body) - start))
+        self.send_header('ETag', etag)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        if server.cut_next:
+            server.cut_next = False
+            self.wfile.write(body[start:start + CUT_AT])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.daemon_threads = True
+    server.body = random.Random(17).randbytes(BODY_SIZE)
+    server.etag = 'v1'
+    server.cut_next = True
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/image.png"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def interrupted_download(server, save_path):
+    """First attempt, cut off by the server; returns the size of the .part it leaves."""
+    # requests raises on the short body, or else stream_to_file raises IncompleteDownload; both are IOErrors
+    with pytest.raises(IOError):
+        asset_fetcher.stream_to_file(server.url, save_path)
+    part_path = save_path + asset_fetcher.PART_SUFFIX
+    assert not os.path.exists(save_path)
+    assert os.path.exists(part_path + asset_fetcher.VALIDATOR_SUFFIX)
+    part_size = os.path.getsize(part_path)
+    assert 0 < part_size < BODY_SIZE
+    return part_size
+
+def test_interrupted_download_resumes_with_range(server, tmp_path):
+    save_path = str(tmp_path / 'image.png')
+    part_size = interrupted_download(server, save_path)
+
+    response = asset_fetcher.stream_to_file(server.url, save_path)
+
+    assert response.status_code == 206
+    assert server.requests[-1]['Range'] == f"bytes={part_size}-"
+    assert server.requests[-1]['If-Range'] == '"v1"'
+    with open(save_path, 'rb') as f:
+        assert f.read() == server.body
+    assert not os.path.exists(save_path + asset_fetcher.PART_SUFFIX)
+    assert not os.path.exists(save_path + asset_fetcher.PART_SUFFIX + asset_fetcher.VALIDATOR_SUFFIX)
+
+def test_changed_file_is_fetched_from_the_start(server, tmp_path):
+    save_path = str(tmp_path / 'image.png')
+    interrupted_download(server, save_path)
+    # The file changed on the server since the .part was started, so If-Range no longer matches
+    server.body = random.Random(18).randbytes(BODY_SIZE)
+    server.etag = 'v2'
+
+    response = asset_fetcher.stream_to_file(server.url, save_path)
+
+    assert response.status_code == 200
+    with open(save_path, 'rb') as f:
+        assert f.read() == server.body
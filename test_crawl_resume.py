@@ -0,0 +1,61 @@
+"""Resuming an interrupted crawl from the frontier checkpoint, against replay_server.py.
+
+The first crawl dies on archive page 3, which the replay server does not
+serve yet; the second crawl, with page 3 served, must resume the same run
+from page 3 without fetching pages 1 and 2 or their posts again.
+
+    python -m pytest -q test_crawl_resume.py
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import time
+
+import download_blog
+import replay_server
+
+def crawl(rate=1000.0, max_in_flight=4):
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(download_blog.crawl_async(rate=rate, max_in_flight=max_in_flight))
+
+def run_rows(frontier_path, sql, params=()):
+    with contextlib.closing(sqlite3.connect(frontier_path)) as db:
+        return db.execute(sql, params).fetchall()
+
+def test_resume_skips_completed_archive_pages(tmp_path):
+    server = replay_server.start_in_thread(port=0, max_pages=2, fill_missing=True)
+    try:
+        download_blog.configure(base_url=server.base_url, output_dir=str(tmp_path))
+        frontier_path = os.path.join(str(tmp_path), download_blog.FRONTIER_FILENAME)
+
+        crawl()
+        runs = run_rows(frontier_path, "SELECT id, finished_at FROM runs")
+        assert len(runs) == 1 and runs[0][1] is None, "a crawl stopped by a failed page stays open"
+        run_id = runs[0][0]
+        pages = dict(run_rows(frontier_path, "SELECT page_num, state FROM archive_pages WHERE run_id = ?", (run_id,)))
+        assert pages == {1: 'done', 2: 'done', 3: 'failed'}
+        done_urls = {url for url, in run_rows(
+            frontier_path, "SELECT url FROM archive_pages WHERE run_id = ? AND state = 'done'", (run_id,))}
+        first_posts = {url for url, in run_rows(frontier_path, "SELECT url FROM posts WHERE run_id = ?", (run_id,))}
+        assert first_posts
+        assert not run_rows(frontier_path, "SELECT url FROM posts WHERE run_id = ? AND state != 'done'", (run_id,))
+
+        server.max_pages = 3
+        resumed_at = time.time()
+        crawl()
+
+        assert [run_id for run_id, _ in run_rows(frontier_path, "SELECT id, finished_at FROM runs")] == [run_id]
+        pages = dict(run_rows(frontier_path, "SELECT page_num, state FROM archive_pages WHERE run_id = ?", (run_id,)))
+        assert pages[3] == 'done'
+        fetched = {url for url, in run_rows(frontier_path, "SELECT url FROM fetches WHERE run_id = ? AND fetched_at >= ?",
+                                            (run_id, resumed_at))}
+        page_3_url, = run_rows(frontier_path, "SELECT url FROM archive_pages WHERE run_id = ? AND page_num = 3",
+                               (run_id,))[0]
+        assert page_3_url in fetched
+        assert not fetched & done_urls, "completed archive pages were fetched again"
+        assert not fetched & first_posts, "posts of completed archive pages were fetched again"
+    finally:
+        server.shutdown()
+        server.server_close()
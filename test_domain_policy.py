@@ -0,0 +1,23 @@
+"""Which asset URLs domain_policy.DomainPolicy lets the downloaders fetch.
+
+    python -m pytest -q test_domain_policy.py
+"""
+import domain_policy
+
+def test_url_host_resolves_urls_like_the_downloader():
+    assert domain_policy.url_host("https://adcdn.goo.ne.jp/a.js") == "adcdn.goo.ne.jp"
+    assert domain_policy.url_host("//adcdn.goo.ne.jp/a.js") == "adcdn.goo.ne.jp"
+    assert domain_policy.url_host("/img/a.png") == domain_policy.DEFAULT_HOST
+    assert domain_policy.url_host("platform.twitter.com/widgets.js") == "platform.twitter.com"
+
+def test_default_policy_denies_bare_host():
+    policy = domain_policy.DomainPolicy()
+    assert not policy.allows("platform.twitter.com/widgets.js")
+    assert not policy.allows("//platform.twitter.com/widgets.js")
+    assert policy.allows("blog-imgs.goo.ne.jp/user_image/a.jpg")
+
+def test_deny_covers_subdomains_of_bare_host():
+    policy = domain_policy.DomainPolicy(deny=["twitter.com"])
+    allowed, denied = policy.split(["platform.twitter.com/widgets.js", "/css/style.css"])
+    assert denied == ["platform.twitter.com/widgets.js"]
+    assert allowed == ["/css/style.css"]